@@ -0,0 +1,251 @@
+# benchmarks/data_layer.py
+"""Micro-benchmarks of the data layer operations across dataset sizes.
+
+Usage:
+    python -m benchmarks.data_layer
+    python -m benchmarks.data_layer --sizes 1000 10000 100000 1000000 --backends file
+    python -m benchmarks.data_layer --ops get_user_by_id get_all_users -o data_layer.json
+
+For each backend and size, a fresh database in a temporary directory is
+filled with that many users and destinations. Every operation is then
+called repeatedly with fresh arguments, in the manner of pytest-benchmark:
+calls are timed one by one until --min-time has passed (at least
+--min-rounds, at most --max-rounds calls), after a few warm-up calls.
+Writes run against the live database, so they include journaling and the
+occasional compaction, as they do in the services.
+
+Memory is measured with tracemalloc in separate, untimed calls: the peak
+allocated by one call of each operation, and the memory held by the
+loaded dataset. tracemalloc only sees the Python heap, so for SQLite the
+latter is close to zero: its pages live in SQLite's own cache.
+
+The scaling report at the end gives each operation's time ratio between
+consecutive sizes and the exponent k of the fitted O(n^k).
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.destinations import DestinationDatabase
+from data.users import UserDatabase
+
+BACKENDS = ('file', 'sqlite')
+OPS = ('add_user', 'get_user_by_id', 'get_user_by_email', 'get_all_users',
+       'add_destination', 'delete_destination', 'get_all_destinations')
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+WARMUP_CALLS = 3
+FILL_BATCH = 10000
+
+
+def make_user(index):
+    return {'id': str(uuid.UUID(int=index)), 'name': f'User {index}',
+            'email': f'user{index}@example.com', 'password': '%064x' % index,
+            'role': 'Admin' if index % 50 == 0 else 'User'}
+
+
+def make_destination(index):
+    return {'id': str(uuid.UUID(int=index)), 'name': f'Destination {index}',
+            'description': f'Benchmark destination number {index}',
+            'location': f'Country {index % 200}'}
+
+
+def open_databases(backend, workdir):
+    if backend == 'sqlite':
+        from data.sqlite_backend import SQLiteDestinationDatabase, SQLiteUserDatabase
+        path = os.path.join(workdir, 'travel.db')
+        return SQLiteUserDatabase(path), SQLiteDestinationDatabase(path)
+    return (UserDatabase(os.path.join(workdir, 'users_data.json')),
+            DestinationDatabase(os.path.join(workdir, 'destinations_data.json')))
+
+
+def fill(users, destinations, size):
+    for start in range(0, size, FILL_BATCH):
+        stop = min(start + FILL_BATCH, size)
+        users.add_users([make_user(i) for i in range(start, stop)])
+        destinations.add_destinations([make_destination(i) for i in range(start, stop)])
+
+
+def make_ops(users, destinations, size, rng):
+    """One zero-argument callable per operation, each call using new arguments."""
+    new_ids = iter(range(size, 1 << 62))
+    doomed = list(range(size))
+    rng.shuffle(doomed)
+    doomed = iter(doomed)
+    return {
+        'add_user': lambda: users.add_user(make_user(next(new_ids))),
+        'get_user_by_id': lambda: users.get_user_by_id(str(uuid.UUID(int=rng.randrange(size)))),
+        'get_user_by_email': lambda: users.get_user_by_email(
+            f'user{rng.randrange(size)}@example.com'),
+        'get_all_users': users.get_all_users,
+        'add_destination': lambda: destinations.add_destination(
+            make_destination(next(new_ids))),
+        'delete_destination': lambda: destinations.delete_destination(
+            str(uuid.UUID(int=next(doomed)))),
+        'get_all_destinations': destinations.get_all_destinations,
+    }
+
+
+def time_calls(fn, min_time, min_rounds, max_rounds):
+    """Per-call timings in seconds, pytest-benchmark style."""
+    for _ in range(WARMUP_CALLS):
+        fn()
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_rounds and (len(timings) < min_rounds
+                                         or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def peak_memory(fn):
+    """Peak bytes allocated during one call of ``fn``."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def resident_memory(backend, workdir):
+    """Bytes held by freshly opened databases once their data is loaded."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        users, destinations = open_databases(backend, workdir)
+        users.get_user_by_id('')
+        destinations.get_destination_by_id('')
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    users.close()
+    destinations.close()
+    return held
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    mean = statistics.fmean(timings)
+    return {
+        'rounds': len(timings),
+        'min': timings[0],
+        'max': timings[-1],
+        'mean': mean,
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'median': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'ops': 1 / mean if mean else float('inf'),
+    }
+
+
+def bench(backend, size, ops, args):
+    workdir = tempfile.mkdtemp(prefix='data-layer-bench-')
+    try:
+        users, destinations = open_databases(backend, workdir)
+        fill(users, destinations, size)
+        resident = resident_memory(backend, workdir)
+        callables = make_ops(users, destinations, size, random.Random(0))
+        results = []
+        for op in ops:
+            # Deletes consume seeded records, so never ask for more than exist
+            max_rounds = min(args.max_rounds, size - WARMUP_CALLS - 1) \
+                if op == 'delete_destination' else args.max_rounds
+            stats = summarize(time_calls(callables[op], args.min_time, args.min_rounds,
+                                         max_rounds))
+            stats['peak_bytes'] = peak_memory(callables[op])
+            results.append({'backend': backend, 'size': size, 'op': op,
+                            'resident_bytes': resident, **stats})
+            print_result(results[-1])
+        users.close()
+        destinations.close()
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:8.2f} {unit:<2}'
+    return f'{seconds / 1e-9:8.0f} ns'
+
+
+def print_header():
+    print(f'{"backend":>7} {"size":>9} {"operation":>21} {"min":>11} {"median":>11} '
+          f'{"mean":>11} {"stddev":>11} {"ops/s":>10} {"rounds":>7} {"peak KiB":>9}')
+
+
+def print_result(result):
+    print(f'{result["backend"]:>7} {result["size"]:>9,} {result["op"]:>21} '
+          f'{format_time(result["min"])} {format_time(result["median"])} '
+          f'{format_time(result["mean"])} {format_time(result["stddev"])} '
+          f'{result["ops"]:>10,.0f} {result["rounds"]:>7} {result["peak_bytes"] / 1024:>9,.0f}',
+          flush=True)
+
+
+def scaling_report(results):
+    """Per operation: median time at each size and the fitted exponent."""
+    print('\nScaling (median time; k in O(n^k) between consecutive sizes)')
+    series = {}
+    for result in results:
+        series.setdefault((result['backend'], result['op']), []).append(result)
+    for (backend, op), points in series.items():
+        points.sort(key=lambda r: r['size'])
+        cells = [format_time(points[0]['median']).strip()]
+        for before, after in zip(points, points[1:]):
+            exponent = (math.log(after['median'] / before['median'])
+                        / math.log(after['size'] / before['size']))
+            cells.append(f'{format_time(after["median"]).strip()} (k={exponent:.2f})')
+        print(f'{backend:>7} {op:>21}  ' + '  ->  '.join(cells))
+    residents = sorted({(r['backend'], r['size'], r['resident_bytes']) for r in results})
+    print('\nResident data (users + destinations loaded)')
+    for backend, size, held in residents:
+        print(f'{backend:>7} {size:>9,}  {held / 1e6:9.1f} MB')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--ops', nargs='+', choices=OPS, default=list(OPS))
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='seconds to keep timing each operation')
+    parser.add_argument('--min-rounds', type=int, default=5)
+    parser.add_argument('--max-rounds', type=int, default=1000)
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    print_header()
+    results = []
+    for backend in args.backends:
+        for size in sorted(args.sizes):
+            results.extend(bench(backend, size, args.ops, args))
+    scaling_report(results)
+    if args.output:
+        from benchmarks.load import git_commit
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'commit': git_commit(), 'python': platform.python_version(),
+                                'platform': platform.platform(),
+                                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())},
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+# benchmarks/load.py
+"""Load test of the service endpoints at several data scales.
+
+Usage:
+    python -m benchmarks.load
+    python -m benchmarks.load --scales 1000 100000 1000000 --concurrency 64 --duration 20
+    python -m benchmarks.load --endpoints login profile --mode asgi --workers 4
+    python -m benchmarks.load -o after.json --compare before.json
+
+For every scale, a SQLite database is seeded with that many synthetic
+users and destinations. Seeded databases are cached in --data-dir and
+reused, and every run works on a copy. The whole API is started as the
+gateway under the launcher. Each endpoint is then driven for --duration
+seconds by --concurrency keep-alive clients, after --warmup seconds of
+unmeasured traffic:
+
+    login          POST /login with a random seeded user's credentials
+    register       POST /register with a new email every request
+    profile        GET /profile with a random user's token
+    destinations   GET /destinations?<--query> with a random user's token
+    verify         POST /auth/verify with a random user's token
+
+Throughput and latency percentiles are printed and, with --output, saved
+as JSON together with the commit and machine they were measured on.
+--compare prints the change against such a file from an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import jwt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ('login', 'register', 'profile', 'destinations', 'verify')
+EXPECTED_STATUS = {'register': 201}
+DEFAULT_SCALES = [1000, 100_000]
+PASSWORD = 'bench-password'
+TOKEN_USERS = 1000
+SEED_BATCH = 10000
+
+
+def user_email(index):
+    return f'user{index}@bench.test'
+
+
+def user_id(index):
+    return str(uuid.UUID(int=index))
+
+
+def seed(path, scale):
+    """Create a database with ``scale`` users and ``scale`` destinations."""
+    from data.sqlite_backend import SQLiteDestinationDatabase, SQLiteUserDatabase
+    from services.user_service.hashing import build_context
+
+    # One hash shared by every user: hashing a million passwords with a
+    # real KDF would take hours and tells nothing about the endpoints
+    password = build_context().hash(PASSWORD)
+    users = SQLiteUserDatabase(path)
+    destinations = SQLiteDestinationDatabase(path)
+    for start in range(0, scale, SEED_BATCH):
+        stop = min(start + SEED_BATCH, scale)
+        users.add_users([{'id': user_id(i), 'name': f'User {i}', 'email': user_email(i),
+                          'password': password, 'role': 'Admin' if i % 100 == 0 else 'User'}
+                         for i in range(start, stop)])
+        destinations.add_destinations([
+            {'id': str(uuid.UUID(int=i)), 'name': f'Destination {i}',
+             'description': f'Synthetic destination number {i} for load tests',
+             'location': f'Country {i % 200}'}
+            for i in range(start, stop)])
+        print(f'  seeded {stop}/{scale}', file=sys.stderr, end='\r')
+    print(file=sys.stderr)
+    users.close()
+    destinations.close()
+
+
+def seeded_database(data_dir, scale):
+    path = os.path.join(data_dir, f'load-{scale}.db')
+    if not os.path.exists(path):
+        print(f'Seeding {scale} users and destinations into {path}', file=sys.stderr)
+        partial = path + '.partial'
+        for leftover in (partial, partial + '-wal', partial + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        seed(partial, scale)
+        os.replace(partial, path)
+    return path
+
+
+def make_tokens(scale, count=TOKEN_USERS):
+    from services.auth_service.auth import SECRET_KEY
+
+    exp = time.time() + 3600
+    tokens = []
+    for index in random.Random(0).sample(range(scale), min(count, scale)):
+        role = 'Admin' if index % 100 == 0 else 'User'
+        tokens.append(jwt.encode({'user_id': user_id(index), 'role': role, 'exp': exp},
+                                 SECRET_KEY, algorithm='HS256'))
+    return tokens
+
+
+def http_request(method, path, host, body=None, token=None):
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}']
+    if token:
+        lines.append(f'Authorization: Bearer {token}')
+    payload = b''
+    if body is not None:
+        payload = json.dumps(body).encode()
+        lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+
+def request_factory(endpoint, scale, tokens, host, query):
+    """Returns a function building the next request for ``endpoint``."""
+    rng = random.Random()
+    run = uuid.uuid4().hex[:8]
+    counter = iter(range(1 << 62))
+    if endpoint == 'login':
+        return lambda: http_request('POST', '/login', host, {
+            'email': user_email(rng.randrange(scale)), 'password': PASSWORD})
+    if endpoint == 'register':
+        return lambda: http_request('POST', '/register', host, {
+            'name': 'Load Test', 'email': f'new-{run}-{next(counter)}@bench.test',
+            'password': PASSWORD, 'role': 'User'})
+    if endpoint == 'profile':
+        return lambda: http_request('GET', '/profile', host, token=rng.choice(tokens))
+    if endpoint == 'destinations':
+        path = f'/destinations?{query}' if query else '/destinations'
+        return lambda: http_request('GET', path, host, token=rng.choice(tokens))
+    if endpoint == 'verify':
+        return lambda: http_request('POST', '/auth/verify', host, {'token': rng.choice(tokens)})
+    raise ValueError(f'Unknown endpoint: {endpoint}')
+
+
+async def read_response(reader):
+    """Read one response; returns (status, whether the connection stays open)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    headers = {}
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get(b'transfer-encoding') == b'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get(b'content-length', 0)))
+    return status, headers.get(b'connection', b'').lower() != b'close'
+
+
+async def client(port, next_request, deadline, latencies, counts, expected=200):
+    writer = None
+    try:
+        while time.monotonic() < deadline:
+            if writer is None:
+                # Servers without keep-alive cost a new connection per request
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            request = next_request()
+            start = time.perf_counter()
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            counts['ok' if status == expected else 'errors'] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+    except (OSError, asyncio.IncompleteReadError):
+        counts['errors'] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def drive(port, next_request, concurrency, duration, expected=200):
+    """Run ``concurrency`` clients for ``duration`` seconds; returns (latencies, counts)."""
+    latencies = []
+    counts = {'ok': 0, 'errors': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client(port, next_request, deadline, latencies, counts, expected)
+                           for _ in range(concurrency)))
+    latencies.sort()
+    return latencies, counts
+
+
+def percentile(values, fraction):
+    """``fraction`` percentile of sorted ``values``."""
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def summarize(latencies, counts, duration):
+    return {
+        'requests': counts['ok'],
+        'errors': counts['errors'],
+        'throughput': counts['ok'] / duration,
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies) * 1000 if latencies else float('nan'),
+            'p50': percentile(latencies, 0.50) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'max': latencies[-1] * 1000 if latencies else float('nan'),
+        },
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with status {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('Server did not start')
+
+
+def start_gateway(env, workers, mode):
+    port = free_port()
+    command = [sys.executable, '-m', 'services.common.launcher', 'services.gateway',
+               '--port', str(port), '--mode', mode]
+    if workers:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port, process)
+    return process, port
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    results = []
+    workdir = tempfile.mkdtemp(prefix='load-bench-')
+    try:
+        for scale in args.scales:
+            db_path = os.path.join(workdir, 'travel.db')
+            shutil.copyfile(seeded_database(args.data_dir, scale), db_path)
+            env = dict(os.environ, TRAVEL_DATA_BACKEND='sqlite', TRAVEL_SQLITE_PATH=db_path)
+            tokens = make_tokens(scale)
+            process, port = start_gateway(env, args.workers, args.mode)
+            host = f'127.0.0.1:{port}'
+            try:
+                for endpoint in args.endpoints:
+                    next_request = request_factory(endpoint, scale, tokens, host, args.query)
+                    expected = EXPECTED_STATUS.get(endpoint, 200)
+                    if args.warmup:
+                        asyncio.run(drive(port, next_request, args.concurrency, args.warmup,
+                                          expected))
+                    latencies, counts = asyncio.run(
+                        drive(port, next_request, args.concurrency, args.duration, expected))
+                    result = {'scale': scale, 'endpoint': endpoint,
+                              'concurrency': args.concurrency,
+                              **summarize(latencies, counts, args.duration)}
+                    results.append(result)
+                    print_result(result)
+            finally:
+                process.terminate()
+                process.wait()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_header():
+    print(f'{"scale":>8} {"endpoint":>13} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} '
+          f'{"p99 ms":>8} {"errors":>7}')
+
+
+def print_result(result):
+    latency = result['latency_ms']
+    print(f'{result["scale"]:>8} {result["endpoint"]:>13} {result["throughput"]:>9.0f} '
+          f'{latency["p50"]:>8.1f} {latency["p95"]:>8.1f} {latency["p99"]:>8.1f} '
+          f'{result["errors"]:>7}', flush=True)
+
+
+def compare(results, baseline):
+    """Print throughput and p99 changes against an earlier run's results."""
+    before = {(r['scale'], r['endpoint']): r for r in baseline['results']}
+    print(f'\nAgainst {baseline["meta"].get("commit") or "baseline"}:')
+    print(f'{"scale":>8} {"endpoint":>13} {"req/s":>9} {"p99":>9}')
+    for result in results:
+        old = before.get((result['scale'], result['endpoint']))
+        if old is None or not old['throughput']:
+            continue
+        throughput = result['throughput'] / old['throughput'] - 1
+        p99 = result['latency_ms']['p99'] / old['latency_ms']['p99'] - 1
+        print(f'{result["scale"]:>8} {result["endpoint"]:>13} {throughput:>+9.1%} {p99:>+9.1%}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='users and destinations to seed, one run per value')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--query', default='limit=20', help='query string for /destinations')
+    parser.add_argument('--workers', type=int, help='server worker processes (default: CPUs)')
+    parser.add_argument('--mode', choices=('threaded', 'asgi'), default='threaded')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'travel-load'),
+                        help='where seeded databases are cached between runs')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print_header()
+    results = run(args)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items()
+                     if key not in ('output', 'compare', 'data_dir')},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if baseline is not None:
+        compare(results, baseline)
+
+
+if __name__ == '__main__':
+    main()
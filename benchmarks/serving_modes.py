@@ -0,0 +1,119 @@
+# benchmarks/serving_modes.py
+"""Throughput and latency of the threaded Flask server against the ASGI mode.
+
+Usage:
+    python -m benchmarks.serving_modes
+    python -m benchmarks.serving_modes --connections 50 1000 --duration 10
+    python -m benchmarks.serving_modes --modes asgi --path '/destinations?limit=20'
+
+Each mode serves the destination service in its own process on a fresh
+SQLite database seeded with --destinations rows. A single-process asyncio
+client then holds --connections keep-alive connections open, each sending
+authenticated requests back to back for --duration seconds, reconnecting
+whenever the server closes the connection after a response (as the
+threaded development server does). Failed connections count as errors.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import jwt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load import drive, free_port, http_request, percentile, wait_for_port
+
+MODES = ('threaded', 'asgi')
+DEFAULT_CONNECTIONS = [10, 100, 1000]
+
+
+def seed(path, destinations):
+    """Create the database; returns a token for its admin user."""
+    from data.sqlite_backend import SQLiteDestinationDatabase, SQLiteUserDatabase
+
+    user_id = str(uuid.uuid4())
+    SQLiteUserDatabase(path).add_user({'id': user_id, 'name': 'Bench', 'email': 'bench@test.com',
+                                       'password': '', 'role': 'Admin'})
+    SQLiteDestinationDatabase(path).add_destinations([
+        {'id': str(uuid.UUID(int=i)), 'name': f'Destination {i}',
+         'description': f'Benchmark destination number {i}', 'location': f'Country {i % 50}'}
+        for i in range(destinations)
+    ])
+    from services.auth_service.auth import SECRET_KEY
+    return jwt.encode({'user_id': user_id, 'role': 'Admin', 'exp': time.time() + 3600},
+                      SECRET_KEY, algorithm='HS256')
+
+
+def serve(mode, port):
+    """Child process entry point: serve the destination service in ``mode``."""
+    from services.destination_service import app as service
+    if mode == 'threaded':
+        service.app.run(port=port, threaded=True)
+    else:
+        from services.common.asgi import run
+        run(service.asgi_app, port=port)
+
+
+def start_server(mode, env):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.serving_modes',
+                                '--serve', mode, '--port', str(port)],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port, process, timeout=30)
+    return process, port
+
+
+def load(port, path, token, connections, duration):
+    request = http_request('GET', path, f'127.0.0.1:{port}', token=token)
+    return asyncio.run(drive(port, lambda: request, connections, duration))
+
+
+def run(modes, connections, duration, path, destinations):
+    workdir = tempfile.mkdtemp(prefix='serving-bench-')
+    env = dict(os.environ, TRAVEL_DATA_BACKEND='sqlite',
+               TRAVEL_SQLITE_PATH=os.path.join(workdir, 'travel.db'))
+    try:
+        os.environ.update(env)
+        token = seed(env['TRAVEL_SQLITE_PATH'], destinations)
+        print(f'GET {path}, {destinations} destinations, {duration}s per run')
+        print(f'{"mode":>9} {"conns":>6} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for mode in modes:
+            process, port = start_server(mode, env)
+            try:
+                for count in connections:
+                    latencies, counts = load(port, path, token, count, duration)
+                    print(f'{mode:>9} {count:>6} {counts["ok"] / duration:>9.0f} '
+                          f'{percentile(latencies, 0.5) * 1000:>8.1f} '
+                          f'{percentile(latencies, 0.99) * 1000:>8.1f} {counts["errors"]:>7}')
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--connections', type=int, nargs='+', default=DEFAULT_CONNECTIONS)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--path', default='/destinations?limit=20')
+    parser.add_argument('--destinations', type=int, default=1000)
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+    run(args.modes, args.connections, args.duration, args.path, args.destinations)
+
+
+if __name__ == '__main__':
+    main()
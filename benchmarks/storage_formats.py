@@ -0,0 +1,104 @@
+# benchmarks/storage_formats.py
+"""Load/save timings for the data file formats in data/storage.py.
+
+Usage:
+    python -m benchmarks.storage_formats
+    python -m benchmarks.storage_formats --sizes 10000 100000 --repeat 5
+
+The ``exec`` row reproduces the loader the databases used before the
+storage layer existed, as a baseline for the other formats.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.storage import JSONFormat, PythonLiteralFormat, RecordFormat
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_users(count):
+    users = {}
+    for i in range(count):
+        user_id = str(uuid.UUID(int=i))
+        users[user_id] = {
+            'id': user_id,
+            'name': f'User {i}',
+            'email': f'user{i}@example.com',
+            'password': '%064x' % i,
+            'role': 'Admin' if i % 50 == 0 else 'User'
+        }
+    return users
+
+
+class ExecBaseline(PythonLiteralFormat):
+    """The original exec()-based loader, kept here for comparison only."""
+
+    def load(self, path):
+        namespace = {}
+        with open(path, 'r') as f:
+            exec(f.read(), namespace)
+        return namespace[self.name]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes, repeat, formats):
+    results = []
+    workdir = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            users = make_users(size)
+            for label, fmt in formats:
+                path = os.path.join(workdir, 'users' + fmt.extension)
+                save = best_of(repeat, lambda: fmt.dump(path, users))
+                load = best_of(repeat, lambda: fmt.load(path))
+                results.append({
+                    'format': label,
+                    'records': size,
+                    'save_s': save,
+                    'load_s': load,
+                    'bytes': os.path.getsize(path)
+                })
+                print(f"{label:>8} {size:>9,} records  save {save * 1000:10.1f} ms  "
+                      f"load {load * 1000:10.1f} ms  {results[-1]['bytes'] / 1e6:8.1f} MB",
+                      flush=True)
+                os.remove(path)
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-exec', action='store_true',
+                        help='skip the slow exec() baseline')
+    args = parser.parse_args(argv)
+
+    formats = [
+        ('json', JSONFormat('users')),
+        ('rec', RecordFormat('users')),
+        ('literal', PythonLiteralFormat('users')),
+    ]
+    if not args.skip_exec:
+        formats.append(('exec', ExecBaseline('users')))
+    run(args.sizes, args.repeat, formats)
+
+
+if __name__ == '__main__':
+    main()
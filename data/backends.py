@@ -0,0 +1,67 @@
+# data/backends.py
+"""Pick the storage backend for the services from the environment.
+
+TRAVEL_DATA_BACKEND  'file' (default) for the JSON data files in data/, or
+                     'sqlite' for one shared SQLite database.
+TRAVEL_SQLITE_PATH   database file used by the sqlite backend
+                     (default: data/travel.db).
+TRAVEL_COMPACT_RECORDS
+                     '1' to keep the file backend's resident records as
+                     compact slotted objects (data/records.py): about a
+                     third less memory, but slower loads and listings.
+"""
+import os
+import threading
+
+from data.users import UserDatabase
+from data.destinations import DestinationDatabase
+
+BACKENDS = ('file', 'sqlite')
+
+# One instance per backend and database file, shared by every caller in
+# the process, so services hosted together (see services/gateway.py) keep
+# one resident copy of the data, one set of indexes and one listener list
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_backend():
+    backend = os.environ.get('TRAVEL_DATA_BACKEND', 'file').strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown TRAVEL_DATA_BACKEND '{backend}', expected one of {BACKENDS}")
+    return backend
+
+
+def _compact_records():
+    return os.environ.get('TRAVEL_COMPACT_RECORDS', '').strip().lower() in ('1', 'true', 'yes')
+
+
+def _sqlite_path():
+    from data.sqlite_backend import DEFAULT_PATH
+    return os.environ.get('TRAVEL_SQLITE_PATH') or DEFAULT_PATH
+
+
+def _shared(key, factory):
+    with _databases_lock:
+        database = _databases.get(key)
+        if database is None:
+            database = _databases[key] = factory()
+        return database
+
+
+def open_user_database():
+    if get_backend() == 'sqlite':
+        from data.sqlite_backend import SQLiteUserDatabase
+        path = _sqlite_path()
+        return _shared(('sqlite', 'users', path), lambda: SQLiteUserDatabase(path))
+    return _shared(('file', 'users'),
+                   lambda: UserDatabase(compact_records=_compact_records()))
+
+
+def open_destination_database():
+    if get_backend() == 'sqlite':
+        from data.sqlite_backend import SQLiteDestinationDatabase
+        path = _sqlite_path()
+        return _shared(('sqlite', 'destinations', path), lambda: SQLiteDestinationDatabase(path))
+    return _shared(('file', 'destinations'),
+                   lambda: DestinationDatabase(compact_records=_compact_records()))
@@ -0,0 +1,270 @@
+# data/base.py
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+from data.events import MutationListeners, timed
+from data.locking import FileLock
+from data.storage import get_format, migrate
+from data.wal import WriteAheadLog
+
+class FileDatabase(MutationListeners):
+    """File-backed dict of records shared by UserDatabase and DestinationDatabase.
+
+    The records live in a snapshot file (format picked by extension, see
+    data/storage.py) plus an append-only log of later mutations. The parsed
+    records stay resident and are only reloaded when either file changes.
+
+    Several processes may share the files: reloads hold a shared lock on
+    ``<filename>.lock`` and every read-modify-write cycle holds it
+    exclusively, so concurrent writers never lose each other's updates.
+    """
+
+    collection = None
+    # Record class kept resident with compact_records=True (see data/records.py)
+    compact_record_type = None
+
+    def __init__(self, filename, journal=True, compact_every=1000, compact_records=False):
+        self.filename = os.path.join(os.path.dirname(__file__), filename)
+        self.storage = get_format(self.filename, self.collection)
+        self.wal = WriteAheadLog(self.filename + '.wal') if journal else None
+        # Fold the log into a new snapshot once it holds more entries than
+        # this and than the snapshot has records (see _journal)
+        self.compact_every = compact_every
+        self._snapshot_size = 0
+        # Plain dicts unless compact records were asked for
+        self.record_type = self.compact_record_type if compact_records else None
+        # (stamp, records, indexes) of the last load, replaced as a whole so
+        # readers never pair one load's records with another's indexes
+        self._state = None
+        # Serializes read-modify-write cycles within this process
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(self.filename + '.lock')
+        self._initialize_database()
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the database exclusively for a read-modify-write cycle."""
+        with self._lock, self._file_lock.exclusive():
+            yield
+
+    def _initialize_database(self):
+        if os.path.exists(self.filename):
+            return
+        with self._file_lock.exclusive():
+            if os.path.exists(self.filename):
+                return
+            # Convert a legacy <name>_data.py sitting next to the new file
+            legacy = os.path.splitext(self.filename)[0] + '.py'
+            if legacy != self.filename and os.path.exists(legacy):
+                migrate(legacy, self.filename, self.collection)
+            else:
+                self.storage.dump(self.filename, {})
+
+    def _file_stamp(self):
+        stat = os.stat(self.filename)
+        wal_stamp = self.wal.stamp() if self.wal is not None else None
+        return (stat.st_mtime_ns, stat.st_size, wal_stamp)
+
+    def _load(self):
+        return self._load_state()[0]
+
+    def _load_state(self):
+        """(records, indexes) of the current files; see _build_indexes.
+
+        A reload builds both into fresh objects and publishes them in one
+        assignment, so a reader holding the pair always sees matching ones.
+        """
+        # Only re-read the files when another writer has changed them
+        stamp = self._file_stamp()
+        state = self._state
+        if state is not None and stamp == state[0]:
+            return state[1], state[2]
+
+        with timed('data_load'), self._file_lock.shared():
+            # Stat again: the files cannot change while we hold the lock
+            stamp = self._file_stamp()
+            records = self.storage.load(self.filename)
+            self._snapshot_size = len(records)
+            if self.wal is not None:
+                self.wal.replay(records)
+        if self.record_type is not None:
+            record_type = self.record_type
+            records = {key: record_type(record) for key, record in records.items()}
+        with timed('data_index'):
+            indexes = self._build_indexes(records)
+        self._state = (stamp, records, indexes)
+        return records, indexes
+
+    def _save(self, records, indexes=None):
+        """Write a full snapshot of ``records`` and empty the log.
+
+        ``indexes`` are those of a loaded ``records`` dict, which is then
+        kept resident as it is; otherwise both are built afresh.
+        """
+        with self._transaction():
+            try:
+                with timed('data_save'):
+                    self.storage.dump(self.filename, records)
+                self._snapshot_size = len(records)
+                if self.wal is not None:
+                    self.wal.reset()
+            except Exception:
+                # The cached dict may already hold the failed change
+                self._state = None
+                raise
+            # Write through so our own saves never trigger a reload
+            if indexes is None:
+                records = {key: self._as_record(record) for key, record in records.items()}
+                indexes = self._build_indexes(records)
+            self._state = (self._file_stamp(), records, indexes)
+        self._notify('reset')
+
+    def _journal(self, records, indexes, entries):
+        """Persist ``entries`` (op, id, record) already applied to ``records``
+        and ``indexes``.
+
+        Must be called inside ``_transaction()``, so the stamp taken after
+        the append cannot include another process's write. Returns a ticket
+        for ``_wait_durable``, which callers pass once the transaction is
+        over so that concurrent writers can share an fsync.
+
+        The log is compacted once it would outgrow the snapshot, so each
+        rewrite of N records follows at least N logged entries: a large
+        import costs O(1) per record however big the store is, and
+        replaying the log never takes longer than loading the snapshot.
+        """
+        limit = max(self.compact_every, self._snapshot_size)
+        if self.wal is None or self.wal.entries + len(entries) > limit:
+            self._save(records, indexes)
+            return None
+        try:
+            with timed('data_journal'):
+                ticket = self.wal.append_many(entries)
+        except Exception:
+            self._state = None
+            raise
+        self._state = (self._file_stamp(), records, indexes)
+        return ticket
+
+    def _wait_durable(self, ticket):
+        """Block until a write journaled by ``_journal`` is on disk.
+
+        Snapshots are synced before ``_save`` returns, so only log appends
+        have anything to wait for.
+        """
+        if ticket is not None:
+            with timed('data_sync'):
+                self.wal.wait(ticket)
+
+    def _as_record(self, record):
+        """``record`` in the resident form; callers may pass plain dicts."""
+        return self.record_type.of(record) if self.record_type is not None else record
+
+    def _put(self, key, record):
+        record = self._as_record(record)
+        with self._transaction():
+            records, indexes = self._load_state()
+            before = self._stamp_version()
+            old = records.get(key)
+            # Readers run unlocked: a record is stored before its index
+            # entries and unindexed before it is removed
+            records[key] = record
+            self._index_put(indexes, key, old, record)
+            ticket = self._journal(records, indexes, [('put', key, record)])
+            versions = (before, self._stamp_version())
+        self._wait_durable(ticket)
+        self._notify('put', key, record, versions)
+
+    def _delete(self, key):
+        with self._transaction():
+            records, indexes = self._load_state()
+            if key not in records:
+                return False
+            before = self._stamp_version()
+            self._index_delete(indexes, key, records[key])
+            del records[key]
+            ticket = self._journal(records, indexes, [('delete', key, None)])
+            versions = (before, self._stamp_version())
+        self._wait_durable(ticket)
+        self._notify('delete', key, None, versions)
+        return True
+
+    def _put_many(self, items):
+        """Store several (key, record) pairs with a single persisted write."""
+        items = [(key, self._as_record(record)) for key, record in items]
+        if not items:
+            return
+        with self._transaction():
+            records, indexes = self._load_state()
+            before = self._stamp_version()
+            self._apply_puts(records, indexes, items)
+            ticket = self._journal(records, indexes,
+                                   [('put', key, record) for key, record in items])
+            versions = (before, self._stamp_version())
+        self._wait_durable(ticket)
+        for key, record in items:
+            self._notify('put', key, record, versions)
+
+    def _delete_many(self, keys):
+        """Delete several keys with a single persisted write; returns the
+        keys that existed."""
+        deleted = []
+        ticket = None
+        with self._transaction():
+            records, indexes = self._load_state()
+            before = self._stamp_version()
+            for key in keys:
+                if key in records:
+                    self._index_delete(indexes, key, records[key])
+                    del records[key]
+                    deleted.append(key)
+            if deleted:
+                ticket = self._journal(records, indexes,
+                                       [('delete', key, None) for key in deleted])
+            versions = (before, self._stamp_version())
+        self._wait_durable(ticket)
+        for key in deleted:
+            self._notify('delete', key, None, versions)
+        return deleted
+
+    def get_version(self):
+        """Opaque string that changes whenever the stored records change.
+
+        Derived from the snapshot and log stamps, so writes made by other
+        processes sharing the files change it too.
+        """
+        with self._lock:
+            self._load()
+            return self._stamp_version()
+
+    def _stamp_version(self):
+        # get_version() of the loaded state; callers hold self._lock
+        return hashlib.blake2b(repr(self._state[0]).encode(), digest_size=8).hexdigest()
+
+    # Subclasses keep secondary indexes in sync through these hooks
+    def _build_indexes(self, records):
+        """Return new indexes over ``records``; they are published with them."""
+        return None
+
+    def _index_put(self, indexes, key, old, record):
+        pass
+
+    def _index_delete(self, indexes, key, old):
+        pass
+
+    def _apply_puts(self, records, indexes, items):
+        """Store ``items`` in ``records`` and update the indexes.
+
+        Subclasses whose indexes are cheaper to merge in bulk than to patch
+        one record at a time override this.
+        """
+        for key, record in items:
+            old = records.get(key)
+            records[key] = record
+            self._index_put(indexes, key, old, record)
+
+    def close(self):
+        if self.wal is not None:
+            self.wal.close()
@@ -0,0 +1,272 @@
+# data/columnar.py
+"""Column-oriented, read-only copy of the destinations for bulk queries.
+
+``DestinationColumns(destinations)`` lays the catalogue out by column,
+with rows in id order:
+
+- ids: a list sharing the records' id strings
+- location: dictionary-encoded, one small integer code per row plus the
+  list of distinct values
+- name, description: each one string heap with the values end to end,
+  addressed through an array of offsets; descriptions also keep a
+  casefolded heap for word search
+
+Missing or non-text values read as ''.
+
+Filters (location, name prefix, description words; the same rules as
+``search_destinations``), sorts and counts then work on whole columns:
+comparing codes, slicing a presorted order, one substring scan of a
+heap per word. NumPy is used when installed; otherwise the stdlib ``array``
+module and C-level iterators stand in, which is slower but needs nothing.
+
+The copy is a snapshot: it does not follow later writes, so owners
+rebuild it when the database version changes.
+"""
+import re
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from itertools import compress
+
+from data.indexes import normalize, tokenize
+
+try:
+    import numpy
+except ImportError:  # optional; plain arrays and loops are used instead
+    numpy = None
+
+FIELDS = ('id', 'name', 'description', 'location')
+SORT_KEYS = ('id', 'name', 'location')
+# Sorts after every string that starts with a given prefix
+_PREFIX_END = '\U0010ffff'
+_WORD = re.compile(r'\w')
+
+
+def _int_array(values, typecode):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.int64 if typecode == 'q' else numpy.int32)
+    return array(typecode, values)
+
+
+def _text(value):
+    return value if isinstance(value, str) else ''
+
+
+class StringColumn:
+    """Strings stored end to end in one heap, found through offsets.
+
+    Each value is followed by a newline in the heap, so a whole word never
+    runs from one row into the next.
+    """
+
+    def __init__(self, values):
+        offsets = [0]
+        end = 0
+        for value in values:
+            end += len(value) + 1
+            offsets.append(end)
+        self.heap = ''.join(value + '\n' for value in values)
+        self.offsets = _int_array(offsets, 'q')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.heap[self.offsets[row]:self.offsets[row + 1] - 1]
+
+    def rows_with_word(self, word):
+        """Sorted rows whose value contains ``word`` as a whole word."""
+        heap = self.heap
+        # Starting the pattern with the literal lets re skip ahead with a
+        # fast substring search; a leading lookbehind makes it ten times slower
+        pattern = re.compile(re.escape(word) + r'(?!\w)')
+        positions = [match.start() for match in pattern.finditer(heap)
+                     if not match.start() or not _WORD.match(heap, match.start() - 1)]
+        if numpy is not None:
+            return numpy.unique(numpy.searchsorted(self.offsets, positions, side='right') - 1)
+        offsets = self.offsets
+        return sorted({bisect_right(offsets, position) - 1 for position in positions})
+
+
+class DestinationColumns:
+    """Columnar snapshot of a set of destinations; see the module docstring."""
+
+    def __init__(self, destinations):
+        rows = sorted(destinations, key=lambda destination: destination['id'])
+        self.ids = [destination['id'] for destination in rows]
+        self.names = StringColumn([_text(d.get('name')) for d in rows])
+        self.descriptions = StringColumn([_text(d.get('description')) for d in rows])
+        # Word search runs over the normalized text, as tokenize() sees it
+        self._description_terms = StringColumn([normalize(d.get('description')) for d in rows])
+
+        # Dictionary encoding: code -> location, and one code per row
+        self.locations = []
+        codes = {}
+        location_codes = []
+        for destination in rows:
+            location = _text(destination.get('location'))
+            code = codes.get(location)
+            if code is None:
+                code = codes[location] = len(self.locations)
+                self.locations.append(location)
+            location_codes.append(code)
+        self.location_codes = _int_array(location_codes, 'i')
+        # Filters and counts compare normalized locations, as the search index does
+        self._codes_by_key = {}
+        for code, location in enumerate(self.locations):
+            self._codes_by_key.setdefault(normalize(location), []).append(code)
+        # Spellings of one location share a rank, so they sort together in id order
+        key_rank = {key: rank for rank, key in enumerate(sorted(self._codes_by_key))}
+        self._location_rank = _int_array(
+            [key_rank[normalize(location)] for location in self.locations], 'i')
+
+        # Rows by normalized name (ties in id order) and each row's place in it
+        name_keys = [normalize(self.names[row]) for row in range(len(rows))]
+        self._by_name = _int_array(sorted(range(len(rows)), key=name_keys.__getitem__), 'i')
+        self._name_rank = _int_array(_ranks(self._by_name), 'i')
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Filters: each returns the matching rows in ascending (id) order
+
+    def _all_rows(self):
+        return numpy.arange(len(self)) if numpy is not None else range(len(self))
+
+    def _rows_with_location(self, location):
+        wanted = self._codes_by_key.get(normalize(location), [])
+        if numpy is not None:
+            return numpy.flatnonzero(numpy.isin(self.location_codes, wanted))
+        wanted = set(wanted)
+        return list(compress(range(len(self)), map(wanted.__contains__, self.location_codes)))
+
+    def _name_position(self, name, lo=0):
+        # bisect_left over the rows in name order (bisect's key= needs 3.10)
+        hi = len(self._by_name)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if normalize(self.names[self._by_name[mid]]) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _rows_with_name_prefix(self, prefix):
+        prefix = normalize(prefix)
+        start = self._name_position(prefix)
+        end = self._name_position(prefix + _PREFIX_END, start)
+        if numpy is not None:
+            return numpy.sort(self._by_name[start:end])
+        return sorted(self._by_name[start:end])
+
+    def _rows_with_text(self, text):
+        rows = None
+        for token in tokenize(text):
+            # Whole words only, like the inverted index behind search_destinations
+            matches = self._description_terms.rows_with_word(token)
+            rows = matches if rows is None else _intersect(rows, matches)
+            if not len(rows):
+                break
+        return rows if rows is not None else _int_array([], 'q')
+
+    def select(self, location=None, name_prefix=None, text=None):
+        """Rows matching every given filter in id order; filters left as None are ignored."""
+        rows = None
+        for value, find in ((location, self._rows_with_location),
+                            (name_prefix, self._rows_with_name_prefix),
+                            (text, self._rows_with_text)):
+            if value is None:
+                continue
+            matches = find(value)
+            rows = matches if rows is None else _intersect(rows, matches)
+        return self._all_rows() if rows is None else rows
+
+    def sort(self, rows, sort='id'):
+        """``rows`` ordered by ``sort``: id, name or location, '-' first for descending.
+
+        Ties keep id order.
+        """
+        key = sort[1:] if sort.startswith('-') else sort
+        if key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{key}'")
+        if key == 'name':
+            ranks = self._name_rank
+            if numpy is not None:
+                rows = rows[numpy.argsort(ranks[rows], kind='stable')]
+            else:
+                rows = sorted(rows, key=ranks.__getitem__)
+        elif key == 'location':
+            ranks, codes = self._location_rank, self.location_codes
+            if numpy is not None:
+                rows = rows[numpy.argsort(ranks[codes[rows]], kind='stable')]
+            else:
+                rows = sorted(rows, key=lambda row: ranks[codes[row]])
+        return rows[::-1] if sort.startswith('-') else rows
+
+    def record(self, row, fields=None):
+        """The destination at ``row`` as a dict, optionally only ``fields``."""
+        values = {
+            'id': lambda: self.ids[row],
+            'name': lambda: self.names[row],
+            'description': lambda: self.descriptions[row],
+            'location': lambda: self.locations[self.location_codes[row]],
+        }
+        return {field: values[field]() for field in (fields or FIELDS) if field in values}
+
+    # Queries
+
+    def query(self, location=None, name_prefix=None, text=None, sort='id',
+              offset=0, limit=None, fields=None):
+        """Matching destinations as (records, total), sorted and sliced.
+
+        ``total`` counts every match, before ``offset`` and ``limit``.
+        """
+        rows = self.sort(self.select(location, name_prefix, text), sort)
+        end = len(rows) if limit is None else offset + limit
+        return [self.record(row, fields) for row in rows[offset:end]], len(rows)
+
+    def count(self, location=None, name_prefix=None, text=None):
+        if location is None and name_prefix is None and text is None:
+            return len(self)
+        return len(self.select(location, name_prefix, text))
+
+    def count_by_location(self, location=None, name_prefix=None, text=None):
+        """{location: matching destinations}, largest first.
+
+        Locations differing only in case or surrounding spaces are counted
+        together, under the spelling seen first in id order.
+        """
+        filtered = not (location is None and name_prefix is None and text is None)
+        if numpy is not None:
+            codes = self.location_codes
+            if filtered:
+                codes = codes[self.select(location, name_prefix, text)]
+            per_code = numpy.bincount(codes, minlength=len(self.locations)).tolist()
+        else:
+            codes = self.location_codes
+            if filtered:
+                codes = map(codes.__getitem__, self.select(location, name_prefix, text))
+            counter = Counter(codes)
+            per_code = [counter[code] for code in range(len(self.locations))]
+        counts = {}
+        for key, key_codes in self._codes_by_key.items():
+            total = sum(per_code[code] for code in key_codes)
+            if total:
+                # The first-seen spelling has the lowest code
+                counts[self.locations[min(key_codes)]] = total
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+def _ranks(order):
+    """Inverse of the permutation ``order``: each item's position in it."""
+    ranks = [0] * len(order)
+    for position, item in enumerate(order):
+        ranks[item] = position
+    return ranks
+
+
+def _intersect(rows, other):
+    if numpy is not None:
+        return numpy.intersect1d(rows, other, assume_unique=True)
+    other = set(other)
+    return [row for row in rows if row in other]
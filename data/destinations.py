@@ -1,37 +1,67 @@
 # data/destination_database.py
-import os
+from bisect import bisect_left, bisect_right, insort
 
-class DestinationDatabase:
-    def __init__(self, filename='destinations_data.py'):
-        self.filename = os.path.join(os.path.dirname(__file__), filename)
-        self._initialize_database()
+from data.base import FileDatabase
+from data.indexes import DestinationIndex
+from data.records import DestinationRecord
 
-    def _initialize_database(self):
-        if not os.path.exists(self.filename):
-            with open(self.filename, 'w') as f:
-                f.write("destinations = {}")
+class DestinationDatabase(FileDatabase):
+    collection = 'destinations'
+    compact_record_type = DestinationRecord
+
+    def __init__(self, filename='destinations_data.json', **kwargs):
+        super().__init__(filename, **kwargs)
 
     def _load_destinations(self):
-        with open(self.filename, 'r') as f:
-            exec(f.read(), globals())
-            return globals()['destinations']
+        return self._load()
 
     def _save_destinations(self, destinations):
-        with open(self.filename, 'w') as f:
-            f.write(f"destinations = {repr(destinations)}")
+        self._save(destinations)
+
+    def _build_indexes(self, destinations):
+        # Ids, location / name / description indexes behind pages and searches
+        return DestinationIndex(destinations)
+
+    def _index_put(self, index, destination_id, old, destination):
+        if old is None:
+            insort(index.ids, destination_id)
+        else:
+            index.remove(destination_id, old)
+        index.add(destination_id, destination)
+
+    def _apply_puts(self, destinations, index, items):
+        # Merge new ids in one sort instead of an insort per item
+        latest = dict(items)
+        new_ids = [destination_id for destination_id in latest if destination_id not in destinations]
+        for destination_id, destination in latest.items():
+            old = destinations.get(destination_id)
+            destinations[destination_id] = destination
+            if old is not None:
+                index.remove(destination_id, old)
+        # Sorted aside and swapped in whole: readers may be slicing the list
+        index.ids[:] = sorted(index.ids + new_ids)
+        index.add_many(latest.items())
+
+    def _index_delete(self, index, destination_id, old):
+        ids = index.ids
+        position = bisect_left(ids, destination_id)
+        if position < len(ids) and ids[position] == destination_id:
+            del ids[position]
+        index.remove(destination_id, old)
 
     def add_destination(self, destination):
-        destinations = self._load_destinations()
-        destinations[destination['id']] = destination
-        self._save_destinations(destinations)
+        self._put(destination['id'], destination)
 
     def delete_destination(self, destination_id):
-        destinations = self._load_destinations()
-        if destination_id in destinations:
-            del destinations[destination_id]
-            self._save_destinations(destinations)
-            return True
-        return False
+        return self._delete(destination_id)
+
+    def add_destinations(self, destinations):
+        """Add or replace many destinations with one write to disk."""
+        self._put_many((destination['id'], destination) for destination in destinations)
+
+    def delete_destinations(self, destination_ids):
+        """Delete many destinations with one write; returns the ids that existed."""
+        return self._delete_many(destination_ids)
 
     def get_destination_by_id(self, destination_id):
         destinations = self._load_destinations()
@@ -39,3 +69,51 @@ class DestinationDatabase:
 
     def get_all_destinations(self):
         return list(self._load_destinations().values())
+
+    def get_destinations_page(self, limit, after=None):
+        """Return up to ``limit`` destinations ordered by id, starting after
+        the ``after`` cursor, and the cursor for the next page (None at the end).
+        """
+        destinations, index = self._load_state()
+        ids = index.ids
+        start = bisect_right(ids, after) if after is not None else 0
+        page_ids = ids[start:start + limit]
+        next_after = page_ids[-1] if start + limit < len(ids) and page_ids else None
+        return [destinations[destination_id] for destination_id in page_ids], next_after
+
+    def search_destinations(self, location=None, name_prefix=None, text=None,
+                            limit=None, after=None):
+        """Destinations matching every given filter, ordered by id.
+
+        ``location`` matches exactly, ``name_prefix`` the start of the name and
+        ``text`` every word of the description, all case-insensitively.
+        Returns (destinations, next_after) like get_destinations_page.
+        """
+        destinations, index = self._load_state()
+        ids = index.search(location, name_prefix, text)
+        ids = index.ids if ids is None else sorted(ids)
+        start = bisect_right(ids, after) if after is not None else 0
+        end = len(ids) if limit is None else start + limit
+        page_ids = ids[start:end]
+        next_after = page_ids[-1] if end < len(ids) and page_ids else None
+        return [destinations[destination_id] for destination_id in page_ids], next_after
+
+    def iter_search_destinations(self, batch_size=500, location=None, name_prefix=None,
+                                 text=None):
+        """Yield the destinations matching the filters in id order, as lists
+        of up to ``batch_size``.
+
+        Matches are found and sorted once, when iteration starts, instead of
+        once per page as a cursor over search_destinations would. Destinations
+        deleted while the stream is read are skipped.
+        """
+        _, index = self._load_state()
+        ids = index.search(location, name_prefix, text)
+        ids = list(index.ids) if ids is None else sorted(ids)
+        for start in range(0, len(ids), batch_size):
+            destinations = self._load_destinations()
+            batch = [destinations.get(destination_id)
+                     for destination_id in ids[start:start + batch_size]]
+            batch = [destination for destination in batch if destination is not None]
+            if batch:
+                yield batch
@@ -1 +0,0 @@
-destinations = {'68951b87-5d1a-4b5b-b9be-979663eb4ae9': {'id': '68951b87-5d1a-4b5b-b9be-979663eb4ae9', 'name': 'Paris', 'description': 'City of Lights', 'location': 'France'}, '3f35008a-841a-49df-9446-40ba17c5eba0': {'id': '3f35008a-841a-49df-9446-40ba17c5eba0', 'name': 'Tokyo', 'description': 'Modern metropolis', 'location': 'Japan'}}
\ No newline at end of file
@@ -0,0 +1,70 @@
+# data/events.py
+import time
+from contextlib import contextmanager
+
+# Called as observer(span, seconds) after each timed storage step, e.g. by
+# the services' metrics registry; replaced, never mutated, like listeners
+_span_observers = ()
+
+
+def add_span_observer(observer):
+    global _span_observers
+    if observer not in _span_observers:
+        _span_observers = tuple(_span_observers) + (observer,)
+
+
+def remove_span_observer(observer):
+    global _span_observers
+    _span_observers = tuple(o for o in _span_observers if o is not observer)
+
+
+@contextmanager
+def timed(span):
+    """Report how long the block took to the span observers, if any."""
+    observers = _span_observers
+    if not observers:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for observer in observers:
+            observer(span, elapsed)
+
+
+class MutationListeners:
+    """Lets callers react to writes made through a database instance.
+
+    Listeners are called as ``listener(op, key, record)`` after the write is
+    persisted, where ``op`` is 'put' or 'delete'. A full rewrite of the data
+    (``_save``) is reported as ``('reset', None, None)``. Only writes made in
+    this process are reported; caches built on top must still bound their
+    lifetime for changes made by other processes.
+
+    Listeners added with ``versions=True`` are called as
+    ``listener(op, key, record, before, after)`` instead, with the values
+    ``get_version()`` had just before and just after the write (None when
+    unknown). A cache stamped with ``before`` saw every earlier write, so
+    it can apply this one and take ``after`` as its new stamp; any other
+    stamp means it missed a write, possibly from another process.
+    Listeners are called with the database lock possibly held, so they
+    must not call back into the database.
+    """
+
+    _listeners = ()
+
+    def add_listener(self, listener, versions=False):
+        self._listeners = list(self._listeners) + [(listener, versions)]
+
+    def remove_listener(self, listener):
+        self._listeners = [entry for entry in self._listeners if entry[0] is not listener]
+
+    def _notify(self, op, key=None, record=None, versions=(None, None)):
+        # _listeners is replaced, never mutated, so iterating is thread safe
+        for listener, wants_versions in self._listeners:
+            if wants_versions:
+                listener(op, key, record, *versions)
+            else:
+                listener(op, key, record)
@@ -0,0 +1,116 @@
+# data/indexes.py
+import re
+from bisect import bisect_left, insort
+
+_TOKEN = re.compile(r'\w+')
+
+def normalize(value):
+    """Case-insensitive form used by every destination index."""
+    return value.strip().casefold() if isinstance(value, str) else ''
+
+def tokenize(text):
+    return set(_TOKEN.findall(normalize(text)))
+
+class DestinationIndex:
+    """Secondary indexes over destinations, kept in sync on add/delete.
+
+    - ids: every id in sorted order, the cursor space for pages
+    - location: hash index, normalized location -> ids
+    - name: sorted list of (normalized name, id) for prefix range scans
+    - description: inverted index, token -> ids
+
+    A reload builds a new index rather than refilling this one, so searches
+    running meanwhile keep a complete view.
+    """
+
+    def __init__(self, destinations=None):
+        self.ids = []
+        self.by_location = {}
+        self.names = []
+        self.terms = {}
+        if destinations:
+            names = []
+            for destination_id, destination in destinations.items():
+                self._add_keys(destination_id, destination)
+                names.append((normalize(destination.get('name')), destination_id))
+            names.sort()
+            self.names = names
+            self.ids = sorted(destinations)
+
+    def add(self, destination_id, destination):
+        self._add_keys(destination_id, destination)
+        insort(self.names, (normalize(destination.get('name')), destination_id))
+
+    def add_many(self, items):
+        """Add (id, destination) pairs, sorting the name list once."""
+        names = []
+        for destination_id, destination in items:
+            self._add_keys(destination_id, destination)
+            names.append((normalize(destination.get('name')), destination_id))
+        # Sorted aside and swapped in whole: list.sort() empties the list
+        # while it runs, and searches may be reading it
+        self.names[:] = sorted(self.names + names)
+
+    def remove(self, destination_id, destination):
+        location = normalize(destination.get('location'))
+        ids = self.by_location.get(location)
+        if ids is not None:
+            ids.discard(destination_id)
+            if not ids:
+                del self.by_location[location]
+
+        entry = (normalize(destination.get('name')), destination_id)
+        index = bisect_left(self.names, entry)
+        if index < len(self.names) and self.names[index] == entry:
+            del self.names[index]
+
+        for token in tokenize(destination.get('description')):
+            ids = self.terms.get(token)
+            if ids is not None:
+                ids.discard(destination_id)
+                if not ids:
+                    del self.terms[token]
+
+    def _add_keys(self, destination_id, destination):
+        location = normalize(destination.get('location'))
+        self.by_location.setdefault(location, set()).add(destination_id)
+        for token in tokenize(destination.get('description')):
+            self.terms.setdefault(token, set()).add(destination_id)
+
+    def name_prefix(self, prefix):
+        prefix = normalize(prefix)
+        start = bisect_left(self.names, (prefix,))
+        ids = set()
+        for name, destination_id in self.names[start:]:
+            if not name.startswith(prefix):
+                break
+            ids.add(destination_id)
+        return ids
+
+    def text(self, query):
+        """Ids whose description contains every word of ``query``."""
+        ids = None
+        for token in tokenize(query):
+            matches = self.terms.get(token, set())
+            ids = set(matches) if ids is None else ids & matches
+            if not ids:
+                return set()
+        return ids if ids is not None else set()
+
+    def search(self, location=None, name_prefix=None, text=None):
+        """Ids matching all given filters; filters left as None are ignored."""
+        candidates = []
+        if location is not None:
+            candidates.append(self.by_location.get(normalize(location), set()))
+        if name_prefix is not None:
+            candidates.append(self.name_prefix(name_prefix))
+        if text is not None:
+            candidates.append(self.text(text))
+        if not candidates:
+            return None
+        # Intersect starting from the most selective filter
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for ids in candidates[1:]:
+            result &= ids
+        return result
@@ -0,0 +1,89 @@
+# data/locking.py
+"""Cross-process coordination for the file-backed databases.
+
+FileLock is an advisory reader/writer lock (``fcntl.flock`` on a sidecar
+``.lock`` file): any number of processes may hold it shared while they read,
+a writer holds it exclusively. On platforms without ``fcntl`` (Windows) the
+lock degrades to a no-op and only the in-process locks remain.
+
+atomic_open writes to a temporary file in the target directory and renames
+it over the target, so readers always see either the old or the new file and
+never a truncated one.
+"""
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        # Lock held by the current thread: nested acquisitions are no-ops
+        self._local = threading.local()
+
+    def shared(self):
+        return self._acquire(exclusive=False)
+
+    def exclusive(self):
+        return self._acquire(exclusive=True)
+
+    @contextmanager
+    def _acquire(self, exclusive):
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            if exclusive and not self._local.exclusive:
+                raise RuntimeError(f"Cannot upgrade a shared lock on {self.path}")
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        # Every acquisition uses its own descriptor, so threads of one
+        # process exclude each other exactly like separate processes do.
+        # O_CLOEXEC keeps it out of exec'd children; see below for fork.
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_CLOEXEC', 0), 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._local.depth = 1
+            self._local.exclusive = exclusive
+            yield
+        finally:
+            self._local.depth = 0
+            # A flock belongs to the open file description, which a child
+            # forked meanwhile shares; closing only our descriptor would
+            # leave the lock held for as long as the child lives.
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+
+@contextmanager
+def atomic_open(path, mode='w', **kwargs):
+    """Open a temporary file that replaces ``path`` once the block succeeds."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
+    try:
+        # mkstemp creates 0600 files; keep the usual data file permissions
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,134 @@
+# data/records.py
+"""Compact record types for the resident user and destination data.
+
+Used only when a database is opened with ``compact_records=True`` (see
+TRAVEL_COMPACT_RECORDS in data/backends.py); by default records stay
+plain dicts. It is a trade of speed for memory: a record stores each of
+its type's common fields in a slot instead of a per-record dict, so a
+user record takes 80 bytes before its values, where the dict took 184,
+and repeated values such as roles and locations are interned so every
+record shares one string object for each. In exchange, loading builds
+one object per record and encoding a listing converts every record back
+to a dict. Fields outside the common set are kept in a small dict of
+extras, so records still round-trip whatever the files hold.
+
+Records are read-only mappings: lookups, ``get``, ``in``, iteration,
+``**record`` and comparison with dicts all behave as for the dicts they
+replace. Writers build a new dict and store it. JSON encoders turn
+records back into dicts through ``json_default``.
+"""
+import sys
+from collections.abc import Mapping
+
+_MISSING = object()
+
+
+class Record(Mapping):
+    """Base class; subclasses name their slots in ``fields``."""
+
+    __slots__ = ('_extra',)
+    fields = ()
+    # Fields whose string values are interned
+    interned = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.fields)
+        cls._interned_set = frozenset(cls.interned)
+
+    def __init__(self, data):
+        extra = None
+        for key, value in data.items():
+            if key in self._field_set:
+                if key in self._interned_set and type(value) is str:
+                    value = sys.intern(value)
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    @classmethod
+    def of(cls, data):
+        """``data`` as a record of this type, without copying one already."""
+        return data if type(data) is cls else cls(data)
+
+    def to_dict(self):
+        """A plain dict copy, e.g. for JSON encoding."""
+        data = {}
+        for field in self.fields:
+            value = getattr(self, field, _MISSING)
+            if value is not _MISSING:
+                data[field] = value
+        if self._extra is not None:
+            data.update(self._extra)
+        return data
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra is not None else default
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for field in self.fields:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+    def __reduce__(self):
+        return type(self), (self.to_dict(),)
+
+
+class UserRecord(Record):
+    __slots__ = fields = ('id', 'name', 'email', 'password', 'role')
+    interned = ('role',)
+
+
+class DestinationRecord(Record):
+    __slots__ = fields = ('id', 'name', 'description', 'location')
+    interned = ('location',)
+
+
+def json_default(value):
+    """``default=`` hook for json.dumps and orjson.dumps that encodes records."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def plain(records):
+    """Copy of a dict of records with every record as a plain dict."""
+    return {key: record.to_dict() if isinstance(record, Record) else record
+            for key, record in records.items()}
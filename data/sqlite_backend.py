@@ -0,0 +1,446 @@
+# data/sqlite_backend.py
+"""SQLite implementations of UserDatabase and DestinationDatabase.
+
+Records are stored as JSON next to the columns we look them up by, so any
+extra fields a caller stores round-trip unchanged. The database runs in WAL
+mode, which lets the three services and their workers read concurrently
+while one of them writes, instead of racing on whole-file rewrites.
+"""
+import json
+import os
+import sqlite3
+import threading
+import weakref
+
+from data.events import MutationListeners
+from data.indexes import normalize, tokenize
+from data.records import json_default
+from data.users import normalize_email
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'travel.db')
+
+# SQLite connections must not be used across fork(): a forked child (a
+# pre-forked server worker) drops every inherited connection and opens its
+# own. The inherited ones stay referenced here, never closed, so the child
+# cannot release locks or shared memory the parent still relies on.
+_databases = weakref.WeakSet()
+_inherited_connections = []
+
+
+def _after_fork_in_child():
+    for database in list(_databases):
+        _inherited_connections.extend(database._connections)
+        database._connections = set()
+        database._connections_lock = threading.Lock()
+        database._local = threading.local()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class _ConnectionHolder:
+    """A thread's connection; dropped with the thread's locals when it exits."""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+def _close_thread_connection(database_ref, conn, pid):
+    # Runs when the owning thread has exited. A forked child leaves the
+    # connections it inherited alone, as described above.
+    if os.getpid() != pid:
+        return
+    database = database_ref()
+    if database is not None:
+        with database._connections_lock:
+            database._connections.discard(conn)
+    conn.close()
+
+
+class SQLiteDatabase(MutationListeners):
+    """Per-thread connections plus schema setup for one database file.
+
+    Each thread opens its own connection on first use, and the connection
+    is closed when the thread exits. Servers that start a thread per
+    request therefore keep only as many connections as live threads.
+    """
+
+    collection = None
+    schema = ()
+
+    def __init__(self, path=DEFAULT_PATH, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        _databases.add(self)
+        with self._connection() as conn:
+            for statement in self.schema:
+                conn.execute(statement)
+            self._migrate(conn)
+            for statement in self._version_schema():
+                conn.execute(statement)
+
+    def _migrate(self, conn):
+        """Bring databases created by older versions up to the current schema."""
+
+    def _version_schema(self):
+        # Triggers bump the collection's counter in the same transaction as
+        # the write, whichever process or connection made it. The random
+        # epoch keeps versions of a recreated database file from colliding.
+        table = self.collection
+        yield ('CREATE TABLE IF NOT EXISTS versions ('
+               ' collection TEXT PRIMARY KEY,'
+               ' epoch TEXT NOT NULL DEFAULT (lower(hex(randomblob(4)))),'
+               ' version INTEGER NOT NULL DEFAULT 0)')
+        yield f"INSERT OR IGNORE INTO versions (collection) VALUES ('{table}')"
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            yield (f'CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} '
+                   f'AFTER {event} ON {table} BEGIN '
+                   f"UPDATE versions SET version = version + 1 WHERE collection = '{table}'; END")
+
+    def get_version(self):
+        """Opaque string that changes whenever the collection changes."""
+        return self._read_version(self._connection())
+
+    def _read_version(self, conn):
+        epoch, version = conn.execute(
+            'SELECT epoch, version FROM versions WHERE collection = ?', (self.collection,)
+        ).fetchone()
+        return f'{epoch}-{version}'
+
+    def _begin_write(self, conn):
+        """Start a write transaction and return the version it starts from.
+
+        With the write lock taken up front, no other writer can come
+        between this version and the one read before committing, which
+        listeners receive as the (before, after) pair.
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        return self._read_version(conn)
+
+    def _connection(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            # sqlite3 caches compiled statements per connection, so the
+            # fixed, parameterized SQL below is prepared once per thread.
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   check_same_thread=False, cached_statements=128)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Bulk writes touch many index pages; the default cache is 2 MB
+            conn.execute('PRAGMA cache_size=-32768')
+            conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+            holder = self._local.holder = _ConnectionHolder(conn)
+            with self._connections_lock:
+                self._connections.add(conn)
+            weakref.finalize(holder, _close_thread_connection, weakref.ref(self), conn, os.getpid())
+        return holder.conn
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = set()
+        self._local = threading.local()
+
+
+class SQLiteUserDatabase(SQLiteDatabase):
+    collection = 'users'
+    schema = (
+        'CREATE TABLE IF NOT EXISTS users ('
+        ' id TEXT PRIMARY KEY,'
+        ' email_key TEXT,'
+        ' data TEXT NOT NULL)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email_key)',
+    )
+
+    def _write(self, conn, user):
+        email = user.get('email')
+        conn.execute(
+            'INSERT INTO users (id, email_key, data) VALUES (?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET email_key = excluded.email_key, data = excluded.data',
+            (user['id'], normalize_email(email) if email else None,
+             json.dumps(user, default=json_default))
+        )
+
+    def add_user(self, user):
+        """Store ``user``; returns False if another user already has its email."""
+        conn = self._connection()
+        try:
+            with conn:
+                before = self._begin_write(conn)
+                self._write(conn, user)
+                versions = (before, self._read_version(conn))
+        except sqlite3.IntegrityError:
+            return False
+        self._notify('put', user['id'], user, versions)
+        return True
+
+    def add_users(self, users):
+        """Store many users in one transaction; returns one bool per user,
+        False where the email is already taken."""
+        results = []
+        added = []
+        conn = self._connection()
+        with conn:
+            before = self._begin_write(conn)
+            for user in users:
+                try:
+                    # A failed statement leaves the rest of the transaction intact
+                    self._write(conn, user)
+                except sqlite3.IntegrityError:
+                    results.append(False)
+                    continue
+                added.append(user)
+                results.append(True)
+            versions = (before, self._read_version(conn))
+        for user in added:
+            self._notify('put', user['id'], user, versions)
+        return results
+
+    def update_user(self, user_id, changes):
+        conn = self._connection()
+        try:
+            with conn:
+                # Take the write lock up front so the read below is current
+                before = self._begin_write(conn)
+                row = conn.execute('SELECT data FROM users WHERE id = ?', (user_id,)).fetchone()
+                if row is None:
+                    return None
+                updated = {**json.loads(row[0]), **changes, 'id': user_id}
+                self._write(conn, updated)
+                versions = (before, self._read_version(conn))
+        except sqlite3.IntegrityError:
+            return None
+        self._notify('put', user_id, updated, versions)
+        return updated
+
+    def delete_user(self, user_id):
+        conn = self._connection()
+        with conn:
+            before = self._begin_write(conn)
+            cursor = conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            versions = (before, self._read_version(conn))
+        if cursor.rowcount > 0:
+            self._notify('delete', user_id, None, versions)
+            return True
+        return False
+
+    def get_user_by_id(self, user_id):
+        row = self._connection().execute(
+            'SELECT data FROM users WHERE id = ?', (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_users_by_ids(self, user_ids):
+        """Look up many users in one query per chunk; missing ids are omitted."""
+        user_ids = list(dict.fromkeys(user_ids))
+        conn = self._connection()
+        users = {}
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f'SELECT id, data FROM users WHERE id IN ({placeholders})', chunk)
+            users.update((user_id, json.loads(data)) for user_id, data in rows)
+        return users
+
+    def get_user_by_email(self, email):
+        row = self._connection().execute(
+            'SELECT data FROM users WHERE email_key = ?', (normalize_email(email),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all_users(self):
+        rows = self._connection().execute('SELECT data FROM users ORDER BY rowid')
+        return [json.loads(data) for (data,) in rows]
+
+
+class SQLiteDestinationDatabase(SQLiteDatabase):
+    collection = 'destinations'
+    # location_key/name_key hold the normalized values from data/indexes.py
+    # and destination_terms is the inverted index over description words,
+    # so searches give the same results as the file backend.
+    schema = (
+        'CREATE TABLE IF NOT EXISTS destinations ('
+        ' id TEXT PRIMARY KEY,'
+        ' data TEXT NOT NULL,'
+        ' location_key TEXT,'
+        ' name_key TEXT)',
+        'CREATE TABLE IF NOT EXISTS destination_terms ('
+        ' token TEXT NOT NULL,'
+        ' id TEXT NOT NULL,'
+        ' PRIMARY KEY (token, id)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS destination_terms_id ON destination_terms (id)',
+    )
+    indexes = (
+        'CREATE INDEX IF NOT EXISTS destinations_location ON destinations (location_key)',
+        'CREATE INDEX IF NOT EXISTS destinations_name ON destinations (name_key)',
+    )
+
+    def _migrate(self, conn):
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(destinations)')}
+        if 'location_key' not in columns:
+            conn.execute('ALTER TABLE destinations ADD COLUMN location_key TEXT')
+            conn.execute('ALTER TABLE destinations ADD COLUMN name_key TEXT')
+            rows = conn.execute('SELECT data FROM destinations').fetchall()
+            self._write(conn, [json.loads(data) for (data,) in rows])
+        for statement in self.indexes:
+            conn.execute(statement)
+
+    def _write(self, conn, destinations):
+        """Upsert ``destinations`` and their description terms."""
+        conn.executemany(
+            'INSERT INTO destinations (id, data, location_key, name_key) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET data = excluded.data, '
+            'location_key = excluded.location_key, name_key = excluded.name_key',
+            [(d['id'], json.dumps(d, default=json_default), normalize(d.get('location')),
+              normalize(d.get('name'))) for d in destinations]
+        )
+        conn.executemany('DELETE FROM destination_terms WHERE id = ?',
+                         [(d['id'],) for d in destinations])
+        # Sorted rows land next to each other in the (token, id) B-tree
+        conn.executemany(
+            'INSERT OR IGNORE INTO destination_terms (token, id) VALUES (?, ?)',
+            sorted((token, d['id']) for d in destinations
+                   for token in tokenize(d.get('description')))
+        )
+
+    def add_destination(self, destination):
+        conn = self._connection()
+        with conn:
+            before = self._begin_write(conn)
+            self._write(conn, [destination])
+            versions = (before, self._read_version(conn))
+        self._notify('put', destination['id'], destination, versions)
+
+    def delete_destination(self, destination_id):
+        conn = self._connection()
+        with conn:
+            before = self._begin_write(conn)
+            cursor = conn.execute('DELETE FROM destinations WHERE id = ?', (destination_id,))
+            conn.execute('DELETE FROM destination_terms WHERE id = ?', (destination_id,))
+            versions = (before, self._read_version(conn))
+        if cursor.rowcount > 0:
+            self._notify('delete', destination_id, None, versions)
+            return True
+        return False
+
+    def add_destinations(self, destinations):
+        """Add or replace many destinations in one transaction."""
+        destinations = list(destinations)
+        conn = self._connection()
+        with conn:
+            before = self._begin_write(conn)
+            self._write(conn, destinations)
+            versions = (before, self._read_version(conn))
+        for destination in destinations:
+            self._notify('put', destination['id'], destination, versions)
+
+    def delete_destinations(self, destination_ids):
+        """Delete many destinations in one transaction; returns the ids that existed."""
+        deleted = []
+        conn = self._connection()
+        with conn:
+            before = self._begin_write(conn)
+            for destination_id in destination_ids:
+                cursor = conn.execute('DELETE FROM destinations WHERE id = ?', (destination_id,))
+                if cursor.rowcount > 0:
+                    conn.execute('DELETE FROM destination_terms WHERE id = ?', (destination_id,))
+                    deleted.append(destination_id)
+            versions = (before, self._read_version(conn))
+        for destination_id in deleted:
+            self._notify('delete', destination_id, None, versions)
+        return deleted
+
+    def get_destination_by_id(self, destination_id):
+        row = self._connection().execute(
+            'SELECT data FROM destinations WHERE id = ?', (destination_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all_destinations(self):
+        rows = self._connection().execute('SELECT data FROM destinations ORDER BY rowid')
+        return [json.loads(data) for (data,) in rows]
+
+    def get_destinations_page(self, limit, after=None):
+        # Fetch one extra row to know whether another page follows
+        rows = self._connection().execute(
+            'SELECT id, data FROM destinations WHERE id > ? ORDER BY id LIMIT ?',
+            ('' if after is None else after, limit + 1)
+        ).fetchall()
+        next_after = rows[limit - 1][0] if len(rows) > limit else None
+        return [json.loads(data) for _, data in rows[:limit]], next_after
+
+    @staticmethod
+    def _search_clauses(location=None, name_prefix=None, text=None):
+        """WHERE clauses and parameters for the filters; None if nothing can match."""
+        clauses, params = [], []
+        if location is not None:
+            clauses.append('location_key = ?')
+            params.append(normalize(location))
+        if name_prefix is not None:
+            prefix = normalize(name_prefix)
+            clauses.append('name_key >= ? AND name_key < ?')
+            params += [prefix, prefix + '\U0010ffff']
+        if text is not None:
+            tokens = sorted(tokenize(text))
+            if not tokens:
+                return None
+            for token in tokens:
+                clauses.append('id IN (SELECT id FROM destination_terms WHERE token = ?)')
+                params.append(token)
+        return clauses, params
+
+    def search_destinations(self, location=None, name_prefix=None, text=None,
+                            limit=None, after=None):
+        search = self._search_clauses(location, name_prefix, text)
+        if search is None:
+            return [], None
+        clauses, params = search
+        if after is not None:
+            clauses.append('id > ?')
+            params.append(after)
+        sql = 'SELECT id, data FROM destinations'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit + 1)
+        rows = self._connection().execute(sql, params).fetchall()
+        next_after = rows[limit - 1][0] if limit is not None and len(rows) > limit else None
+        rows = rows if limit is None else rows[:limit]
+        return [json.loads(data) for _, data in rows], next_after
+
+    def iter_search_destinations(self, batch_size=500, location=None, name_prefix=None,
+                                 text=None):
+        """Yield the matching destinations in id order, as lists of up to ``batch_size``.
+
+        The matching ids are selected once; each batch is then read by
+        primary key, rather than re-running the filtered, sorted query
+        once per page.
+        """
+        search = self._search_clauses(location, name_prefix, text)
+        if search is None:
+            return
+        clauses, params = search
+        sql = 'SELECT id FROM destinations'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        conn = self._connection()
+        ids = [destination_id for (destination_id,) in conn.execute(sql + ' ORDER BY id', params)]
+        for start in range(0, len(ids), batch_size):
+            batch = []
+            # Stay well below SQLite's limit on bound parameters
+            for chunk_start in range(start, min(start + batch_size, len(ids)), 500):
+                chunk = ids[chunk_start:min(chunk_start + 500, start + batch_size)]
+                placeholders = ','.join('?' * len(chunk))
+                batch += conn.execute(
+                    f'SELECT id, data FROM destinations WHERE id IN ({placeholders}) ORDER BY id',
+                    chunk).fetchall()
+            if batch:
+                yield [json.loads(data) for _, data in batch]
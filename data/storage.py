@@ -0,0 +1,135 @@
+# data/storage.py
+"""On-disk formats for the record files behind UserDatabase and DestinationDatabase.
+
+Every format stores a dict of records keyed by id. The format is picked from
+the file extension, so existing ``*_data.py`` files keep working and new
+deployments get the faster JSON encoding by default. Every dump replaces the
+file atomically, so a concurrent reader never sees a half-written file.
+"""
+import ast
+import json
+import os
+import struct
+
+from data.locking import atomic_open
+from data.records import json_default, plain
+
+
+class StorageFormat:
+    """Base class: load and dump a dict of records to a file."""
+
+    extension = None
+
+    def __init__(self, name):
+        # Name of the collection ('users', 'destinations'); only the legacy
+        # format writes it to disk, but it makes error messages readable.
+        self.name = name
+
+    def load(self, path):
+        raise NotImplementedError
+
+    def dump(self, path, records):
+        raise NotImplementedError
+
+
+class PythonLiteralFormat(StorageFormat):
+    """Legacy ``users = {...}`` files written with repr().
+
+    The file is parsed with ``ast`` and only literal values are accepted, so
+    loading never executes code from the data file.
+    """
+
+    extension = '.py'
+
+    def load(self, path):
+        with open(path, 'r') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in tree.body:
+            if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                    and isinstance(node.targets[0], ast.Name)
+                    and node.targets[0].id == self.name):
+                return ast.literal_eval(node.value)
+        raise ValueError(f"{path} does not define '{self.name}'")
+
+    def dump(self, path, records):
+        with atomic_open(path, 'w') as f:
+            f.write(f"{self.name} = {repr(plain(records))}")
+
+
+class JSONFormat(StorageFormat):
+    """A single JSON object mapping id to record."""
+
+    extension = '.json'
+
+    def load(self, path):
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def dump(self, path, records):
+        # One dumps() call is much faster than json.dump's chunked writes
+        with atomic_open(path, 'w') as f:
+            f.write(json.dumps(records, separators=(',', ':'), default=json_default))
+
+
+class RecordFormat(StorageFormat):
+    """Length-prefixed binary records.
+
+    The file starts with a magic header followed by one frame per record:
+    a 4-byte big-endian length and a UTF-8 JSON ``[id, record]`` payload.
+    """
+
+    extension = '.rec'
+    MAGIC = b'TRVREC1\n'
+    _length = struct.Struct('>I')
+
+    def load(self, path):
+        records = {}
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(self.MAGIC):
+            raise ValueError(f"{path} is not a {self.name} record file")
+        offset = len(self.MAGIC)
+        size = self._length.size
+        loads = json.loads
+        while offset < len(data):
+            if offset + size > len(data):
+                raise ValueError(f"{path} is truncated")
+            (length,) = self._length.unpack_from(data, offset)
+            offset += size
+            if offset + length > len(data):
+                raise ValueError(f"{path} is truncated")
+            key, record = loads(data[offset:offset + length])
+            records[key] = record
+            offset += length
+        return records
+
+    def dump(self, path, records):
+        pack = self._length.pack
+        dumps = json.dumps
+        with atomic_open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            for key, record in records.items():
+                payload = dumps([key, record], separators=(',', ':'),
+                                default=json_default).encode('utf-8')
+                f.write(pack(len(payload)))
+                f.write(payload)
+
+
+FORMATS = {
+    fmt.extension: fmt for fmt in (PythonLiteralFormat, JSONFormat, RecordFormat)
+}
+
+
+def get_format(path, name):
+    """Return the storage format instance for ``path`` based on its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported data file extension: '{extension}'")
+    return FORMATS[extension](name)
+
+
+def migrate(source, target, name):
+    """Copy all records from ``source`` into ``target``, converting formats."""
+    records = get_format(source, name).load(source)
+    get_format(target, name).dump(target, records)
+    return len(records)
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from data import columnar
+from data.columnar import DestinationColumns
+from data.destinations import DestinationDatabase
+
+DESTINATIONS = [
+    {'id': 'd4', 'name': 'kyoto', 'description': 'Temples and gardens', 'location': 'Japan'},
+    {'id': 'd1', 'name': 'Paris', 'description': 'City of Lights', 'location': 'France'},
+    {'id': 'd3', 'name': 'Tokyo', 'description': 'Modern city, old temples', 'location': 'japan '},
+    {'id': 'd2', 'name': 'Lyon', 'description': 'Food city', 'location': 'France'},
+    {'id': 'd5', 'name': 'Straße', 'description': 'Große Straße', 'location': 'Germany'},
+    {'id': 'd6', 'location': 'Peru'},
+]
+
+class TestDestinationColumns(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.columns = DestinationColumns(DESTINATIONS)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def ids(self, **kwargs):
+        records, _ = self.columns.query(fields=['id'], **kwargs)
+        return [record['id'] for record in records]
+
+    def test_columns_and_records(self):
+        self.assertEqual(self.columns.ids, ['d1', 'd2', 'd3', 'd4', 'd5', 'd6'])
+        self.assertEqual(self.columns.locations, ['France', 'japan ', 'Japan', 'Germany', 'Peru'])
+        self.assertEqual(self.columns.record(0), DESTINATIONS[1])
+        self.assertEqual(self.columns.record(5),
+                         {'id': 'd6', 'name': '', 'description': '', 'location': 'Peru'})
+        self.assertEqual(self.columns.record(2, ['name', 'unknown']), {'name': 'Tokyo'})
+
+    def test_filters_match_the_search_index(self):
+        db = DestinationDatabase(os.path.join(self.test_dir, 'destinations.json'))
+        db.add_destinations(DESTINATIONS)
+        for filters in ({'location': 'JAPAN'}, {'location': 'Nowhere'}, {'name_prefix': 'ly'},
+                        {'name_prefix': ''}, {'text': 'city'}, {'text': 'temples city'},
+                        {'text': 'strasse'}, {'text': 'temple'}, {'text': 'ity'}, {'text': '  '},
+                        {'location': 'france', 'text': 'CITY'}):
+            expected = [d['id'] for d in db.search_destinations(**filters)[0]]
+            self.assertEqual(self.ids(**filters), expected, filters)
+            self.assertEqual(self.columns.count(**filters), len(expected), filters)
+        db.close()
+
+    def test_sort_and_slice(self):
+        self.assertEqual(self.ids(sort='name'), ['d6', 'd4', 'd2', 'd1', 'd5', 'd3'])
+        self.assertEqual(self.ids(sort='-name', limit=2), ['d3', 'd5'])
+        # Japan and 'japan ' sort together, ties in id order
+        self.assertEqual(self.ids(sort='location'), ['d1', 'd2', 'd5', 'd3', 'd4', 'd6'])
+        self.assertEqual(self.ids(sort='location', location='japan'), ['d3', 'd4'])
+        self.assertEqual(self.ids(sort='-name', text='nothing'), [])
+        self.assertEqual(self.ids(sort='name', text=' '), [])
+        records, total = self.columns.query(text='city', sort='-id', offset=1, limit=1)
+        self.assertEqual(([r['id'] for r in records], total), (['d2'], 3))
+        with self.assertRaises(ValueError):
+            self.columns.query(sort='description')
+
+    def test_count_by_location(self):
+        self.assertEqual(self.columns.count_by_location(),
+                         {'France': 2, 'japan ': 2, 'Germany': 1, 'Peru': 1})
+        self.assertEqual(self.columns.count_by_location(text='city'),
+                         {'France': 2, 'japan ': 1})
+        self.assertEqual(self.columns.count_by_location(location='nowhere'), {})
+        self.assertEqual(DestinationColumns([]).count_by_location(), {})
+
+class TestWithoutNumpy(TestDestinationColumns):
+    """The same checks on the stdlib fallback"""
+
+    def run(self, result=None):
+        with mock.patch.object(columnar, 'numpy', None):
+            return super().run(result)
+
+if __name__ == '__main__':
+    unittest.main()
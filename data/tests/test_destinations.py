@@ -1,7 +1,11 @@
 import unittest
 import os
 import shutil
+import sys
 import tempfile
+import threading
+import time
+from unittest.mock import patch
 from data.destinations import DestinationDatabase
 
 class TestDestinationDatabase(unittest.TestCase):
@@ -109,5 +113,192 @@ class TestDestinationDatabase(unittest.TestCase):
         self.assertEqual(loaded_destination['name'], 'Updated Paris')
         self.assertEqual(loaded_destination['description'], 'Updated description')
 
+    def test_reads_are_served_from_cache(self):
+        """Test that unchanged files are not re-parsed on every read"""
+        self.db.add_destination(self.sample_destination)
+        first = self.db._load_destinations()
+
+        with patch.object(self.db.storage, 'load') as mock_load:
+            self.db.get_all_destinations()
+            self.db.get_destination_by_id('dest123')
+            mock_load.assert_not_called()
+
+        self.assertIs(self.db._load_destinations(), first)
+
+    def test_cache_reloads_after_external_write(self):
+        """Test that a rewrite by another process invalidates the cache"""
+        self.db.add_destination(self.sample_destination)
+        self.assertIsNotNone(self.db.get_destination_by_id('dest123'))
+
+        # Another instance (e.g. another worker) rewrites the file
+        other_db = DestinationDatabase(filename=self.test_db_file)
+        other_db.delete_destination('dest123')
+        other_db.add_destination({'id': 'dest789', 'name': 'Rome'})
+
+        self.assertIsNone(self.db.get_destination_by_id('dest123'))
+        self.assertEqual(self.db.get_destination_by_id('dest789')['name'], 'Rome')
+
+    def test_get_destinations_page(self):
+        """Test cursor pagination in id order across add and delete"""
+        for key in ('c', 'a', 'e', 'b', 'd'):
+            self.db.add_destination({'id': key, 'name': key.upper()})
+        self.db.delete_destination('c')
+
+        page, after = self.db.get_destinations_page(2)
+        self.assertEqual([d['id'] for d in page], ['a', 'b'])
+        self.assertEqual(after, 'b')
+
+        page, after = self.db.get_destinations_page(2, after)
+        self.assertEqual([d['id'] for d in page], ['d', 'e'])
+        self.assertIsNone(after)
+
+        # A cursor that was deleted meanwhile still resumes in order
+        page, after = self.db.get_destinations_page(10, 'c')
+        self.assertEqual([d['id'] for d in page], ['d', 'e'])
+
+    def test_search_destinations(self):
+        """Test location, name-prefix and description search through the indexes"""
+        self.db.add_destination({'id': 'a', 'name': 'Paris', 'location': 'France',
+                                 'description': 'City of Light'})
+        self.db.add_destination({'id': 'b', 'name': 'Lyon', 'location': 'france',
+                                 'description': 'Food city'})
+        self.db.add_destination({'id': 'c', 'name': 'Parma', 'location': 'Italy',
+                                 'description': 'Ham and cheese'})
+
+        def ids(**filters):
+            return [d['id'] for d in self.db.search_destinations(**filters)[0]]
+
+        self.assertEqual(ids(location=' FRANCE '), ['a', 'b'])
+        self.assertEqual(ids(name_prefix='par'), ['a', 'c'])
+        self.assertEqual(ids(text='city'), ['a', 'b'])
+        self.assertEqual(ids(text='light CITY'), ['a'])
+        self.assertEqual(ids(location='france', name_prefix='p', text='city'), ['a'])
+        self.assertEqual(ids(text='nowhere'), [])
+        self.assertEqual(ids(), ['a', 'b', 'c'])
+
+        # Updates and deletes move the record out of its old index entries
+        self.db.add_destination({'id': 'a', 'name': 'Nice', 'location': 'France',
+                                 'description': 'Riviera'})
+        self.db.delete_destination('b')
+        self.assertEqual(ids(name_prefix='par'), ['c'])
+        self.assertEqual(ids(text='city'), [])
+        self.assertEqual(ids(location='france'), ['a'])
+
+    def test_search_destinations_page(self):
+        """Test that search results paginate with the same cursor as listing"""
+        for key in ('d', 'a', 'c', 'b'):
+            self.db.add_destination({'id': key, 'location': 'Spain'})
+        self.db.add_destination({'id': 'x', 'location': 'Peru'})
+
+        page, after = self.db.search_destinations(location='spain', limit=3)
+        self.assertEqual([d['id'] for d in page], ['a', 'b', 'c'])
+        self.assertEqual(after, 'c')
+        page, after = self.db.search_destinations(location='spain', limit=3, after=after)
+        self.assertEqual([d['id'] for d in page], ['d'])
+        self.assertIsNone(after)
+
+    def test_iter_search_destinations(self):
+        """Test streaming search results in batches from a single search"""
+        for key in ('d', 'a', 'c', 'b', 'e'):
+            self.db.add_destination({'id': key, 'location': 'Spain'})
+        self.db.add_destination({'id': 'x', 'location': 'Peru'})
+
+        _, index = self.db._load_state()
+        with patch.object(index, 'search', wraps=index.search) as search:
+            batches = self.db.iter_search_destinations(2, location='spain')
+            self.assertEqual([d['id'] for d in next(batches)], ['a', 'b'])
+            # Deleted mid-stream: skipped
+            self.db.delete_destination('c')
+            self.assertEqual([[d['id'] for d in batch] for batch in batches], [['d'], ['e']])
+        self.assertEqual(search.call_count, 1)
+        self.assertEqual(list(self.db.iter_search_destinations(2, text=' ')), [])
+
+    def test_version_changes_on_every_write(self):
+        """Test that the dataset version tracks local and external writes"""
+        versions = [self.db.get_version()]
+        self.assertEqual(self.db.get_version(), versions[0])
+
+        self.db.add_destination(self.sample_destination)
+        versions.append(self.db.get_version())
+        self.db.add_destination({**self.sample_destination, 'name': 'Paris, France'})
+        versions.append(self.db.get_version())
+
+        other_db = DestinationDatabase(filename=self.test_db_file)
+        other_db.delete_destination('dest123')
+        versions.append(self.db.get_version())
+
+        self.assertEqual(len(set(versions)), 4)
+
+    def test_bulk_add_keeps_indexes_consistent(self):
+        """Test search and pagination after large and small batches"""
+        self.db.add_destinations([{'id': f'{i:02}', 'location': 'Chile'} for i in range(20)])
+        self.db.add_destinations([{'id': '05', 'location': 'Peru'}, {'id': '99', 'location': 'Chile'}])
+        self.db.delete_destinations(['00', '01'])
+
+        chile = [d['id'] for d in self.db.search_destinations(location='chile')[0]]
+        self.assertEqual(chile, [f'{i:02}' for i in range(2, 20) if i != 5] + ['99'])
+        page, after = self.db.get_destinations_page(3)
+        self.assertEqual([d['id'] for d in page], ['02', '03', '04'])
+
+    def test_reload_builds_a_new_index(self):
+        """Test that a reload leaves the index a running search holds untouched"""
+        self.db.add_destinations([{'id': key, 'location': 'Chile'} for key in 'abc'])
+        _, index = self.db._load_state()
+        other = DestinationDatabase(filename=self.test_db_file)
+        other.add_destination({'id': 'p', 'location': 'Peru'})
+        other.close()
+
+        _, reloaded = self.db._load_state()
+        self.assertIsNot(reloaded, index)
+        self.assertEqual(index.search(location='chile'), {'a', 'b', 'c'})
+        self.assertEqual((index.search(location='peru'), index.ids), (set(), ['a', 'b', 'c']))
+        self.assertEqual(reloaded.search(location='peru'), {'p'})
+        self.assertEqual(reloaded.ids, ['a', 'b', 'c', 'p'])
+
+    def test_reads_during_reloads_and_writes(self):
+        """Test paging and search while another instance writes and this one reloads"""
+        self.db.add_destinations([{'id': f'{i:05}', 'location': 'Chile'} for i in range(300)])
+        writer = DestinationDatabase(filename=self.test_db_file)
+        stop = time.monotonic() + 1.5
+        errors = []
+        # Switch threads often so the reads interleave with reloads and writes
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+
+        def write():
+            count = 0
+            while time.monotonic() < stop:
+                writer.add_destination({'id': f'new{count}', 'location': 'Peru'})
+                writer.delete_destination(f'new{count - 1}')
+                count += 1
+                # Leave time for reads between the reloads
+                time.sleep(0.001)
+
+        def read():
+            while time.monotonic() < stop:
+                try:
+                    self.check_consistent_read()
+                except Exception as exc:
+                    errors.append(exc)
+                    return
+
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read)
+                                                      for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        writer.close()
+        self.assertEqual(errors, [])
+
+    def check_consistent_read(self):
+        after = None
+        while True:
+            _, after = self.db.get_destinations_page(100, after)
+            if after is None:
+                break
+        # The other instance only writes elsewhere, so this must stay complete
+        self.assertEqual(len(self.db.search_destinations(location='chile')[0]), 300)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
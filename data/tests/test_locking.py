@@ -0,0 +1,162 @@
+import unittest
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from data.locking import FileLock, atomic_open, fcntl
+from data.destinations import DestinationDatabase
+
+def _add_destinations(db_file, worker, count):
+    db = DestinationDatabase(db_file, compact_every=7)
+    for i in range(count):
+        db.add_destination({'id': f'{worker}-{i}', 'name': f'Place {i}'})
+    db.close()
+
+class TestAtomicOpen(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, 'data.json')
+        with open(self.path, 'w') as f:
+            f.write('original')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_replaces_file(self):
+        """Test that the new content replaces the target"""
+        with atomic_open(self.path) as f:
+            f.write('updated')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'updated')
+        self.assertEqual(os.listdir(self.test_dir), ['data.json'])
+
+    def test_failed_write_keeps_original(self):
+        """Test that a failure mid-write leaves the old file intact"""
+        with self.assertRaises(RuntimeError):
+            with atomic_open(self.path) as f:
+                f.write('half')
+                raise RuntimeError('disk full')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'original')
+        self.assertEqual(os.listdir(self.test_dir), ['data.json'])
+
+@unittest.skipIf(fcntl is None, 'fcntl is not available on this platform')
+class TestFileLock(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.lock = FileLock(os.path.join(self.test_dir, 'data.json.lock'))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _hold(self, mode, acquired, release):
+        with getattr(self.lock, mode)():
+            acquired.set()
+            release.wait(5)
+
+    def test_shared_locks_coexist(self):
+        """Test that readers do not block each other"""
+        acquired, release = threading.Event(), threading.Event()
+        holder = threading.Thread(target=self._hold, args=('shared', acquired, release))
+        holder.start()
+        acquired.wait(5)
+
+        other = FileLock(self.lock.path)
+        start = time.monotonic()
+        with other.shared():
+            waited = time.monotonic() - start
+        release.set()
+        holder.join()
+        self.assertLess(waited, 1)
+
+    def test_exclusive_blocks_readers(self):
+        """Test that a reader waits for the writer to finish"""
+        acquired, release = threading.Event(), threading.Event()
+        holder = threading.Thread(target=self._hold, args=('exclusive', acquired, release))
+        holder.start()
+        acquired.wait(5)
+
+        threading.Timer(0.2, release.set).start()
+        start = time.monotonic()
+        with self.lock.shared():
+            waited = time.monotonic() - start
+        holder.join()
+        self.assertGreaterEqual(waited, 0.15)
+
+    def test_nested_acquisition(self):
+        """Test re-entrance and that shared locks cannot be upgraded"""
+        with self.lock.exclusive():
+            with self.lock.shared():
+                pass
+        with self.lock.shared():
+            with self.assertRaises(RuntimeError):
+                with self.lock.exclusive():
+                    pass
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+    def test_forked_child_does_not_keep_lock(self):
+        """Test that releasing works while a child forked under the lock lives on"""
+        read, write = os.pipe()
+        with self.lock.shared():
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    os.close(write)
+                    os.read(read, 1)
+                finally:
+                    os._exit(0)
+        os.close(read)
+        try:
+            fd = os.open(self.lock.path, os.O_RDWR)
+            try:
+                # Would fail with the child still holding the shared lock
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            finally:
+                os.close(fd)
+        finally:
+            os.close(write)
+            os.waitpid(pid, 0)
+
+class TestConcurrentWriters(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.test_dir, 'destinations.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    @unittest.skipIf(fcntl is None, 'fcntl is not available on this platform')
+    def test_processes_do_not_lose_updates(self):
+        """Test read-modify-write cycles from several processes"""
+        DestinationDatabase(self.db_file)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_add_destinations, args=(self.db_file, w, 25))
+            for w in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+
+        db = DestinationDatabase(self.db_file)
+        self.assertEqual(len(db.get_all_destinations()), 100)
+
+    def test_reader_never_sees_truncated_file(self):
+        """Test that saves go through a temporary file and rename"""
+        db = DestinationDatabase(self.db_file, journal=False)
+        db.add_destination({'id': 'a', 'name': 'Paris'})
+
+        with patch('data.storage.json.dumps', side_effect=RuntimeError('crash')):
+            with self.assertRaises(RuntimeError):
+                db.add_destination({'id': 'b', 'name': 'Tokyo'})
+
+        fresh = DestinationDatabase(self.db_file)
+        self.assertEqual([d['id'] for d in fresh.get_all_destinations()], ['a'])
+
+if __name__ == '__main__':
+    unittest.main()
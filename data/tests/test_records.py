@@ -0,0 +1,112 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from data import backends
+from data.destinations import DestinationDatabase
+from data.records import DestinationRecord, UserRecord, json_default, plain
+from data.users import UserDatabase
+
+class TestRecord(unittest.TestCase):
+    def setUp(self):
+        self.data = {'id': '1', 'name': 'John', 'email': 'john@example.com',
+                     'password': 'hash', 'role': 'User'}
+
+    def test_behaves_like_the_dict(self):
+        """Test the mapping interface callers used on plain dicts"""
+        user = UserRecord(self.data)
+        self.assertEqual(user, self.data)
+        self.assertEqual(self.data, user)
+        self.assertEqual(user['email'], 'john@example.com')
+        self.assertEqual(user.get('missing', 'x'), 'x')
+        self.assertIn('role', user)
+        self.assertEqual(len(user), 5)
+        self.assertEqual({**user, 'role': 'Admin'}, {**self.data, 'role': 'Admin'})
+        with self.assertRaises(TypeError):
+            user['role'] = 'Admin'
+
+    def test_missing_and_extra_fields(self):
+        """Test records holding fewer or more fields than the common set"""
+        destination = DestinationRecord({'id': 'd', 'location': 'Peru', 'attractions': ['Inca']})
+        self.assertNotIn('name', destination)
+        self.assertIsNone(destination.get('name'))
+        with self.assertRaises(KeyError):
+            destination['name']
+        self.assertEqual(destination['attractions'], ['Inca'])
+        self.assertEqual(destination.to_dict(),
+                         {'id': 'd', 'location': 'Peru', 'attractions': ['Inca']})
+        self.assertEqual(pickle.loads(pickle.dumps(destination)), destination)
+
+    def test_repeated_values_interned(self):
+        """Test that every record shares one string per role"""
+        first = UserRecord(json.loads(json.dumps(self.data)))
+        second = UserRecord(json.loads(json.dumps({**self.data, 'id': '2'})))
+        self.assertIs(first['role'], second['role'])
+
+    def test_json_encoding(self):
+        """Test that records encode to the same JSON as their dicts"""
+        user = UserRecord(self.data)
+        self.assertEqual(json.loads(json.dumps([user], default=json_default)), [self.data])
+        self.assertEqual(plain({'1': user}), {'1': self.data})
+        self.assertIs(type(plain({'1': user})['1']), dict)
+
+class TestResidentRecords(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_records_survive_journal_and_snapshot(self):
+        """Test records round-tripping through the log and a compaction"""
+        for filename in ('users.json', 'users.py', 'users.rec'):
+            path = os.path.join(self.test_dir, filename)
+            db = UserDatabase(path, compact_every=3, compact_records=True)
+            db.add_user({'id': '1', 'email': 'a@example.com', 'role': 'User', 'team': 'x'})
+            self.assertIsInstance(db.get_user_by_id('1'), UserRecord)
+            updated = db.update_user('1', {'role': 'Admin'})
+            self.assertIsInstance(updated, UserRecord)
+            db.add_users([{'id': str(i), 'email': f'{i}@example.com'} for i in range(2, 5)])
+            db.close()
+
+            reopened = UserDatabase(path, compact_records=True)
+            self.assertEqual(reopened.get_user_by_id('1'),
+                             {'id': '1', 'email': 'a@example.com', 'role': 'Admin', 'team': 'x'})
+            self.assertEqual(len(reopened.get_all_users()), 4)
+            self.assertTrue(all(isinstance(u, UserRecord) for u in reopened.get_all_users()))
+            reopened.close()
+
+    def test_destinations_stored_as_records(self):
+        """Test that destination writes are kept in the compact form"""
+        db = DestinationDatabase(os.path.join(self.test_dir, 'destinations.json'),
+                                 compact_records=True)
+        events = []
+        db.add_listener(lambda op, key, record: events.append(record))
+        db.add_destinations([{'id': 'a', 'name': 'Lima', 'location': 'Peru'}])
+        self.assertIsInstance(db.get_destination_by_id('a'), DestinationRecord)
+        self.assertIsInstance(events[0], DestinationRecord)
+        self.assertEqual([d['id'] for d in db.search_destinations(location='peru')[0]], ['a'])
+        db.close()
+
+    def test_plain_dicts_by_default(self):
+        """Test that compact records are opt-in"""
+        db = UserDatabase(os.path.join(self.test_dir, 'users.json'))
+        db.add_user({'id': '1', 'email': 'a@example.com'})
+        self.assertIs(type(db.get_user_by_id('1')), dict)
+        db.close()
+
+    def test_opt_in_from_environment(self):
+        """Test TRAVEL_COMPACT_RECORDS selecting compact records for the file backend"""
+        environ = {'TRAVEL_DATA_BACKEND': 'file', 'TRAVEL_COMPACT_RECORDS': '1'}
+        with patch.dict(os.environ, environ), \
+                patch.dict(backends._databases, clear=True), \
+                patch.object(DestinationDatabase, '__init__', return_value=None) as init:
+            backends.open_destination_database()
+        init.assert_called_once_with(compact_records=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,322 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from unittest.mock import patch
+from data.sqlite_backend import SQLiteUserDatabase, SQLiteDestinationDatabase
+from data.backends import open_user_database, open_destination_database
+from data.users import UserDatabase
+
+class TestSQLiteUserDatabase(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.test_dir, 'travel.db')
+        self.db = SQLiteUserDatabase(self.db_path)
+        self.test_user1 = {'id': '1', 'name': 'John Doe', 'email': 'john@example.com'}
+        self.test_user2 = {'id': '2', 'name': 'Jane Smith', 'email': 'jane@example.com'}
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_wal_mode(self):
+        """Test that the database runs in WAL journal mode"""
+        mode = self.db._connection().execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_add_and_get_user(self):
+        """Test the same lookups the file backend offers"""
+        self.assertTrue(self.db.add_user(self.test_user1))
+        self.db.add_user(self.test_user2)
+
+        self.assertEqual(self.db.get_user_by_id('1'), self.test_user1)
+        self.assertEqual(self.db.get_user_by_email('JANE@example.com'), self.test_user2)
+        self.assertIsNone(self.db.get_user_by_id('999'))
+        self.assertIsNone(self.db.get_user_by_email('nobody@example.com'))
+        self.assertEqual(self.db.get_all_users(), [self.test_user1, self.test_user2])
+
+    def test_get_users_by_ids(self):
+        """Test resolving several users at once"""
+        self.db.add_user(self.test_user1)
+        self.db.add_user(self.test_user2)
+        users = self.db.get_users_by_ids(['2', '999', '1', '2'])
+        self.assertEqual(users, {'1': self.test_user1, '2': self.test_user2})
+
+    def test_duplicate_email_rejected(self):
+        """Test that the unique email index rejects a second owner"""
+        self.db.add_user(self.test_user1)
+        self.assertFalse(self.db.add_user({'id': '3', 'email': 'John@Example.com'}))
+        self.assertTrue(self.db.add_user({**self.test_user1, 'name': 'John'}))
+
+    def test_update_and_delete_user(self):
+        """Test update_user and delete_user"""
+        self.db.add_user(self.test_user1)
+        self.db.add_user(self.test_user2)
+
+        updated = self.db.update_user('1', {'role': 'Admin'})
+        self.assertEqual(updated['role'], 'Admin')
+        self.assertEqual(self.db.get_user_by_id('1')['role'], 'Admin')
+        self.assertIsNone(self.db.update_user('1', {'email': 'jane@example.com'}))
+        self.assertIsNone(self.db.update_user('999', {'role': 'Admin'}))
+
+        self.assertTrue(self.db.delete_user('2'))
+        self.assertFalse(self.db.delete_user('2'))
+
+    def test_connection_per_thread(self):
+        """Test that every thread gets its own pooled connection"""
+        seen = []
+
+        def worker(index):
+            self.db.add_user({'id': str(index), 'email': f'user{index}@example.com'})
+            seen.append(self.db._connection())
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(map(id, seen))), 4)
+        self.assertEqual(len(self.db.get_all_users()), 4)
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'needs /proc/self/fd')
+    def test_connections_closed_when_threads_exit(self):
+        """Test that a thread per request does not leak connections or fds"""
+        self.db.add_user(self.test_user1)
+
+        def request():
+            self.db.get_user_by_id('1')
+
+        def run_threads(count):
+            for _ in range(count):
+                thread = threading.Thread(target=request)
+                thread.start()
+                thread.join()
+
+        run_threads(10)
+        fds = len(os.listdir('/proc/self/fd'))
+        run_threads(200)
+        self.assertLessEqual(len(os.listdir('/proc/self/fd')), fds)
+        self.assertEqual(len(self.db._connections), 1)
+
+    def test_add_users(self):
+        """Test bulk insert rejecting taken emails per record"""
+        self.db.add_user(self.test_user1)
+        batch = [self.test_user2, {'id': '3', 'email': 'JOHN@example.com'},
+                 {'id': '4', 'email': 'jane@example.com'}]
+        self.assertEqual(self.db.add_users(batch), [True, False, False])
+        self.assertEqual(len(self.db.get_all_users()), 2)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+    def test_forked_child_opens_own_connection(self):
+        """Test that a forked worker never reuses the parent's connection"""
+        self.db.add_user(self.test_user1)
+        parent_conn = self.db._connection()
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(read)
+                fresh = self.db._connection() is not parent_conn
+                added = self.db.add_user(self.test_user2)
+                os.write(write, b'ok' if fresh and added else b'no')
+                code = 0
+            finally:
+                os._exit(code)
+        os.close(write)
+        with os.fdopen(read, 'rb') as pipe:
+            result = pipe.read()
+        os.waitpid(pid, 0)
+        self.assertEqual(result, b'ok')
+        self.assertIs(self.db._connection(), parent_conn)
+        self.assertEqual(len(self.db.get_all_users()), 2)
+
+class TestSQLiteDestinationDatabase(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = SQLiteDestinationDatabase(os.path.join(self.test_dir, 'travel.db'))
+        self.sample_destination = {
+            'id': 'dest123',
+            'name': 'Paris',
+            'description': 'City of Light',
+            'attractions': ['Eiffel Tower', 'Louvre']
+        }
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_add_get_delete(self):
+        """Test the destination interface against SQLite"""
+        self.assertEqual(self.db.get_all_destinations(), [])
+        self.db.add_destination(self.sample_destination)
+        self.assertEqual(self.db.get_destination_by_id('dest123'), self.sample_destination)
+
+        self.db.add_destination({**self.sample_destination, 'name': 'Updated Paris'})
+        self.assertEqual(self.db.get_destination_by_id('dest123')['name'], 'Updated Paris')
+        self.assertEqual(len(self.db.get_all_destinations()), 1)
+
+        self.assertTrue(self.db.delete_destination('dest123'))
+        self.assertFalse(self.db.delete_destination('dest123'))
+        self.assertIsNone(self.db.get_destination_by_id('dest123'))
+
+    def test_get_destinations_page(self):
+        """Test cursor pagination in id order"""
+        for key in ('c', 'a', 'b'):
+            self.db.add_destination({'id': key})
+
+        page, after = self.db.get_destinations_page(2)
+        self.assertEqual([d['id'] for d in page], ['a', 'b'])
+        self.assertEqual(after, 'b')
+        page, after = self.db.get_destinations_page(2, after)
+        self.assertEqual([d['id'] for d in page], ['c'])
+        self.assertIsNone(after)
+
+    def test_search_destinations(self):
+        """Test that SQLite search matches the file backend's rules"""
+        self.db.add_destination({'id': 'a', 'name': 'Paris', 'location': 'France',
+                                 'description': 'City of Light'})
+        self.db.add_destination({'id': 'b', 'name': 'Lyon', 'location': 'france',
+                                 'description': 'Food city'})
+        self.db.add_destination({'id': 'c', 'name': 'Parma', 'location': 'Italy',
+                                 'description': 'Ham and cheese'})
+
+        def ids(**filters):
+            return [d['id'] for d in self.db.search_destinations(**filters)[0]]
+
+        self.assertEqual(ids(location=' FRANCE '), ['a', 'b'])
+        self.assertEqual(ids(name_prefix='par'), ['a', 'c'])
+        self.assertEqual(ids(text='light CITY'), ['a'])
+        self.assertEqual(ids(location='france', text='city', limit=1), ['a'])
+        self.assertEqual(self.db.search_destinations(text='city', limit=1)[1], 'a')
+
+        self.db.add_destination({'id': 'a', 'name': 'Nice', 'location': 'France',
+                                 'description': 'Riviera'})
+        self.db.delete_destination('b')
+        self.assertEqual(ids(text='city'), [])
+        self.assertEqual(ids(name_prefix='par'), ['c'])
+
+    def test_iter_search_destinations(self):
+        """Test streaming search results in id order, batch by batch"""
+        self.db.add_destinations([{'id': f'{i:04d}', 'location': 'Spain' if i % 3 else 'Peru'}
+                                  for i in range(1203)])
+
+        batches = list(self.db.iter_search_destinations(600, location='spain'))
+        self.assertEqual([len(batch) for batch in batches], [600, 202])
+        ids = [d['id'] for batch in batches for d in batch]
+        self.assertEqual(ids, [f'{i:04d}' for i in range(1203) if i % 3])
+        self.assertEqual(list(self.db.iter_search_destinations(10, text='!')), [])
+
+    def test_search_columns_backfilled(self):
+        """Test that a database created before the search columns is migrated"""
+        path = self.db.path
+        self.db.close()
+        os.remove(path)
+        import sqlite3
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE destinations (id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        conn.execute('INSERT INTO destinations VALUES (?, ?)',
+                     ('old', '{"id": "old", "name": "Oslo", "location": "Norway"}'))
+        conn.commit()
+        conn.close()
+
+        self.db = SQLiteDestinationDatabase(path)
+        self.assertEqual([d['id'] for d in self.db.search_destinations(location='norway')[0]],
+                         ['old'])
+
+    def test_version_changes_on_every_write(self):
+        """Test that the version counter is bumped by every mutation"""
+        versions = [self.db.get_version()]
+        self.db.add_destination(self.sample_destination)
+        versions.append(self.db.get_version())
+        self.db.add_destination({**self.sample_destination, 'name': 'Updated Paris'})
+        versions.append(self.db.get_version())
+        self.db.delete_destination('dest123')
+        versions.append(self.db.get_version())
+        self.db.delete_destination('dest123')
+        versions.append(self.db.get_version())
+
+        self.assertEqual(len(set(versions)), 4)
+        # Other collections in the same file keep their own version
+        users = SQLiteUserDatabase(self.db.path)
+        before = users.get_version()
+        self.db.add_destination(self.sample_destination)
+        self.assertEqual(users.get_version(), before)
+        users.close()
+
+    def test_bulk_add_and_delete(self):
+        """Test batch writes and the events they emit"""
+        events = []
+        self.db.add_listener(lambda op, key, record: events.append((op, key)))
+
+        self.db.add_destinations([{'id': key, 'location': 'Chile'} for key in 'abc'])
+        self.assertEqual(self.db.delete_destinations(['a', 'zz']), ['a'])
+
+        self.assertEqual([d['id'] for d in self.db.search_destinations(location='chile')[0]],
+                         ['b', 'c'])
+        self.assertEqual(events, [('put', 'a'), ('put', 'b'), ('put', 'c'), ('delete', 'a')])
+
+    def test_listeners_with_versions(self):
+        """Test that writes report the versions they moved between"""
+        events = []
+        self.db.add_listener(lambda op, key, record, before, after: events.append((before, after)),
+                             versions=True)
+        start = self.db.get_version()
+        self.db.add_destination({'id': 'a'})
+        middle = self.db.get_version()
+        self.db.delete_destinations(['a', 'zz'])
+
+        self.assertEqual(events, [(start, middle), (middle, self.db.get_version())])
+        self.assertNotEqual(middle, self.db.get_version())
+
+class TestBackendSelection(unittest.TestCase):
+    def test_file_backend_is_default(self):
+        """Test that the JSON files are used unless configured otherwise"""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsInstance(open_user_database(), UserDatabase)
+
+    def test_sqlite_backend_from_environment(self):
+        """Test selecting SQLite through TRAVEL_DATA_BACKEND"""
+        test_dir = tempfile.mkdtemp()
+        try:
+            env = {
+                'TRAVEL_DATA_BACKEND': 'sqlite',
+                'TRAVEL_SQLITE_PATH': os.path.join(test_dir, 'shared.db')
+            }
+            with patch.dict(os.environ, env):
+                user_db = open_user_database()
+                destination_db = open_destination_database()
+            self.assertIsInstance(user_db, SQLiteUserDatabase)
+            self.assertIsInstance(destination_db, SQLiteDestinationDatabase)
+            self.assertEqual(user_db.path, destination_db.path)
+            user_db.close()
+            destination_db.close()
+        finally:
+            shutil.rmtree(test_dir)
+
+    def test_instances_shared_per_database(self):
+        """Test that callers in one process share each database instance"""
+        test_dir = tempfile.mkdtemp()
+        try:
+            env = {'TRAVEL_DATA_BACKEND': 'sqlite'}
+            with patch.dict(os.environ, env, TRAVEL_SQLITE_PATH=os.path.join(test_dir, 'a.db')):
+                first = open_user_database()
+                self.assertIs(open_user_database(), first)
+            with patch.dict(os.environ, env, TRAVEL_SQLITE_PATH=os.path.join(test_dir, 'b.db')):
+                other = open_user_database()
+            self.assertIsNot(other, first)
+            first.close()
+            other.close()
+        finally:
+            shutil.rmtree(test_dir)
+
+    def test_unknown_backend(self):
+        """Test that a typo in the backend name is reported"""
+        with patch.dict(os.environ, {'TRAVEL_DATA_BACKEND': 'postgres'}):
+            with self.assertRaises(ValueError):
+                open_user_database()
+
+if __name__ == '__main__':
+    unittest.main()
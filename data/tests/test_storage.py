@@ -0,0 +1,83 @@
+import unittest
+import os
+import shutil
+import tempfile
+from data.storage import (
+    JSONFormat, PythonLiteralFormat, RecordFormat, get_format, migrate
+)
+from data.users import UserDatabase
+from data.destinations import DestinationDatabase
+
+class TestStorageFormats(unittest.TestCase):
+    def setUp(self):
+        """Create a temporary directory for the data files"""
+        self.test_dir = tempfile.mkdtemp()
+        self.records = {
+            '1': {'id': '1', 'name': 'John Doe', 'email': 'john@example.com'},
+            '2': {'id': '2', 'name': 'Zoë', 'email': 'zoe@example.com', 'tags': ['a', 'b']}
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def path(self, name):
+        return os.path.join(self.test_dir, name)
+
+    def test_get_format_by_extension(self):
+        """Test that the file extension selects the format"""
+        self.assertIsInstance(get_format('users.py', 'users'), PythonLiteralFormat)
+        self.assertIsInstance(get_format('users.json', 'users'), JSONFormat)
+        self.assertIsInstance(get_format('users.rec', 'users'), RecordFormat)
+        with self.assertRaises(ValueError):
+            get_format('users.txt', 'users')
+
+    def test_round_trip(self):
+        """Test that every format loads back exactly what it dumped"""
+        for extension in ('.py', '.json', '.rec'):
+            with self.subTest(extension=extension):
+                path = self.path('users' + extension)
+                fmt = get_format(path, 'users')
+                fmt.dump(path, self.records)
+                self.assertEqual(fmt.load(path), self.records)
+
+    def test_legacy_format_does_not_execute_code(self):
+        """Test that legacy files are parsed as literals, not executed"""
+        path = self.path('users.py')
+        with open(path, 'w') as f:
+            f.write("users = __import__('os').getcwd()")
+        with self.assertRaises(ValueError):
+            PythonLiteralFormat('users').load(path)
+
+    def test_truncated_record_file(self):
+        """Test that a torn record file is reported instead of half-loaded"""
+        path = self.path('users.rec')
+        RecordFormat('users').dump(path, self.records)
+        with open(path, 'rb+') as f:
+            f.truncate(os.path.getsize(path) - 3)
+        with self.assertRaises(ValueError):
+            RecordFormat('users').load(path)
+
+    def test_migrate(self):
+        """Test converting a legacy file to the JSON format"""
+        source = self.path('users_data.py')
+        PythonLiteralFormat('users').dump(source, self.records)
+        count = migrate(source, self.path('users_data.json'), 'users')
+        self.assertEqual(count, 2)
+        self.assertEqual(JSONFormat('users').load(self.path('users_data.json')), self.records)
+
+    def test_databases_migrate_legacy_files_on_startup(self):
+        """Test that a missing JSON file is seeded from the legacy .py file"""
+        PythonLiteralFormat('users').dump(self.path('users_data.py'), self.records)
+        PythonLiteralFormat('destinations').dump(
+            self.path('destinations_data.py'),
+            {'d1': {'id': 'd1', 'name': 'Paris'}}
+        )
+
+        user_db = UserDatabase(self.path('users_data.json'))
+        destination_db = DestinationDatabase(self.path('destinations_data.json'))
+
+        self.assertEqual(user_db.get_user_by_id('2'), self.records['2'])
+        self.assertEqual(destination_db.get_destination_by_id('d1')['name'], 'Paris')
+
+if __name__ == '__main__':
+    unittest.main()
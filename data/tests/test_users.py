@@ -1,6 +1,7 @@
 import unittest
 import os
 import shutil
+from unittest.mock import patch
 
 
 class TestUserDatabase(unittest.TestCase):
@@ -116,5 +117,114 @@ class TestUserDatabase(unittest.TestCase):
         with self.assertRaises(SyntaxError):
             self.db._load_users()
 
+    def test_get_users_by_ids(self):
+        """Test resolving several users at once"""
+        self.db.add_user(self.test_user1)
+        self.db.add_user(self.test_user2)
+
+        users = self.db.get_users_by_ids(['2', '999', '1'])
+        self.assertEqual(users, {'1': self.test_user1, '2': self.test_user2})
+
+    def test_get_user_by_email_is_case_insensitive(self):
+        """Test that the email index ignores case and surrounding whitespace"""
+        self.db.add_user(self.test_user1)
+        self.assertEqual(self.db.get_user_by_email(' John@Example.COM '), self.test_user1)
+
+    def test_add_user_rejects_duplicate_email(self):
+        """Test that a second user cannot take an existing email"""
+        self.assertTrue(self.db.add_user(self.test_user1))
+        duplicate = {'id': '3', 'name': 'Johnny', 'email': 'JOHN@example.com'}
+        self.assertFalse(self.db.add_user(duplicate))
+        self.assertIsNone(self.db.get_user_by_id('3'))
+
+        # Re-saving the same user is an update, not a duplicate
+        self.assertTrue(self.db.add_user({**self.test_user1, 'name': 'John'}))
+
+    def test_email_index_follows_updates_and_deletes(self):
+        """Test that the index stays consistent across update and delete"""
+        self.db.add_user(self.test_user1)
+        self.db.add_user(self.test_user2)
+
+        updated = self.db.update_user('1', {'email': 'johnny@example.com'})
+        self.assertEqual(updated['email'], 'johnny@example.com')
+        self.assertIsNone(self.db.get_user_by_email('john@example.com'))
+        self.assertEqual(self.db.get_user_by_email('johnny@example.com')['id'], '1')
+
+        # Cannot move onto another user's email
+        self.assertIsNone(self.db.update_user('1', {'email': 'jane@example.com'}))
+        self.assertIsNone(self.db.update_user('999', {'name': 'Nobody'}))
+
+        self.assertTrue(self.db.delete_user('2'))
+        self.assertFalse(self.db.delete_user('2'))
+        self.assertIsNone(self.db.get_user_by_email('jane@example.com'))
+
+    def test_email_index_rebuilt_on_load(self):
+        """Test that another instance's writes show up in the index"""
+        from data.users import UserDatabase
+        other_db = UserDatabase(self.test_db_file)
+        self.db.get_user_by_email('john@example.com')
+
+        other_db.add_user(self.test_user1)
+        self.assertEqual(self.db.get_user_by_email('john@example.com'), self.test_user1)
+
+    def test_mutation_listeners(self):
+        """Test that writes are reported to registered listeners"""
+        events = []
+        self.db.add_listener(lambda op, key, record: events.append((op, key)))
+
+        self.db.add_user(self.test_user1)
+        self.db.update_user('1', {'role': 'Admin'})
+        self.db.delete_user('1')
+        self.db._save_users({})
+
+        self.assertEqual(events, [('put', '1'), ('put', '1'), ('delete', '1'), ('reset', None)])
+
+    def test_listeners_with_versions(self):
+        """Test the versions reported around each write"""
+        events = []
+        self.db.add_listener(lambda *event: events.append(event[3:]), versions=True)
+        start = self.db.get_version()
+
+        self.db.add_user(self.test_user1)
+        middle = self.db.get_version()
+        self.db.add_users([self.test_user2, {'id': '3', 'email': 'three@example.com'}])
+
+        self.assertEqual(events, [(start, middle), (middle, self.db.get_version()),
+                                  (middle, self.db.get_version())])
+
+    def test_concurrent_registration_with_same_email(self):
+        """Test that only one of many concurrent inserts of an email wins"""
+        from concurrent.futures import ThreadPoolExecutor
+        users = [
+            {'id': str(i), 'name': f'User {i}', 'email': 'race@example.com'}
+            for i in range(20)
+        ]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(self.db.add_user, users))
+
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(len(self.db.get_all_users()), 1)
+
+    def test_add_users_in_one_write(self):
+        """Test bulk insert with duplicates against the index and the batch"""
+        self.db.add_user(self.test_user1)
+        events = []
+        self.db.add_listener(lambda op, key, record: events.append((op, key)))
+        batch = [
+            {'id': '3', 'email': 'new@example.com'},
+            {'id': '4', 'email': 'JOHN@example.com'},
+            {'id': '5', 'email': 'new@example.com '},
+            {'id': '1', 'name': 'John', 'email': 'john@example.com'},
+        ]
+
+        with patch.object(self.db, '_journal', wraps=self.db._journal) as journal:
+            self.assertEqual(self.db.add_users(batch), [True, False, False, True])
+        self.assertEqual(journal.call_count, 1)
+
+        self.assertEqual(self.db.get_user_by_email('new@example.com')['id'], '3')
+        self.assertIsNone(self.db.get_user_by_id('4'))
+        self.assertEqual(self.db.get_user_by_id('1')['name'], 'John')
+        self.assertEqual(events, [('put', '3'), ('put', '1')])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
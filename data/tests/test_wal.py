@@ -0,0 +1,194 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from data.wal import WriteAheadLog
+from data.destinations import DestinationDatabase
+from data.users import UserDatabase
+
+class TestWriteAheadLog(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.test_dir, 'records.json.wal')
+        self.wal = WriteAheadLog(self.log_path)
+
+    def tearDown(self):
+        self.wal.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_replay_applies_puts_and_deletes(self):
+        """Test that replay rebuilds state from the log entries"""
+        self.wal.append('put', '1', {'id': '1'})
+        self.wal.append('put', '2', {'id': '2'})
+        self.wal.append('delete', '1')
+
+        records = self.wal.replay({'0': {'id': '0'}})
+        self.assertEqual(records, {'0': {'id': '0'}, '2': {'id': '2'}})
+        self.assertEqual(self.wal.entries, 3)
+
+    def test_torn_tail_is_ignored_and_discarded(self):
+        """Test recovery from a crash in the middle of an append"""
+        self.wal.append('put', '1', {'id': '1'})
+        self.wal.close()
+        with open(self.log_path, 'a') as f:
+            f.write('{"op":"put","id":"2","rec')
+
+        self.assertEqual(self.wal.replay({}), {'1': {'id': '1'}})
+
+        # The next append must not be glued onto the torn line
+        self.wal.append('put', '3', {'id': '3'})
+        self.assertEqual(self.wal.replay({}), {'1': {'id': '1'}, '3': {'id': '3'}})
+
+    def test_corrupt_entry_raises(self):
+        """Test that damage before the tail is reported"""
+        with open(self.log_path, 'w') as f:
+            f.write('not json\n{"op":"delete","id":"1"}\n')
+        with self.assertRaises(ValueError):
+            self.wal.replay({})
+
+    def test_group_commit(self):
+        """Test that appends queued behind a running fsync share the next one"""
+        synced = []
+        release = threading.Event()
+
+        def fsync(fd):
+            synced.append(fd)
+            if len(synced) == 1:
+                release.wait(5)
+
+        with patch('data.wal.os.fsync', side_effect=fsync):
+            first = self.wal.append('put', '1', {})
+            waiters = [threading.Thread(target=self.wal.wait, args=(first,))]
+            waiters[0].start()
+            while not synced:
+                time.sleep(0.001)
+            # Appends are not held up by the fsync in progress
+            for key in '234':
+                ticket = self.wal.append('put', key, {})
+                waiters.append(threading.Thread(target=self.wal.wait, args=(ticket,)))
+                waiters[-1].start()
+            release.set()
+            for waiter in waiters:
+                waiter.join(5)
+            self.assertEqual(len(synced), 2)
+
+            # Nothing left to sync
+            self.wal.sync()
+            self.assertEqual(len(synced), 2)
+
+class TestJournaledDatabase(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.test_dir, 'destinations.json')
+        self.db = DestinationDatabase(self.db_file, compact_every=3)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_mutations_append_instead_of_rewriting(self):
+        """Test that add/delete leave the snapshot untouched"""
+        with open(self.db_file) as f:
+            snapshot = f.read()
+
+        self.db.add_destination({'id': 'a', 'name': 'Paris'})
+        self.db.delete_destination('a')
+
+        with open(self.db_file) as f:
+            self.assertEqual(f.read(), snapshot)
+        self.assertEqual(self.db.wal.entries, 2)
+
+    def test_startup_replays_snapshot_and_log(self):
+        """Test that a new instance sees logged mutations"""
+        self.db.add_destination({'id': 'a', 'name': 'Paris'})
+        self.db.add_destination({'id': 'b', 'name': 'Tokyo'})
+        self.db.delete_destination('a')
+
+        other = DestinationDatabase(self.db_file)
+        self.assertIsNone(other.get_destination_by_id('a'))
+        self.assertEqual(other.get_destination_by_id('b')['name'], 'Tokyo')
+        other.close()
+
+    def test_compaction(self):
+        """Test that the log is folded into a snapshot past the threshold"""
+        for key in 'abcd':
+            self.db.add_destination({'id': key})
+
+        self.assertEqual(self.db.wal.entries, 0)
+        self.assertEqual(os.path.getsize(self.db_file + '.wal'), 0)
+        self.assertEqual(len(self.db.storage.load(self.db_file)), 4)
+
+    def test_writes_return_once_synced(self):
+        """Test that a write does not return before its log entry is fsynced"""
+        with patch.object(self.db.wal, 'wait', wraps=self.db.wal.wait) as wait, \
+                patch('data.wal.os.fsync') as fsync:
+            self.db.add_destination({'id': 'a'})
+            self.db.delete_destination('a')
+        self.assertEqual(wait.call_count, 2)
+        self.assertEqual(fsync.call_count, 2)
+
+    def test_torn_tail_left_by_another_writer(self):
+        """Test that a partial line from another process is cut before appending"""
+        other = DestinationDatabase(self.db_file, compact_every=100)
+        self.db.compact_every = 100
+        self.db.add_destination({'id': 'a'})
+        other.add_destination({'id': 'b'})
+        # The other writer dies halfway through its next append
+        other.wal._file.write(b'{"op":"put","id":"c","rec')
+        other.wal._file.flush()
+
+        self.db.add_destination({'id': 'd'})
+        fresh = DestinationDatabase(self.db_file)
+        self.assertEqual(sorted(d['id'] for d in fresh.get_all_destinations()), ['a', 'b', 'd'])
+        fresh.close()
+        other.close()
+
+    def test_journal_can_be_disabled(self):
+        """Test the full-rewrite mode used without a log"""
+        users_file = os.path.join(self.test_dir, 'users.json')
+        db = UserDatabase(users_file, journal=False)
+        db.add_user({'id': '1', 'email': 'john@example.com'})
+
+        self.assertFalse(os.path.exists(users_file + '.wal'))
+        self.assertIn('1', db.storage.load(users_file))
+
+    def test_bulk_writes_are_one_journal_append(self):
+        """Test that add_destinations/delete_destinations persist in one write"""
+        db = DestinationDatabase(self.db_file, compact_every=100)
+        with patch.object(db.wal, 'append_many', wraps=db.wal.append_many) as append_many:
+            db.add_destinations([{'id': key, 'name': key} for key in 'abcde'])
+            self.assertEqual(db.delete_destinations(['a', 'zz', 'c']), ['a', 'c'])
+        self.assertEqual(append_many.call_count, 2)
+        db.close()
+
+        other = DestinationDatabase(self.db_file)
+        self.assertEqual(sorted(d['id'] for d in other.get_all_destinations()), ['b', 'd', 'e'])
+        other.close()
+
+    def test_bulk_write_past_threshold_compacts(self):
+        """Test that a batch larger than the log limit becomes one snapshot"""
+        self.db.add_destinations([{'id': str(i)} for i in range(10)])
+        self.assertEqual(self.db.wal.entries, 0)
+        self.assertEqual(len(self.db.storage.load(self.db_file)), 10)
+
+    def test_log_grows_with_the_snapshot(self):
+        """Test that batches are journaled until the log outgrows the snapshot"""
+        self.db.add_destinations([{'id': f'a{i}'} for i in range(10)])
+        with patch.object(self.db.storage, 'dump', wraps=self.db.storage.dump) as dump:
+            # Past compact_every, but not past the 10 records in the snapshot
+            self.db.add_destinations([{'id': f'b{i}'} for i in range(6)])
+            self.db.delete_destinations(['a0', 'a1', 'a2', 'a3'])
+            self.assertEqual((dump.call_count, self.db.wal.entries), (0, 10))
+            self.db.add_destination({'id': 'c'})
+            self.assertEqual((dump.call_count, self.db.wal.entries), (1, 0))
+
+        other = DestinationDatabase(self.db_file)
+        self.assertEqual(len(other.get_all_destinations()), 13)
+        self.assertEqual(other._snapshot_size, 13)
+        other.close()
+
+if __name__ == '__main__':
+    unittest.main()
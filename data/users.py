@@ -1,42 +1,121 @@
 # data/users.py
-import os
+from data.base import FileDatabase
+from data.records import UserRecord
 
-class UserDatabase:
-    def __init__(self, filename='users_data.py'):
-        self.filename = os.path.join(os.path.dirname(__file__), filename)
-        self._initialize_database()
+def normalize_email(email):
+    """Key used by the email index: surrounding whitespace and case are ignored."""
+    return email.strip().lower()
 
-    def _initialize_database(self):
-        if not os.path.exists(self.filename):
-            with open(self.filename, 'w') as f:
-                f.write("users = {}")
+class UserDatabase(FileDatabase):
+    collection = 'users'
+    compact_record_type = UserRecord
+
+    def __init__(self, filename='users_data.json', **kwargs):
+        super().__init__(filename, **kwargs)
 
     def _load_users(self):
-        with open(self.filename, 'r') as f:
-            exec(f.read())
-        return locals()['users']
+        return self._load()
 
     def _save_users(self, users):
-        with open(self.filename, 'w') as f:
-            f.write(f"users = {repr(users)}")
+        self._save(users)
+
+    def _build_indexes(self, users):
+        # normalized email -> user id, rebuilt whenever the users are reloaded
+        return {
+            normalize_email(user['email']): user_id
+            for user_id, user in users.items() if user.get('email')
+        }
+
+    def _index_put(self, email_index, user_id, old, user):
+        key = normalize_email(user['email']) if user.get('email') else None
+        if key is not None:
+            email_index[key] = user_id
+        if old is not None and old.get('email') and normalize_email(old['email']) != key:
+            email_index.pop(normalize_email(old['email']), None)
+
+    def _index_delete(self, email_index, user_id, old):
+        if old.get('email'):
+            email_index.pop(normalize_email(old['email']), None)
+
+    @staticmethod
+    def _email_taken(email_index, email, user_id):
+        owner = email_index.get(normalize_email(email))
+        return owner is not None and owner != user_id
 
     def add_user(self, user):
-        users = self._load_users()
-        users[user['id']] = user
-        self._save_users(users)
+        """Store ``user``; returns False if another user already has its email.
+
+        The check and the insert happen under the database lock, so two
+        concurrent registrations with the same email cannot both succeed,
+        even from different processes.
+        """
+        with self._transaction():
+            _, email_index = self._load_state()
+            if user.get('email') and self._email_taken(email_index, user['email'], user['id']):
+                return False
+            self._put(user['id'], user)
+            return True
+
+    def add_users(self, users):
+        """Store many users with one write to disk.
+
+        Returns one bool per user, False where the email belongs to an
+        existing user or to an earlier user in the same batch.
+        """
+        results = []
+        accepted = []
+        with self._transaction():
+            _, email_index = self._load_state()
+            claimed = {}
+            for user in users:
+                email = user.get('email')
+                key = normalize_email(email) if email else None
+                if key is not None and (self._email_taken(email_index, email, user['id'])
+                                        or claimed.get(key, user['id']) != user['id']):
+                    results.append(False)
+                    continue
+                if key is not None:
+                    claimed[key] = user['id']
+                accepted.append((user['id'], user))
+                results.append(True)
+            self._put_many(accepted)
+        return results
+
+    def update_user(self, user_id, changes):
+        """Apply ``changes`` to a stored user and return the updated record.
+
+        Returns None if the user does not exist or the new email belongs to
+        another user.
+        """
+        with self._transaction():
+            users, email_index = self._load_state()
+            user = users.get(user_id)
+            if user is None:
+                return None
+            if 'email' in changes and self._email_taken(email_index, changes['email'], user_id):
+                return None
+            updated = self._as_record({**user, **changes, 'id': user_id})
+            self._put(user_id, updated)
+            return updated
+
+    def delete_user(self, user_id):
+        return self._delete(user_id)
 
     def get_user_by_id(self, user_id):
         users = self._load_users()
         return users.get(user_id)
 
-    def get_user_by_email(self, email):
+    def get_users_by_ids(self, user_ids):
+        """Look up many users with a single load; missing ids are omitted."""
         users = self._load_users()
-        for user in users.values():
-            if user['email'] == email:
-                return user
-        return None
+        return {user_id: users[user_id] for user_id in user_ids if user_id in users}
+
+    def get_user_by_email(self, email):
+        users, email_index = self._load_state()
+        user_id = email_index.get(normalize_email(email))
+        return users.get(user_id) if user_id is not None else None
 
     def get_all_users(self):
         # Returns all users in the database
         users = self._load_users()
-        return list(users.values())
\ No newline at end of file
+        return list(users.values())
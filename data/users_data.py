@@ -1 +0,0 @@
-users = {'d6171b88-fd85-4c95-952e-1d359e5ea9b3': {'id': 'd6171b88-fd85-4c95-952e-1d359e5ea9b3', 'name': 'John Doe', 'email': 'JohnDoeeeee@mail.com', 'password': 'eb0f08df4490a936686900f130b51868a6f7a9ae73ac4fd4386660b2c3003a48', 'role': 'Admin'}, '76340c06-82bb-4696-b5ab-553821c2e1e6': {'id': '76340c06-82bb-4696-b5ab-553821c2e1e6', 'name': 'Admin User', 'email': 'adminprofile@example.com', 'password': '713bfda78870bf9d1b261f565286f85e97ee614efe5f0faf7c34e7ca4f65baca', 'role': 'Admin'}, '455f1e56-7f24-4a70-badf-c60d7bacddd5': {'id': '455f1e56-7f24-4a70-badf-c60d7bacddd5', 'name': 'Profile User', 'email': 'profileuser@example.com', 'password': 'ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f', 'role': 'User'}, '7835eeb6-eb59-4af8-a836-8de2cc5d94bd': {'id': '7835eeb6-eb59-4af8-a836-8de2cc5d94bd', 'name': 'Login User', 'email': 'loginuser@example.com', 'password': 'ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f', 'role': 'User'}, '31ddcb93-a52a-45e1-9ed4-f0c9fea9e32d': {'id': '31ddcb93-a52a-45e1-9ed4-f0c9fea9e32d', 'name': 'John Doe', 'email': 'JohnDoe1911019@gmail.com', 'password': 'a612327a9190a0efe127dc25a963c888e8aa15ab9c4e3d728fd5737547bb7b74', 'role': 'User'}, '5aef90ea-09ea-4cb3-9fcc-1edb7e21a833': {'id': '5aef90ea-09ea-4cb3-9fcc-1edb7e21a833', 'name': 'John Doe', 'email': 'JohnDoe191101919@gmail.com', 'password': 'bb7a104bbe67a9a6800800168a87001905d942ef9ba1d8623d00f0cd9097aa09', 'role': 'Admin'}, '5c34c634-84bb-4240-852c-6576111a914f': {'id': '5c34c634-84bb-4240-852c-6576111a914f', 'name': 'munne1910', 'email': 'munne1910e@gmail.com', 'password': 'a64332fe1df1790cb79d428bf5b5767ddd589b1cca825cb1b9eb30f7e9aaee03', 'role': 'User'}, '7458f4ac-4656-410b-a0ec-7b7770135ff1': {'id': '7458f4ac-4656-410b-a0ec-7b7770135ff1', 'name': 'knm', 'email': 'knm1910@gmail.com', 'password': 'cd10dd664ae8f8edc4076bc764ede6c3b3a9aba6be016271ce686d5985508d22', 'role': 'Admin'}}
\ No newline at end of file
@@ -3,18 +3,32 @@ from flask import Flask, request, jsonify
 from flask_swagger_ui import get_swaggerui_blueprint
 import os
 import sys
+import time
 import jwt
 
 # Add parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from services.auth_service.auth import authenticate_token, SECRET_KEY
-from data.users import UserDatabase
+from services.auth_service.auth import authenticate_token, SECRET_KEY, warm_up as warm_up_auth, admin_error
+from data.backends import open_user_database
+from services.common.asgi import WSGIAdapter
+from services.common import launcher
+from services.common.profiling import enable_profiling
+from services.common.metrics import instrument, span
 
 app = Flask(__name__)
 
+# Request counts and latencies, served on /metrics
+instrument(app, 'auth')
+
+# Admin-only profiles of live requests: X-Profile header and /_profile
+enable_profiling(app, admin_error)
+
 # Initialize User Database
-user_db = UserDatabase()
+user_db = open_user_database()
+
+# Upper bound on tokens accepted by /auth/verify/batch
+MAX_VERIFY_BATCH = 1000
 
 # Swagger Configuration
 SWAGGER_URL = '/docs'
@@ -41,7 +55,8 @@ def verify_token():
     
     try:
         # Attempt to decode the token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        with span('jwt_decode'):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
         
         # Verify user exists
         user = user_db.get_user_by_id(payload['user_id'])
@@ -66,6 +81,58 @@ def verify_token():
             'error': 'Invalid token'
         }), 401
 
+@app.route('/auth/verify/batch', methods=['POST'])
+def verify_tokens_batch():
+    """
+    Verify many authentication tokens in one request
+    """
+    started = time.perf_counter()
+    data = request.json
+
+    # Validate input
+    if not isinstance(data, dict) or not isinstance(data.get('tokens'), list):
+        return jsonify({'error': 'tokens must be a list'}), 400
+    tokens = data['tokens']
+    if len(tokens) > MAX_VERIFY_BATCH:
+        return jsonify({'error': f'At most {MAX_VERIFY_BATCH} tokens per batch'}), 400
+
+    results = []
+    payloads = []
+    for token in tokens:
+        try:
+            if not isinstance(token, str):
+                raise jwt.InvalidTokenError
+            with span('jwt_decode'):
+                payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            # A signed token without the claims we issue is just as unusable
+            if not isinstance(payload.get('user_id'), str) or 'role' not in payload:
+                raise jwt.InvalidTokenError
+            payloads.append((len(results), payload))
+            results.append(None)
+        except jwt.ExpiredSignatureError:
+            results.append({'valid': False, 'error': 'Token has expired'})
+        except jwt.InvalidTokenError:
+            results.append({'valid': False, 'error': 'Invalid token'})
+
+    # Resolve every user with a single data load
+    users = user_db.get_users_by_ids({payload['user_id'] for _, payload in payloads})
+    for index, payload in payloads:
+        if payload['user_id'] in users:
+            results[index] = {
+                'valid': True,
+                'user_id': payload['user_id'],
+                'role': payload['role']
+            }
+        else:
+            results[index] = {'valid': False, 'error': 'User not found'}
+
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'valid_count': sum(1 for result in results if result['valid']),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+    }), 200
+
 @app.route('/auth/roles', methods=['GET'])
 @authenticate_token
 def get_user_roles(current_user):
@@ -83,5 +150,15 @@ def get_user_roles(current_user):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ASGI entry point for the asyncio serving mode:
+#   python -m services.common.asgi services.auth_service.app:asgi_app --port 5003
+asgi_app = WSGIAdapter(app)
+
+def warm_up():
+    """Load data and indexes once in the launcher, before it forks workers."""
+    user_db.get_version()
+    warm_up_auth()
+
 if __name__ == '__main__':
-    app.run(port=5003, debug=True)
\ No newline at end of file
+    # Pre-forked workers on all cores; --debug for the Flask dev server
+    launcher.main(app=app, warm_up=warm_up, port=5003)
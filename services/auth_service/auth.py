@@ -1,5 +1,9 @@
 # services/auth_service/auth.py
 import jwt
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
 import os
@@ -8,10 +12,100 @@ import sys
 # Add parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from data.users import UserDatabase
+from data.backends import open_user_database
+from services.common.metrics import span
 
 SECRET_KEY = 'your_secret_key_here'
-user_db = UserDatabase()
+# Verified tokens are remembered for at most this many seconds (and never
+# past their own 'exp'), which also bounds how long a user deleted by
+# another process can keep using a token here.
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SIZE = 10000
+
+user_db = open_user_database()
+
+class TokenCache:
+    """Bounded LRU of verified tokens and the current_user they resolve to.
+
+    Entries are keyed by the SHA-256 digest of the token, so raw tokens are
+    not kept in memory, and expire after ``ttl`` seconds or at the token's
+    ``exp`` claim, whichever comes first.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # digest -> (expires_at, current_user)
+        self._by_user = {}             # user_id -> set of digests
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires_at, current_user = entry
+            if expires_at <= time.time():
+                self._remove(digest)
+                return None
+            self._entries.move_to_end(digest)
+            return dict(current_user)
+
+    def put(self, token, current_user, exp=None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        digest = self._digest(token)
+        with self._lock:
+            self._remove(digest)
+            self._entries[digest] = (expires_at, dict(current_user))
+            self._by_user.setdefault(current_user['user_id'], set()).add(digest)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        """Forget every cached token of ``user_id``."""
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._remove(digest)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            user_id = entry[1]['user_id']
+            digests = self._by_user.get(user_id)
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._by_user[user_id]
+
+token_cache = TokenCache()
+
+def _on_user_change(op, user_id, user):
+    # A removed user or a changed role must not keep resolving from cache
+    if op == 'reset':
+        token_cache.clear()
+    else:
+        token_cache.invalidate_user(user_id)
+
+user_db.add_listener(_on_user_change)
+
+def warm_up():
+    """Load the user data token checks read, e.g. before forking workers."""
+    user_db.get_version()
 
 def authenticate_token(f):
     @wraps(f)
@@ -25,10 +119,16 @@ def authenticate_token(f):
         
         if not token:
             return jsonify({'error': 'Authentication token is missing'}), 401
+
+        # Tokens seen recently skip signature checks and the user lookup
+        current_user = token_cache.get(token)
+        if current_user is not None:
+            return f(current_user, *args, **kwargs)
         
         try:
             # Decode the token
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            with span('jwt_decode'):
+                payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
             
             # Verify user exists
             user = user_db.get_user_by_id(payload['user_id'])
@@ -40,6 +140,7 @@ def authenticate_token(f):
                 'user_id': payload['user_id'],
                 'role': payload['role']
             }
+            token_cache.put(token, current_user, payload.get('exp'))
             
             return f(current_user, *args, **kwargs)
         
@@ -56,4 +157,8 @@ def is_admin(f):
         if current_user['role'] != 'Admin':
             return jsonify({'error': 'Admin access required'}), 403
         return f(current_user, *args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def admin_error():
+    """The error response for a request lacking a valid admin token, or None."""
+    return authenticate_token(is_admin(lambda current_user: None))()
@@ -1,6 +1,6 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from services.auth_service.auth import authenticate_token, is_admin
+from services.auth_service.auth import authenticate_token, is_admin, token_cache, TokenCache
 from flask import Flask, jsonify
 import jwt
 
@@ -89,5 +89,77 @@ class AuthServiceTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 403)
         self.assertIn('Admin access required', response.get_json()['error'])
 
+class TokenCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        token_cache.clear()
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_repeated_requests_skip_verification(self):
+        mock_db = MagicMock()
+        mock_db.get_user_by_id.return_value = dummy_user
+        headers = {'Authorization': f'Bearer {valid_token}'}
+
+        with patch('services.auth_service.auth.user_db', mock_db), \
+                patch('services.auth_service.auth.jwt.decode', wraps=jwt.decode) as mock_decode:
+            for _ in range(3):
+                response = self.client.get('/protected', headers=headers)
+                self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(mock_decode.call_count, 1)
+        self.assertEqual(mock_db.get_user_by_id.call_count, 1)
+
+    def test_failed_verification_is_not_cached(self):
+        headers = {'Authorization': f'Bearer {expired_token}'}
+        with patch('services.auth_service.auth.user_db', MockUserDatabase()):
+            self.client.get('/protected', headers=headers)
+        self.assertEqual(len(token_cache), 0)
+
+    def test_entry_expires_with_token(self):
+        cache = TokenCache(ttl=3600)
+        with patch('services.auth_service.auth.time.time', return_value=1000):
+            cache.put('token', {'user_id': 1, 'role': 'User'}, exp=1010)
+            self.assertIsNotNone(cache.get('token'))
+        with patch('services.auth_service.auth.time.time', return_value=1010):
+            self.assertIsNone(cache.get('token'))
+
+    def test_invalidate_user(self):
+        cache = TokenCache()
+        cache.put('token-a', {'user_id': 1, 'role': 'User'})
+        cache.put('token-b', {'user_id': 1, 'role': 'User'})
+        cache.put('token-c', {'user_id': 2, 'role': 'User'})
+
+        cache.invalidate_user(1)
+
+        self.assertIsNone(cache.get('token-a'))
+        self.assertIsNone(cache.get('token-b'))
+        self.assertIsNotNone(cache.get('token-c'))
+
+    def test_lru_bound(self):
+        cache = TokenCache(maxsize=2)
+        cache.put('token-a', {'user_id': 1, 'role': 'User'})
+        cache.put('token-b', {'user_id': 2, 'role': 'User'})
+        cache.get('token-a')
+        cache.put('token-c', {'user_id': 3, 'role': 'User'})
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('token-b'))
+        self.assertIsNotNone(cache.get('token-a'))
+
+    def test_user_changes_invalidate_cache(self):
+        from services.auth_service import auth
+        token_cache.put('token', {'user_id': 'u1', 'role': 'User'})
+
+        # Role change or removal reported by the user database
+        auth._on_user_change('put', 'u1', {'id': 'u1', 'role': 'Admin'})
+        self.assertIsNone(token_cache.get('token'))
+
+        token_cache.put('token', {'user_id': 'u1', 'role': 'User'})
+        auth._on_user_change('reset', None, None)
+        self.assertEqual(len(token_cache), 0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -133,5 +133,66 @@ class TestAuthService(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertEqual(data['error'], 'User not found')
 
+    @patch('services.auth_service.app.user_db.get_users_by_ids')
+    def test_verify_batch(self, mock_get_users):
+        """Test batch verification with a mix of token states"""
+        mock_get_users.return_value = {self.test_user['id']: self.test_user}
+        unknown_user_token = jwt.encode(
+            {'user_id': 'missing', 'role': 'user',
+             'exp': datetime.now(timezone.utc) + timedelta(hours=1)},
+            SECRET_KEY,
+            algorithm='HS256'
+        )
+        no_claims_token = jwt.encode(
+            {'exp': datetime.now(timezone.utc) + timedelta(hours=1)},
+            SECRET_KEY,
+            algorithm='HS256'
+        )
+
+        response = self.app.post('/auth/verify/batch',
+                               data=json.dumps({'tokens': [
+                                   self.valid_token, self.expired_token,
+                                   'invalid-token', unknown_user_token, 42,
+                                   no_claims_token
+                               ]}),
+                               content_type='application/json')
+
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['count'], 6)
+        self.assertEqual(data['valid_count'], 1)
+        self.assertIn('elapsed_ms', data)
+        self.assertEqual(data['results'][0], {
+            'valid': True,
+            'user_id': self.test_user['id'],
+            'role': self.test_user['role']
+        })
+        self.assertEqual(data['results'][1]['error'], 'Token has expired')
+        self.assertEqual(data['results'][2]['error'], 'Invalid token')
+        self.assertEqual(data['results'][3]['error'], 'User not found')
+        self.assertEqual(data['results'][4]['error'], 'Invalid token')
+        self.assertEqual(data['results'][5]['error'], 'Invalid token')
+
+        # All users are resolved with one lookup
+        mock_get_users.assert_called_once_with({self.test_user['id'], 'missing'})
+
+    def test_verify_batch_invalid_input(self):
+        """Test batch verification input validation"""
+        response = self.app.post('/auth/verify/batch',
+                               data=json.dumps({'tokens': 'not-a-list'}),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.app.post('/auth/verify/batch',
+                               data=json.dumps({'tokens': ['t'] * 1001}),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.app.post('/auth/verify/batch',
+                               data=json.dumps([1, 2]),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error'], 'tokens must be a list')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,242 @@
+# services/common/aio_http.py
+"""Minimal asyncio HTTP/1.1 server for ASGI apps, used when uvicorn is not installed.
+
+Supports keep-alive, Content-Length and chunked request bodies, and
+streamed (chunked) responses. Each connection is one coroutine, so idle
+keep-alive connections cost a few kilobytes rather than a thread.
+"""
+import asyncio
+import socket
+from http import HTTPStatus
+
+MAX_HEADER_SIZE = 64 * 1024
+MAX_BODY_SIZE = 16 * 1024 * 1024
+KEEPALIVE_TIMEOUT = 5.0
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message=''):
+        super().__init__(message)
+        self.status = status
+
+
+def _reason(status):
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ''
+
+
+async def _read_body(reader, headers):
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = bytearray()
+        while True:
+            size_line = await reader.readuntil(b'\r\n')
+            try:
+                size = int(size_line.split(b';', 1)[0], 16)
+            except ValueError:
+                raise BadRequest(400, 'Invalid chunk size')
+            if len(body) + size > MAX_BODY_SIZE:
+                raise BadRequest(413)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return bytes(body)
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+    try:
+        length = int(headers.get('content-length', '0'))
+    except ValueError:
+        raise BadRequest(400, 'Invalid Content-Length')
+    if length < 0:
+        raise BadRequest(400, 'Invalid Content-Length')
+    if length > MAX_BODY_SIZE:
+        raise BadRequest(413)
+    return await reader.readexactly(length) if length else b''
+
+
+def _parse_head(head):
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise BadRequest(400, 'Malformed request line')
+    if not version.startswith('HTTP/1.'):
+        raise BadRequest(505)
+    raw_headers = []
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise BadRequest(400, 'Malformed header')
+        name = name.strip().lower()
+        value = value.strip()
+        raw_headers.append((name.encode('latin-1'), value.encode('latin-1')))
+        headers[name] = f'{headers[name]},{value}' if name in headers else value
+    return method, target, version, raw_headers, headers
+
+
+class _Response:
+    """Collects ASGI send() messages and writes them to the connection."""
+
+    def __init__(self, writer, version, keep_alive, head_only):
+        self.writer = writer
+        self.version = version
+        self.keep_alive = keep_alive
+        self.head_only = head_only
+        self.started = False
+        self.finished = False
+        self.chunked = False
+        self._start = None
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self._start = message
+            return
+        if message['type'] != 'http.response.body' or self.finished:
+            return
+        body = message.get('body', b'')
+        more = message.get('more_body', False)
+        if not self.started:
+            self._write_head(len(body) if not more else None)
+        if self.chunked:
+            if body and not self.head_only:
+                self.writer.write(b'%x\r\n%s\r\n' % (len(body), body))
+            if not more:
+                self.writer.write(b'0\r\n\r\n')
+        elif body and not self.head_only:
+            self.writer.write(body)
+        if not more:
+            self.finished = True
+        await self.writer.drain()
+
+    def _write_head(self, length):
+        self.started = True
+        status = self._start['status']
+        headers = list(self._start.get('headers', []))
+        names = {name.lower() for name, _ in headers}
+        if b'content-length' not in names:
+            if length is not None:
+                headers.append((b'content-length', str(length).encode()))
+            elif self.version == 'HTTP/1.1':
+                self.chunked = True
+                headers.append((b'transfer-encoding', b'chunked'))
+            else:
+                # HTTP/1.0 without a length: the body ends when we close
+                self.keep_alive = False
+        headers.append((b'connection', b'keep-alive' if self.keep_alive else b'close'))
+        lines = [f'{self.version} {status} {_reason(status)}'.encode('latin-1')]
+        lines += [name + b': ' + value for name, value in headers]
+        self.writer.write(b'\r\n'.join(lines) + b'\r\n\r\n')
+
+
+async def _write_error(writer, status):
+    body = _reason(status).encode()
+    writer.write(b'HTTP/1.1 %d %s\r\ncontent-type: text/plain\r\ncontent-length: %d\r\n'
+                 b'connection: close\r\n\r\n%s' % (status, body, len(body), body))
+    await writer.drain()
+
+
+async def handle_connection(app, reader, writer, keepalive_timeout=KEEPALIVE_TIMEOUT):
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    server = writer.get_extra_info('sockname')
+    client = writer.get_extra_info('peername')
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), keepalive_timeout)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                return
+            except asyncio.LimitOverrunError:
+                await _write_error(writer, 431)
+                return
+            try:
+                method, target, version, raw_headers, headers = _parse_head(head[:-4])
+                body = await _read_body(reader, headers)
+            except BadRequest as error:
+                await _write_error(writer, error.status)
+                return
+
+            connection = headers.get('connection', '').lower()
+            keep_alive = ('close' not in connection if version == 'HTTP/1.1'
+                          else 'keep-alive' in connection)
+            path, _, query = target.partition('?')
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0', 'spec_version': '2.3'},
+                'http_version': version[5:],
+                'method': method,
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode('latin-1'),
+                'query_string': query.encode('latin-1'),
+                'root_path': '',
+                'headers': raw_headers,
+                'server': server[:2] if server else None,
+                'client': client[:2] if client else None,
+            }
+            received = False
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {'type': 'http.request', 'body': body, 'more_body': False}
+                # Nothing else arrives on this request; wait for the next one
+                await asyncio.Event().wait()
+
+            response = _Response(writer, version, keep_alive, method == 'HEAD')
+            try:
+                await app(scope, receive, response.send)
+            except Exception:
+                if not response.started:
+                    await _write_error(writer, 500)
+                return
+            if not response.finished or not response.keep_alive:
+                return
+    finally:
+        writer.close()
+
+
+async def _lifespan(app, phase):
+    messages = asyncio.Queue()
+    done = asyncio.Event()
+    await messages.put({'type': f'lifespan.{phase}'})
+
+    async def send(message):
+        if message['type'].startswith(f'lifespan.{phase}.'):
+            done.set()
+
+    task = asyncio.ensure_future(app({'type': 'lifespan', 'asgi': {'version': '3.0'}},
+                                     messages.get, send))
+    await asyncio.wait([task, asyncio.ensure_future(done.wait())],
+                       return_when=asyncio.FIRST_COMPLETED)
+    if not task.done():
+        task.cancel()
+
+
+async def serve(app, host='127.0.0.1', port=8000, sock=None, backlog=2048, ready=None):
+    """Serve ``app`` until cancelled; ``sock`` may be a bound listening socket."""
+    await _lifespan(app, 'startup')
+
+    async def on_connection(reader, writer):
+        await handle_connection(app, reader, writer)
+
+    if sock is not None:
+        server = await asyncio.start_server(on_connection, sock=sock, backlog=backlog,
+                                            limit=MAX_HEADER_SIZE)
+    else:
+        server = await asyncio.start_server(on_connection, host, port, backlog=backlog,
+                                            reuse_address=True, limit=MAX_HEADER_SIZE)
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await _lifespan(app, 'shutdown')
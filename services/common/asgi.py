@@ -0,0 +1,209 @@
+# services/common/asgi.py
+"""Serve the Flask services from an asyncio event loop through ASGI.
+
+``WSGIAdapter`` turns a Flask app into an ASGI application: connections,
+keep-alive and request/response I/O live on the event loop, and each
+request's view (data access, JWT checks) runs on a thread pool, so one
+process holds thousands of mostly idle keep-alive connections while only
+requests doing work occupy a thread. Password hashing is already offloaded
+to its own process pool by the user service.
+
+Usage:
+    python -m services.common.asgi services.destination_service.app:asgi_app --port 5001
+    python -m services.common.asgi services.user_service.app:asgi_app --threads 128
+
+uvicorn is used when it is installed (``--server uvicorn``); otherwise,
+or with ``--server builtin``, the small HTTP/1.1 server in aio_http.py.
+"""
+import argparse
+import asyncio
+import contextvars
+import importlib
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+DEFAULT_THREADS = 64
+
+_END = object()
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP ``scope`` with the request ``body``."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name in ('content-length', 'transfer-encoding'):
+            # The body has already been read and de-chunked
+            continue
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class WSGIAdapter:
+    """ASGI application running a WSGI app on a thread pool."""
+
+    def __init__(self, wsgi_app, threads=DEFAULT_THREADS):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self._executor = None
+
+    @property
+    def executor(self):
+        # Created lazily so a pre-forked worker never inherits a parent's threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads,
+                                                thread_name_prefix='wsgi')
+        return self._executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope: {scope["type"]}')
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, bytes(body))
+        # Hops may land on different pool threads, but Flask keeps its
+        # request context in context variables that a streamed body
+        # (stream_with_context) pops on its last step, so every step of a
+        # response runs in one fresh Context of its own
+        context = contextvars.Context()
+        # The view and the first chunk of its body are produced in one
+        # executor hop; only streamed bodies need more
+        status, headers, chunk, iterator = await loop.run_in_executor(
+            self.executor, context.run, self._start, environ)
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            while chunk is not _END:
+                following = _END
+                if iterator is not None:
+                    following = await loop.run_in_executor(
+                        self.executor, context.run, next, iterator, _END)
+                if chunk or following is _END:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': following is not _END})
+                chunk = following
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, context.run, close)
+
+    def _start(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        result = self.wsgi_app(environ, start_response)
+        # Lists (non-streamed responses) need no iteration off the loop
+        if isinstance(result, (list, tuple)):
+            body = b''.join(result)
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+            return response['status'], response['headers'], body, None
+        iterator = iter(result)
+        # Generators may call start_response on their first step
+        first = next(iterator, _END)
+        length = dict(response['headers']).get(b'content-length')
+        if first is _END or (length is not None and len(first) >= int(length)):
+            # Done already: spare the event loop another executor hop
+            first = b'' if first is _END else first
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+            iterator = None
+        return response['status'], response['headers'], first, iterator
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def load_app(target):
+    """Import ``module:attribute`` and return the attribute."""
+    module_name, _, attribute = target.partition(':')
+    return getattr(importlib.import_module(module_name), attribute or 'asgi_app')
+
+
+def run(app, host='127.0.0.1', port=8000, server='auto'):
+    if server in ('auto', 'uvicorn'):
+        try:
+            import uvicorn
+        except ImportError:
+            if server == 'uvicorn':
+                raise
+        else:
+            uvicorn.run(app, host=host, port=port, log_level='warning')
+            return
+    from services.common.aio_http import serve
+    asyncio.run(serve(app, host, port))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('app', help='module:attribute of an ASGI app, e.g. '
+                                    'services.destination_service.app:asgi_app')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--threads', type=int, help='view threads per process')
+    parser.add_argument('--server', choices=('auto', 'builtin', 'uvicorn'), default='auto')
+    args = parser.parse_args(argv)
+
+    app = load_app(args.app)
+    if args.threads and isinstance(app, WSGIAdapter):
+        app.threads = args.threads
+    run(app, args.host, args.port, args.server)
+
+
+if __name__ == '__main__':
+    main()
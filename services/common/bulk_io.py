@@ -0,0 +1,80 @@
+# services/common/bulk_io.py
+"""Streaming NDJSON/CSV reading and writing shared by the bulk CLIs.
+
+Records are read and written one at a time and grouped with ``batched``,
+so a tool's memory stays bounded however large the file is.
+"""
+import csv
+import json
+import sys
+from contextlib import contextmanager
+
+from data.records import json_default
+
+FORMATS = ('ndjson', 'csv')
+
+
+def detect_format(path, requested=None):
+    if requested:
+        return requested
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+@contextmanager
+def open_stream(path, mode):
+    if path == '-':
+        yield sys.stdin if 'r' in mode else sys.stdout
+        return
+    with open(path, mode, newline='', encoding='utf-8') as stream:
+        yield stream
+
+
+def write_records(records, stream, fmt, fields):
+    """Write ``records`` to ``stream``; returns how many were written.
+
+    ``fields`` are the CSV columns; NDJSON rows are written whole.
+    """
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            stream.write(json.dumps(record, default=json_default) + '\n')
+            count += 1
+    return count
+
+
+def read_records(stream, fmt):
+    """Yield (line number, record or None) for every non-blank input row.
+
+    A row that cannot be parsed is yielded as None so the caller can
+    report it with its position.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # Empty cells (e.g. a blank id column) count as absent
+            yield reader.line_num, {key: value for key, value in row.items() if key and value}
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,144 @@
+# services/common/http_cache.py
+"""Conditional GET support and encoded-body caching for read-heavy listings.
+
+Both databases expose ``get_version()``, which changes on every mutation.
+A listing's ETag is that version plus a digest of the request key, so a
+client polling with If-None-Match gets a bodiless 304 until the data
+changes. Bodies are encoded once and kept as bytes; the cache is also
+emptied by the data layer's mutation events, so local writes free stale
+bodies immediately while the version check covers other processes.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+from data.records import json_default
+from services.common.metrics import REGISTRY
+
+try:
+    import orjson
+except ImportError:  # optional faster encoder
+    orjson = None
+
+
+def encode_json(payload):
+    """Encode ``payload`` to UTF-8 JSON bytes, using orjson when installed.
+
+    Keys are sorted either way, matching Flask's jsonify output. Data-layer
+    records are turned into dicts here, as they are encoded.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=json_default,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(payload, sort_keys=True, separators=(',', ':'),
+                       default=json_default) + '\n').encode()
+
+
+def request_key(role=None):
+    """Cache key for the current request: (endpoint, role, query).
+
+    Query arguments are sorted so their order in the URL does not matter.
+    """
+    return (request.endpoint, role, tuple(sorted(request.args.items(multi=True))))
+
+
+class VersionedBodyCache:
+    """Encoded response bodies keyed by request, valid for one version.
+
+    Holds at most ``maxsize`` bodies (least recently used are dropped);
+    an entry built for an older version is rebuilt on its next lookup.
+    Register ``on_mutation`` as a database listener to drop every body as
+    soon as the data changes in this process.
+
+    A cache given a ``name`` also counts its hits, misses, evictions and
+    invalidations into ``registry`` as travel_body_cache_*_total{cache=name},
+    so they show on /metrics; ``stats()`` has this process's totals.
+    """
+
+    def __init__(self, maxsize=256, encoder=encode_json, name=None, registry=REGISTRY):
+        self.maxsize = maxsize
+        self.encoder = encoder
+        self.name = name
+        self.registry = registry
+        self._entries = OrderedDict()  # key -> (version, body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version, build):
+        """Return the cached body for ``key`` at ``version``, encoding
+        ``build()`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._count('hits')
+                return entry[1]
+            self.misses += 1
+            self._count('misses')
+        # Build outside the lock; two threads may race to build the same
+        # body, which is wasted work but never a wrong answer.
+        body = self.encoder(build())
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                self._count('evictions')
+        return body
+
+    def on_mutation(self, op, key=None, record=None):
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+                self._count('invalidations')
+            self._entries.clear()
+
+    def _count(self, event):
+        if self.name is not None:
+            self.registry.inc(f'travel_body_cache_{event}_total', (self.name,))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def make_etag(version, key):
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=6).hexdigest()
+    return f'{version}.{digest}'
+
+
+def conditional_json(cache, key, version, build):
+    """Respond with the JSON of ``build()``, or 304 if the client has it.
+
+    ``version`` must be read before ``build`` runs, so a body is never
+    labelled with a version newer than the data it was built from.
+    """
+    etag = make_etag(version, key)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(cache.get(key, version, build), mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
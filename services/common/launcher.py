@@ -0,0 +1,486 @@
+# services/common/launcher.py
+"""Pre-forking multi-worker launcher for the services.
+
+Usage:
+    python -m services.common.launcher services.destination_service.app --port 5001
+    python -m services.common.launcher services.user_service.app --port 5002 --workers 8 --mode asgi
+    python services/auth_service/app.py --workers 4        # the same, via the service's __main__
+    python services/auth_service/app.py --debug            # Flask's reloading dev server
+
+The master process imports the app once, runs the module's ``warm_up``
+hook (data files read, indexes built, connections checked) and freezes
+the garbage collector, so those objects are never written to again; it
+then forks the workers, which share the warmed caches copy-on-write and
+all accept on one listening socket. Workers serve with the threaded WSGI
+server (``--mode threaded``) or the asyncio ASGI server (``--mode asgi``).
+
+Signals to the master:
+    SIGHUP           graceful reload: warm up again, start a new set of
+                     workers and stop the old set once the new one is up
+    SIGTERM, SIGINT  graceful shutdown: workers stop accepting, finish the
+                     requests in flight (up to --graceful-timeout) and exit
+
+Workers that die, or stop sending heartbeats for --timeout seconds, are
+replaced. Each worker answers GET /_health with its own status and
+GET /_workers with the status of every worker, read from a shared memory
+board the workers publish to. Code changes need a restart: a reload
+re-forks from the already imported code.
+
+Each worker writes its request metrics to a shared snapshot directory
+(TRAVEL_METRICS_DIR, or a temporary one for the launcher's lifetime), so
+GET /metrics on any worker reports the totals of all of them.
+"""
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import logging
+import mmap
+import os
+import select
+import shutil
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from werkzeug.wsgi import ClosingIterator
+
+MODES = ('threaded', 'asgi')
+HEALTH_PATH = '/_health'
+WORKERS_PATH = '/_workers'
+HEARTBEAT_INTERVAL = 1.0
+
+log = logging.getLogger('travel.launcher')
+
+
+class Scoreboard:
+    """Per-worker status in anonymous shared memory, created before fork.
+
+    Each slot is written only by its worker (and cleared by the master
+    once the worker has exited), so no cross-process locking is needed.
+    """
+
+    SLOT = struct.Struct('qqddqq')
+    FIELDS = ('pid', 'generation', 'started', 'heartbeat', 'requests', 'active')
+
+    def __init__(self, slots):
+        self.slots = slots
+        self._map = mmap.mmap(-1, slots * self.SLOT.size)
+
+    def read(self, slot):
+        return dict(zip(self.FIELDS, self.SLOT.unpack_from(self._map, slot * self.SLOT.size)))
+
+    def write(self, slot, **fields):
+        values = {**self.read(slot), **fields}
+        self.SLOT.pack_into(self._map, slot * self.SLOT.size,
+                            *(values[name] for name in self.FIELDS))
+
+    def clear(self, slot):
+        self.SLOT.pack_into(self._map, slot * self.SLOT.size, 0, 0, 0.0, 0.0, 0, 0)
+
+    def free_slot(self):
+        for slot in range(self.slots):
+            if not self.read(slot)['pid']:
+                return slot
+        raise RuntimeError('No free worker slot')
+
+    def workers(self):
+        return [{'slot': slot, **status}
+                for slot, status in ((s, self.read(s)) for s in range(self.slots))
+                if status['pid']]
+
+
+class WorkerStatus:
+    """Request counters of this worker, published to its scoreboard slot."""
+
+    def __init__(self, board, slot, generation):
+        self.board = board
+        self.slot = slot
+        self.requests = 0
+        self.active = 0
+        self._lock = threading.Lock()
+        board.write(slot, pid=os.getpid(), generation=generation, started=time.time(),
+                    heartbeat=0.0, requests=0, active=0)
+
+    def begin(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+
+    def end(self):
+        with self._lock:
+            self.active -= 1
+
+    def heartbeat(self):
+        self.board.write(self.slot, heartbeat=time.time(),
+                         requests=self.requests, active=self.active)
+
+    def drain(self, timeout):
+        """Wait up to ``timeout`` seconds for requests in flight to finish."""
+        deadline = time.monotonic() + timeout
+        while self.active and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+class StatusMiddleware:
+    """Counts requests and answers the health and worker status paths."""
+
+    def __init__(self, app, status):
+        self.app = app
+        self.status = status
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO')
+        if path == HEALTH_PATH:
+            return self._json(start_response, {'status': 'ok', **self.status.board.read(
+                self.status.slot)})
+        if path == WORKERS_PATH:
+            return self._json(start_response, {'workers': self.status.board.workers()})
+        self.status.begin()
+        try:
+            return ClosingIterator(self.app(environ, start_response), self.status.end)
+        except BaseException:
+            self.status.end()
+            raise
+
+    @staticmethod
+    def _json(start_response, payload):
+        body = json.dumps(payload).encode()
+        start_response('200 OK', [('Content-Type', 'application/json'),
+                                  ('Content-Length', str(len(body))),
+                                  ('Cache-Control', 'no-store')])
+        return [body]
+
+
+def serve_threaded(app, sock, status, graceful_timeout):
+    from werkzeug.serving import make_server
+
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    stopping = threading.Event()
+
+    def beat():
+        while not stopping.wait(HEARTBEAT_INTERVAL):
+            status.heartbeat()
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so not from its thread
+        stopping.set()
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    status.heartbeat()
+    threading.Thread(target=beat, daemon=True).start()
+    server.serve_forever()
+    status.drain(graceful_timeout)
+
+
+async def serve_asgi(app, sock, status, graceful_timeout):
+    from services.common.aio_http import serve
+
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stopping.set)
+    ready = loop.create_future()
+    task = asyncio.ensure_future(serve(app, sock=sock, ready=ready.set_result))
+    await asyncio.wait([ready, task], return_when=asyncio.FIRST_COMPLETED)
+    if task.done():
+        task.result()
+        return
+    server = ready.result()
+
+    async def beat():
+        # Beating from the loop itself shows the loop is not blocked
+        while True:
+            status.heartbeat()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    heartbeat = asyncio.ensure_future(beat())
+    await stopping.wait()
+    server.close()
+    deadline = loop.time() + graceful_timeout
+    while status.active and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+    heartbeat.cancel()
+    task.cancel()
+    await asyncio.gather(heartbeat, task, return_exceptions=True)
+
+
+class Launcher:
+    def __init__(self, app, warm_up=None, host='127.0.0.1', port=8000, workers=None,
+                 mode='threaded', threads=None, timeout=30.0, graceful_timeout=30.0,
+                 backlog=2048):
+        self.app = app
+        self.warm_up = warm_up
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.threads = threads
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.generation = 0
+        self.children = {}  # pid -> (slot, generation)
+        # Room for two full generations while a reload overlaps them
+        self.board = Scoreboard(self.workers * 2 + 1)
+        self.sock = None
+        self.metrics_dir = None
+        self._signals = []
+        self._wakeup = None
+
+    # Master
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET6 if ':' in self.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        self.sock = sock
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def preload(self):
+        gc.unfreeze()
+        if self.warm_up is not None:
+            self.warm_up()
+        # Move everything loaded so far out of the collector's reach: its
+        # bookkeeping writes would otherwise un-share the pages in workers
+        gc.collect()
+        gc.freeze()
+
+    def run(self):
+        if self.sock is None:
+            self.bind()
+        self._share_metrics()
+        self.preload()
+        self._install_signals()
+        log.info('Listening on %s:%s with %d %s workers',
+                 self.host, self.port, self.workers, self.mode)
+        self._spawn_generation()
+        try:
+            while True:
+                self._reap()
+                pending, self._signals = self._signals, []
+                if signal.SIGTERM in pending or signal.SIGINT in pending:
+                    self.stop()
+                    return
+                if signal.SIGHUP in pending:
+                    self.reload()
+                self._kill_hung()
+                self._spawn_missing()
+                self._sleep()
+        finally:
+            self.sock.close()
+            if self.metrics_dir is not None:
+                shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    def _share_metrics(self):
+        from services.common.metrics import REGISTRY
+        if REGISTRY.snapshot_dir is None:
+            self.metrics_dir = tempfile.mkdtemp(prefix='travel-metrics-')
+            REGISTRY.snapshot_dir = self.metrics_dir
+        os.makedirs(REGISTRY.snapshot_dir, exist_ok=True)
+
+    def reload(self):
+        log.info('Reloading workers')
+        old = [pid for pid, (_, generation) in self.children.items()
+               if generation == self.generation]
+        self.generation += 1
+        self.preload()
+        new = self._spawn_generation()
+        # Keep the old workers serving until the new ones have checked in
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline and not all(
+                self.board.read(self.children[pid][0])['heartbeat']
+                for pid in new if pid in self.children):
+            self._reap()
+            time.sleep(0.05)
+        self._signal_workers(old, signal.SIGTERM)
+
+    def stop(self):
+        log.info('Shutting down')
+        self._signal_workers(list(self.children), signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 1
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        self._signal_workers(list(self.children), signal.SIGKILL)
+        while self.children:
+            self._reap(block=True)
+
+    def _install_signals(self):
+        read, write = os.pipe()
+        os.set_blocking(read, False)
+        os.set_blocking(write, False)
+        self._wakeup = (read, write)
+        signal.set_wakeup_fd(write)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+
+    def _on_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def _sleep(self):
+        read = self._wakeup[0]
+        if select.select([read], [], [], HEARTBEAT_INTERVAL)[0]:
+            try:
+                while os.read(read, 512):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def _spawn_generation(self):
+        return [self._spawn() for _ in range(self.workers)]
+
+    def _spawn_missing(self):
+        current = sum(1 for _, generation in self.children.values()
+                      if generation == self.generation)
+        for _ in range(self.workers - current):
+            self._spawn()
+
+    def _spawn(self):
+        slot = self.board.free_slot()
+        # Claim the slot before forking so the next spawn picks another
+        self.board.write(slot, pid=-1, generation=self.generation, started=time.time())
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._worker(slot)
+                code = 0
+            except SystemExit as exit:
+                code = exit.code if isinstance(exit.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                # Skip the master's atexit handlers and finalizers
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = (slot, self.generation)
+        return pid
+
+    def _reap(self, block=False):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+            entry = self.children.pop(pid, None)
+            if entry is not None:
+                self.board.clear(entry[0])
+                self._drop_metrics(pid)
+                code = os.waitstatus_to_exitcode(status)
+                if entry[1] == self.generation and code:
+                    log.warning('Worker %d exited with status %d', pid, code)
+            if block:
+                return
+
+    def _drop_metrics(self, pid):
+        from services.common.metrics import REGISTRY
+        if REGISTRY.snapshot_dir:
+            try:
+                os.remove(REGISTRY.snapshot_path(pid))
+            except FileNotFoundError:
+                pass
+
+    def _kill_hung(self):
+        now = time.time()
+        for pid, (slot, _) in list(self.children.items()):
+            status = self.board.read(slot)
+            last = status['heartbeat'] or status['started']
+            if last and now - last > self.timeout:
+                log.warning('Worker %d missed its heartbeat, killing it', pid)
+                self._signal_workers([pid], signal.SIGKILL)
+
+    def _signal_workers(self, pids, signum):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    # Worker
+
+    def _worker(self, slot):
+        signal.set_wakeup_fd(-1)
+        for fd in self._wakeup:
+            os.close(fd)
+        for signum in (signal.SIGTERM, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        # Only the master reacts to reloads and Ctrl+C; it then stops us
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # Per-request logging on every worker costs more than it tells
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+        status = WorkerStatus(self.board, slot, self.generation)
+        app = StatusMiddleware(self.app, status)
+        if self.mode == 'asgi':
+            from services.common.asgi import DEFAULT_THREADS, WSGIAdapter
+            asyncio.run(serve_asgi(WSGIAdapter(app, self.threads or DEFAULT_THREADS),
+                                   self.sock, status, self.graceful_timeout))
+        else:
+            serve_threaded(app, self.sock, status, self.graceful_timeout)
+
+
+def load_target(target):
+    """Import ``module[:attribute]``; returns (wsgi app, warm_up hook or None)."""
+    module_name, _, attribute = target.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute or 'app'), getattr(module, 'warm_up', None)
+
+
+def main(argv=None, app=None, warm_up=None, port=8000):
+    """Run ``app`` (or the app named on the command line) under the launcher.
+
+    Services call this from their ``__main__`` with their own app, warm-up
+    hook and default port.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    if app is None:
+        parser.add_argument('target', help='module[:attribute] of a WSGI app, e.g. '
+                                           'services.destination_service.app')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    parser.add_argument('--mode', choices=MODES, default='threaded')
+    parser.add_argument('--threads', type=int, help='view threads per worker in asgi mode')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='seconds without a heartbeat before a worker is replaced')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='seconds workers get to finish requests when stopping')
+    parser.add_argument('--debug', action='store_true',
+                        help='run the single-process reloading dev server instead')
+    args = parser.parse_args(argv)
+
+    if app is None:
+        app, warm_up = load_target(args.target)
+    if args.debug:
+        if hasattr(app, 'run'):
+            app.run(host=args.host, port=args.port, debug=True)
+        else:
+            from werkzeug.serving import run_simple
+            run_simple(args.host, args.port, app, use_reloader=True, use_debugger=True)
+        return
+    logging.basicConfig(level=logging.INFO, format='[%(process)d] %(message)s')
+    Launcher(app, warm_up, host=args.host, port=args.port, workers=args.workers,
+             mode=args.mode, threads=args.threads, timeout=args.timeout,
+             graceful_timeout=args.graceful_timeout).run()
+
+
+if __name__ == '__main__':
+    main()
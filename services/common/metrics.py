@@ -0,0 +1,304 @@
+# services/common/metrics.py
+"""Request and sub-span metrics served in the Prometheus text format.
+
+``instrument(app, service)`` adds to a Flask app:
+
+    travel_http_requests_total{service,method,route,status}          counter
+    travel_http_request_duration_seconds{service,method,route}       histogram
+    GET /metrics
+
+``route`` is the matched URL rule (``/destinations/<destination_id>``),
+so ids never become label values. Sub-steps of a request are timed with
+``span(name)`` into ``travel_span_duration_seconds{span}``: the services
+time jwt_decode, jwt_encode, password_hash and password_verify, and the
+file data layer reports data_load, data_index, data_save,
+data_journal and data_sync through data.events. The encoded-body caches
+count hits, misses, evictions and invalidations into
+``travel_body_cache_<event>_total{cache}``.
+
+Recording is lock-free: every thread adds into its own shard, and shards
+are only summed when /metrics is scraped. Under the pre-forking launcher,
+each worker also writes a snapshot of its totals to TRAVEL_METRICS_DIR
+every few seconds, and /metrics adds up the snapshots of the live
+workers, so a scrape hitting any worker sees the whole service.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from data.events import add_span_observer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; from cache hits (well under a millisecond) to slow KDF batches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SNAPSHOT_INTERVAL = 5.0
+# Fold the shards of finished threads (one per connection under the
+# threaded server) into the totals once this many have accumulated
+SHARD_COMPACT_THRESHOLD = 256
+
+
+class Registry:
+    """Counters and histograms sharded per thread, merged on scrape."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, snapshot_dir=None):
+        self.buckets = tuple(buckets)
+        self.snapshot_dir = snapshot_dir
+        self._metrics = {}        # name -> (type, help, label names)
+        self._local = threading.local()
+        self._shards = []         # (thread, counters, histograms)
+        self._retired = ({}, {})  # totals of finished threads
+        self._lock = threading.Lock()
+        self._pid = None
+        self._writer = None
+
+    def counter(self, name, help, labels=()):
+        self._metrics[name] = ('counter', help, tuple(labels))
+
+    def histogram(self, name, help, labels=()):
+        self._metrics[name] = ('histogram', help, tuple(labels))
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = ({}, {})
+            with self._lock:
+                self._shards.append((threading.current_thread(), *shard))
+                if len(self._shards) > SHARD_COMPACT_THRESHOLD:
+                    self._compact()
+        return shard
+
+    def inc(self, name, labels=(), amount=1):
+        counters = self._shard()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()[1]
+        key = (name, labels)
+        slots = histograms.get(key)
+        if slots is None:
+            # One slot per bucket, +Inf, then sum and count
+            slots = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        slots[bisect.bisect_left(self.buckets, value)] += 1
+        slots[-2] += value
+        slots[-1] += 1
+
+    def _compact(self):
+        # Caller holds _lock; a finished thread can no longer write its shard
+        alive = []
+        for thread, counters, histograms in self._shards:
+            if thread.is_alive():
+                alive.append((thread, counters, histograms))
+            else:
+                _merge(self._retired, (counters, histograms))
+        self._shards = alive
+
+    def collect(self):
+        """Totals of this process as (counters, histograms)."""
+        with self._lock:
+            self._compact()
+            totals = ({}, {})
+            _merge(totals, self._retired)
+            for _, counters, histograms in self._shards:
+                # Copy first: the owning thread may add keys meanwhile
+                _merge(totals, (dict(counters), {k: list(v) for k, v in
+                                                 list(histograms.items())}))
+        return totals
+
+    # Multi-process aggregation
+
+    def snapshot_path(self, pid):
+        return os.path.join(self.snapshot_dir, f'metrics-{pid}.json')
+
+    def ensure_snapshots(self):
+        """Start this process's snapshot writer if a snapshot directory is set.
+
+        Called when serving requests rather than on import, so the
+        launcher's master never runs a thread it would fork.
+        """
+        if not self.snapshot_dir or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._writer = threading.Thread(target=self._write_snapshots, daemon=True,
+                                            name='metrics-snapshot')
+            self._writer.start()
+
+    def reset(self):
+        """Forget everything recorded, e.g. the master's warm-up in a new worker."""
+        self._local = threading.local()
+        self._shards = []
+        self._retired = ({}, {})
+        self._lock = threading.Lock()
+        self._pid = None
+        self._writer = None
+
+    def _write_snapshots(self):
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL)
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        counters, histograms = self.collect()
+        data = {'counters': [[name, list(labels), value]
+                             for (name, labels), value in counters.items()],
+                'histograms': [[name, list(labels), slots]
+                               for (name, labels), slots in histograms.items()]}
+        path = self.snapshot_path(os.getpid())
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+    def collect_all(self):
+        """Totals of this process plus the snapshots of the other live workers."""
+        totals = self.collect()
+        if not self.snapshot_dir or not os.path.isdir(self.snapshot_dir):
+            return totals
+        for entry in os.listdir(self.snapshot_dir):
+            if not (entry.startswith('metrics-') and entry.endswith('.json')):
+                continue
+            pid = int(entry[len('metrics-'):-len('.json')])
+            if pid == os.getpid() or not _alive(pid):
+                continue
+            try:
+                with open(os.path.join(self.snapshot_dir, entry)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            _merge(totals, ({(n, tuple(l)): v for n, l, v in data['counters']},
+                            {(n, tuple(l)): s for n, l, s in data['histograms']}))
+        return totals
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        counters, histograms = self.collect_all()
+        lines = []
+        for name, (kind, help, label_names) in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(label_names, labels)} {value}')
+                continue
+            for (metric, labels), slots in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), slots):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket'
+                                 f'{_labels(label_names + ("le",), labels + (le,))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(label_names, labels)} {slots[-2]}')
+                lines.append(f'{name}_count{_labels(label_names, labels)} {slots[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(totals, shard):
+    counters, histograms = totals
+    for key, value in shard[0].items():
+        counters[key] = counters.get(key, 0) + value
+    for key, slots in shard[1].items():
+        current = histograms.get(key)
+        if current is None:
+            histograms[key] = list(slots)
+        else:
+            for index, value in enumerate(slots):
+                current[index] += value
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+REGISTRY = Registry(snapshot_dir=os.environ.get('TRAVEL_METRICS_DIR'))
+REGISTRY.counter('travel_http_requests_total', 'HTTP requests handled.',
+                 ('service', 'method', 'route', 'status'))
+REGISTRY.histogram('travel_http_request_duration_seconds', 'Time to produce a response.',
+                   ('service', 'method', 'route'))
+REGISTRY.histogram('travel_span_duration_seconds', 'Time spent in a step of a request.',
+                   ('span',))
+# Counted by the named caches in services/common/http_cache.py
+REGISTRY.counter('travel_body_cache_hits_total', 'Response bodies served from a cache.',
+                 ('cache',))
+REGISTRY.counter('travel_body_cache_misses_total', 'Response bodies encoded on a cache miss.',
+                 ('cache',))
+REGISTRY.counter('travel_body_cache_evictions_total',
+                 'Cached bodies dropped to stay within the size limit.', ('cache',))
+REGISTRY.counter('travel_body_cache_invalidations_total',
+                 'Times a cache was emptied by a write.', ('cache',))
+
+
+def observe_span(name, seconds):
+    REGISTRY.observe('travel_span_duration_seconds', (name,), seconds)
+
+
+@contextmanager
+def span(name):
+    """Time the block into travel_span_duration_seconds{span=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_span(name, time.perf_counter() - start)
+
+
+# The data layer cannot import the services; it reports through this hook
+add_span_observer(observe_span)
+
+if hasattr(os, 'register_at_fork'):
+    # Each worker reports only its own work; the snapshots add them up
+    os.register_at_fork(after_in_child=REGISTRY.reset)
+
+
+def instrument(app, service, registry=REGISTRY):
+    """Record request metrics for ``app`` and serve them on /metrics."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        registry.ensure_snapshots()
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            rule = request.url_rule
+            route = rule.rule if rule is not None else '<unmatched>'
+            registry.observe('travel_http_request_duration_seconds',
+                             (service, request.method, route), time.perf_counter() - start)
+            registry.inc('travel_http_requests_total',
+                         (service, request.method, route, str(response.status_code)))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE,
+                        headers={'Cache-Control': 'no-store'})
+
+    return app
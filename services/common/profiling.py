@@ -0,0 +1,203 @@
+# services/common/profiling.py
+"""Opt-in profiling of live requests, for admins.
+
+``enable_profiling(app, authorize)`` adds two ways in:
+
+    X-Profile: sample | cprofile      request header
+        The request runs as usual, but the response body is replaced by
+        its profile; the real status is sent in X-Profile-Status.
+        ``sample`` returns collapsed stacks of this request's thread,
+        sampled every millisecond. ``cprofile`` returns the cProfile
+        statistics of the request, by cumulative time.
+
+    GET /_profile?seconds=5&interval=0.005&threads=requests|all
+        Samples the process for a time window and returns collapsed
+        stacks. By default only threads busy with a request are sampled,
+        so idle servers and pools stay out of the picture.
+
+Collapsed stacks are one ``root;caller;callee count`` line per distinct
+stack, the input of flamegraph.pl, speedscope and inferno:
+
+    curl -s -H "Authorization: Bearer $TOKEN" 'localhost:5001/_profile?seconds=10' \\
+        | flamegraph.pl > profile.svg
+
+``authorize`` is called before any profiling and returns an error
+response for callers who may not profile, or None. Under the launcher a
+window covers only the worker that received the request.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, g, jsonify, request
+
+PROFILE_HEADER = 'X-Profile'
+MODES = ('sample', 'cprofile')
+REQUEST_SAMPLE_INTERVAL = 0.001
+DEFAULT_WINDOW = 5.0
+MAX_WINDOW = 60.0
+MIN_INTERVAL = 0.001
+CPROFILE_LINES = 60
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Threads serving a request right now, across every profiled app
+_busy_threads = set()
+# cProfile cannot always profile two threads at once (Python 3.12+)
+_cprofile_lock = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(ROOT + os.sep):
+        path = os.path.relpath(path, ROOT)
+    else:
+        path = os.path.basename(path)
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({path}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def collapse(frame):
+    """The stack of ``frame`` in collapsed form, outermost frame first."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def render_collapsed(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+class Sampler:
+    """Samples the Python stacks of other threads from a background thread.
+
+    ``threads`` returns the idents to sample at each tick; None samples
+    every thread but the sampler itself.
+    """
+
+    def __init__(self, interval, threads=None):
+        self.interval = interval
+        self.threads = threads
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='profile-sampler')
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            wanted = self.threads() if self.threads is not None else None
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (wanted is not None and ident not in wanted):
+                    continue
+                self.stacks[collapse(frame)] += 1
+            self.samples += 1
+
+
+def _float_arg(name, default, low, high):
+    try:
+        value = float(request.args.get(name, default))
+    except ValueError:
+        return None
+    return value if low <= value <= high else None
+
+
+def enable_profiling(app, authorize):
+    """Let authorized callers profile requests to ``app``; see the module doc."""
+
+    @app.before_request
+    def _start_profile():
+        _busy_threads.add(threading.get_ident())
+        mode = request.headers.get(PROFILE_HEADER)
+        if mode is None:
+            return None
+        mode = mode.strip().lower()
+        if mode not in MODES:
+            return jsonify({'error': f'{PROFILE_HEADER} must be one of {", ".join(MODES)}'}), 400
+        error = authorize()
+        if error is not None:
+            return error
+        if mode == 'cprofile':
+            if not _cprofile_lock.acquire(blocking=False):
+                return jsonify({'error': 'Another cProfile run is in progress'}), 409
+            profiler = cProfile.Profile()
+            g._profile = (mode, profiler)
+            profiler.enable()
+        else:
+            ident = threading.get_ident()
+            g._profile = (mode, Sampler(REQUEST_SAMPLE_INTERVAL, lambda: (ident,)).start())
+        return None
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        mode, profiler = profile
+        if mode == 'cprofile':
+            profiler.disable()
+            _cprofile_lock.release()
+            out = io.StringIO()
+            stats = pstats.Stats(profiler, stream=out)
+            stats.sort_stats('cumulative').print_stats(CPROFILE_LINES)
+            body = out.getvalue()
+        else:
+            body = render_collapsed(profiler.stop())
+        return Response(body, content_type='text/plain; charset=utf-8',
+                        headers={'X-Profile-Status': str(response.status_code),
+                                 'Cache-Control': 'no-store'})
+
+    @app.teardown_request
+    def _end_request(exc):
+        _busy_threads.discard(threading.get_ident())
+        # A view that raised skips after_request; never leave a profiler on
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            if profile[0] == 'cprofile':
+                profile[1].disable()
+                _cprofile_lock.release()
+            else:
+                profile[1].stop()
+
+    @app.route('/_profile', methods=['GET'])
+    def profile_window():
+        error = authorize()
+        if error is not None:
+            return error
+        seconds = _float_arg('seconds', DEFAULT_WINDOW, 0, MAX_WINDOW)
+        interval = _float_arg('interval', 0.005, MIN_INTERVAL, 1.0)
+        scope = request.args.get('threads', 'requests')
+        if seconds is None or interval is None or scope not in ('requests', 'all'):
+            return jsonify({'error': f'seconds must be 0-{MAX_WINDOW:g}, interval '
+                                     f'{MIN_INTERVAL:g}-1 and threads requests or all'}), 400
+        own = threading.get_ident()
+        # Leave out the thread waiting here for the window to end
+        if scope == 'all':
+            threads = lambda: sys._current_frames().keys() - {own}
+        else:
+            threads = lambda: _busy_threads - {own}
+        sampler = Sampler(interval, threads).start()
+        time.sleep(seconds)
+        stacks = sampler.stop()
+        return Response(render_collapsed(stacks), content_type='text/plain; charset=utf-8',
+                        headers={'X-Profile-Samples': str(sampler.samples),
+                                 'Cache-Control': 'no-store'})
+
+    return app
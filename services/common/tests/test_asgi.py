@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from flask import Flask, Response, jsonify, request
+
+from services.common.aio_http import serve
+from services.common.asgi import WSGIAdapter, build_environ
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify({'body': request.get_json(), 'query': request.args.get('q'),
+                        'auth': request.headers.get('Authorization')})
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'{i}\n' for i in range(3)), mimetype='text/plain')
+
+    return app
+
+async def call(app, method, path, body=b'', query=b'', headers=()):
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(b'content-type', b'application/json'), *headers]}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+class TestWSGIAdapter(unittest.TestCase):
+    def setUp(self):
+        self.app = WSGIAdapter(make_app(), threads=2)
+
+    def test_environ_from_scope(self):
+        environ = build_environ({'method': 'GET', 'path': '/a', 'query_string': b'x=1',
+                                 'headers': [(b'x-token', b'a'), (b'x-token', b'b')]}, b'{}')
+        self.assertEqual(environ['PATH_INFO'], '/a')
+        self.assertEqual(environ['QUERY_STRING'], 'x=1')
+        self.assertEqual(environ['CONTENT_LENGTH'], '2')
+        self.assertEqual(environ['HTTP_X_TOKEN'], 'a,b')
+
+    def test_request_reaches_view(self):
+        messages = asyncio.run(call(self.app, 'POST', '/echo', b'{"a": 1}', b'q=paris',
+                                    [(b'authorization', b'Bearer t')]))
+        self.assertEqual(messages[0]['status'], 200)
+        # A response of known length is sent as one body message
+        self.assertEqual(len(messages), 2)
+        self.assertFalse(messages[1]['more_body'])
+        self.assertIn(b'"query":"paris"', messages[1]['body'].replace(b' ', b''))
+        self.assertIn(b'"auth":"Bearert"', messages[1]['body'].replace(b' ', b''))
+
+    def test_streamed_response(self):
+        messages = asyncio.run(call(self.app, 'GET', '/stream'))
+        self.assertEqual(b''.join(m.get('body', b'') for m in messages[1:]), b'0\n1\n2\n')
+        self.assertFalse(messages[-1]['more_body'])
+
+    def test_not_found(self):
+        messages = asyncio.run(call(self.app, 'GET', '/missing'))
+        self.assertEqual(messages[0]['status'], 404)
+
+class TestBuiltinServer(unittest.TestCase):
+    def exchange(self, requests):
+        app = WSGIAdapter(make_app(), threads=2)
+
+        async def run():
+            ready = asyncio.get_running_loop().create_future()
+            task = asyncio.ensure_future(serve(app, port=0, ready=ready.set_result))
+            server = await ready
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            responses = []
+            for raw in requests:
+                writer.write(raw)
+                head = await reader.readuntil(b'\r\n\r\n')
+                if b'transfer-encoding: chunked' in head:
+                    responses.append(head + await reader.readuntil(b'0\r\n\r\n'))
+                else:
+                    length = int(head.split(b'content-length: ')[1].split(b'\r\n')[0])
+                    responses.append(head + await reader.readexactly(length))
+            writer.close()
+            await writer.wait_closed()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return responses
+
+        return asyncio.run(run())
+
+    def test_keep_alive_serves_several_requests(self):
+        body = b'{"a": 1}'
+        post = (b'POST /echo HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n'
+                b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+        chunked = (b'POST /echo HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n'
+                   b'Transfer-Encoding: chunked\r\n\r\n4\r\n{"a"\r\n4\r\n: 2}\r\n0\r\n\r\n')
+        responses = self.exchange([post, chunked])
+        self.assertTrue(responses[0].startswith(b'HTTP/1.1 200 OK\r\n'))
+        self.assertIn(b'connection: keep-alive', responses[0])
+        self.assertIn(b'"a":1', responses[0].replace(b' ', b''))
+        self.assertIn(b'"a":2', responses[1].replace(b' ', b''))
+
+    def test_streamed_response_is_chunked(self):
+        responses = self.exchange([b'GET /stream HTTP/1.1\r\nHost: x\r\n\r\n'])
+        self.assertIn(b'transfer-encoding: chunked', responses[0])
+        self.assertTrue(responses[0].endswith(b'2\r\n0\n\r\n2\r\n1\n\r\n2\r\n2\n\r\n0\r\n\r\n'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch
+from flask import Flask, json
+
+from data.records import DestinationRecord
+from services.common import http_cache
+from services.common.http_cache import VersionedBodyCache, conditional_json, encode_json
+
+class TestVersionedBodyCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = VersionedBodyCache(maxsize=2)
+        self.builds = []
+
+    def build(self, payload):
+        def build():
+            self.builds.append(payload)
+            return payload
+        return build
+
+    def test_body_encoded_once_per_version(self):
+        self.assertEqual(self.cache.get('a', 'v1', self.build({'n': 1})), b'{"n":1}\n')
+        self.assertEqual(self.cache.get('a', 'v1', self.build({'n': 2})), b'{"n":1}\n')
+        self.assertEqual(self.cache.get('a', 'v2', self.build({'n': 3})), b'{"n":3}\n')
+        self.assertEqual(self.builds, [{'n': 1}, {'n': 3}])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_least_recently_used_evicted(self):
+        self.cache.get('a', 'v1', self.build('a'))
+        self.cache.get('b', 'v1', self.build('b'))
+        self.cache.get('a', 'v1', self.build('a2'))
+        self.cache.get('c', 'v1', self.build('c'))
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertEqual(self.cache.get('a', 'v1', self.build('a3')), b'"a"\n')
+        self.assertEqual(self.cache.get('b', 'v1', self.build('b2')), b'"b2"\n')
+
+    def test_mutation_event_drops_bodies(self):
+        self.cache.get('a', 'v1', self.build('a'))
+        self.cache.on_mutation('put', '1', {'id': '1'})
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+        self.cache.get('a', 'v1', self.build('a2'))
+        self.assertEqual(self.builds, ['a', 'a2'])
+
+class TestEncodeJson(unittest.TestCase):
+    def test_matches_standard_json(self):
+        payload = [{'name': 'Zürich', 'id': '1', 'tags': [1, 2.5, None, True]}]
+        self.assertEqual(json.loads(encode_json(payload)), payload)
+        self.assertTrue(encode_json(payload).endswith(b'\n'))
+
+    def test_fallback_without_orjson(self):
+        with patch.object(http_cache, 'orjson', None):
+            self.assertEqual(encode_json({'b': 1, 'a': [1]}), b'{"a":[1],"b":1}\n')
+
+    def test_records_encoded_as_dicts(self):
+        record = DestinationRecord({'location': 'Peru', 'id': 'a', 'tags': ['x']})
+        expected = b'[{"id":"a","location":"Peru","tags":["x"]}]\n'
+        self.assertEqual(encode_json([record]), expected)
+        with patch.object(http_cache, 'orjson', None):
+            self.assertEqual(encode_json([record]), expected)
+
+class TestConditionalJson(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.cache = VersionedBodyCache()
+        self.version = 'v1'
+        self.calls = 0
+
+        @self.app.route('/items')
+        def items():
+            def build():
+                self.calls += 1
+                return [{'id': '1'}]
+            return conditional_json(self.cache, 'items', self.version, build)
+
+        self.client = self.app.test_client()
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get('/items')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), [{'id': '1'}])
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        etag = response.headers['ETag']
+
+        response = self.client.get('/items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        response = self.client.get('/items', headers={'If-None-Match': 'W/' + etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.calls, 1)
+
+    def test_new_version_sends_new_body(self):
+        etag = self.client.get('/items').headers['ETag']
+        self.version = 'v2'
+        response = self.client.get('/items', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(self.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import unittest
+import urllib.request
+from flask import Flask, jsonify
+from werkzeug.test import Client
+
+from services.common.launcher import Scoreboard, StatusMiddleware, WorkerStatus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+class TestScoreboard(unittest.TestCase):
+    def test_slots(self):
+        board = Scoreboard(2)
+        self.assertEqual(board.free_slot(), 0)
+        board.write(0, pid=10, requests=3)
+        self.assertEqual(board.free_slot(), 1)
+        board.write(1, pid=11)
+        with self.assertRaises(RuntimeError):
+            board.free_slot()
+        self.assertEqual([w['pid'] for w in board.workers()], [10, 11])
+        self.assertEqual(board.read(0)['requests'], 3)
+
+        board.clear(0)
+        self.assertEqual(board.free_slot(), 0)
+        self.assertEqual([w['slot'] for w in board.workers()], [1])
+
+class TestStatusMiddleware(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+        app.add_url_rule('/ping', 'ping', lambda: jsonify({'pong': True}))
+        self.board = Scoreboard(2)
+        self.status = WorkerStatus(self.board, 1, generation=3)
+        self.client = Client(StatusMiddleware(app, self.status))
+
+    def test_requests_counted(self):
+        response = self.client.get('/ping')
+        self.assertEqual(self.status.active, 1)
+        # Servers close the response once it is sent
+        response.close()
+        self.client.get('/ping').close()
+        self.assertEqual(self.status.requests, 2)
+        self.assertEqual(self.status.active, 0)
+
+    def test_health_and_workers(self):
+        self.client.get('/ping')
+        self.status.heartbeat()
+        health = json.loads(self.client.get('/_health').data)
+        self.assertEqual(health['status'], 'ok')
+        self.assertEqual(health['pid'], os.getpid())
+        self.assertEqual(health['generation'], 3)
+        self.assertEqual(health['requests'], 1)
+        workers = json.loads(self.client.get('/_workers').data)['workers']
+        self.assertEqual([w['slot'] for w in workers], [1])
+        # Status requests are not counted as traffic
+        self.assertEqual(self.status.requests, 1)
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+class TestLauncher(unittest.TestCase):
+    def setUp(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'services.common.launcher', 'services.auth_service.app',
+             '--port', '0', '--workers', '2', '--graceful-timeout', '2'],
+            cwd=ROOT, stderr=subprocess.PIPE, text=True)
+        line = self.process.stderr.readline()
+        self.port = int(re.search(r':(\d+) with', line).group(1))
+
+    def tearDown(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process.stderr.close()
+
+    def workers(self):
+        url = f'http://127.0.0.1:{self.port}/_workers'
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.load(response)['workers']
+
+    def wait_for(self, condition, timeout=15):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                workers = self.workers()
+                if condition(workers):
+                    return workers
+            except OSError:
+                pass
+            time.sleep(0.1)
+        self.fail('Workers never reached the expected state')
+
+    def test_reload_and_shutdown(self):
+        """Test that SIGHUP replaces every worker and SIGTERM stops cleanly"""
+        before = self.wait_for(lambda ws: len(ws) == 2 and all(w['heartbeat'] for w in ws))
+        self.assertEqual({w['generation'] for w in before}, {0})
+
+        self.process.send_signal(signal.SIGHUP)
+        after = self.wait_for(lambda ws: len(ws) == 2 and {w['generation'] for w in ws} == {1})
+        self.assertFalse({w['pid'] for w in before} & {w['pid'] for w in after})
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(timeout=10), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from flask import Flask
+
+from data.events import timed
+from services.common import metrics
+from services.common.http_cache import VersionedBodyCache
+from services.common.metrics import CONTENT_TYPE, REGISTRY, Registry, instrument, span
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry(buckets=(0.1, 1.0))
+        self.registry.counter('hits_total', 'Hits.', ('route',))
+        self.registry.histogram('latency_seconds', 'Latency.', ('route',))
+
+    def test_shards_merged_across_threads(self):
+        def worker():
+            for _ in range(100):
+                self.registry.inc('hits_total', ('/a',))
+            self.registry.observe('latency_seconds', ('/a',), 0.5)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.registry.inc('hits_total', ('/b',), 2)
+
+        counters, histograms = self.registry.collect()
+        self.assertEqual(counters[('hits_total', ('/a',))], 400)
+        self.assertEqual(counters[('hits_total', ('/b',))], 2)
+        self.assertEqual(histograms[('latency_seconds', ('/a',))], [0, 4, 0, 2.0, 4])
+
+    def test_finished_threads_compacted(self):
+        with patch.object(metrics, 'SHARD_COMPACT_THRESHOLD', 3):
+            for _ in range(10):
+                thread = threading.Thread(target=self.registry.inc, args=('hits_total', ('/a',)))
+                thread.start()
+                thread.join()
+            self.assertLessEqual(len(self.registry._shards), 4)
+        self.assertEqual(self.registry.collect()[0][('hits_total', ('/a',))], 10)
+
+    def test_render(self):
+        self.registry.inc('hits_total', ('/x"y',))
+        self.registry.observe('latency_seconds', ('/a',), 0.05)
+        self.registry.observe('latency_seconds', ('/a',), 5)
+        lines = self.registry.render().splitlines()
+
+        self.assertIn('# TYPE hits_total counter', lines)
+        self.assertIn('hits_total{route="/x\\"y"} 1', lines)
+        self.assertIn('# TYPE latency_seconds histogram', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1.0"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 2', lines)
+        self.assertIn('latency_seconds_sum{route="/a"} 5.05', lines)
+        self.assertIn('latency_seconds_count{route="/a"} 2', lines)
+
+    def test_snapshots_of_live_workers_merged(self):
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir)
+        self.registry.snapshot_dir = snapshot_dir
+        self.registry.inc('hits_total', ('/a',))
+        self.registry.write_snapshot()
+        self.assertTrue(os.path.exists(self.registry.snapshot_path(os.getpid())))
+
+        # Another live worker (our parent) and one that has exited
+        other = {'counters': [['hits_total', ['/a'], 5]],
+                 'histograms': [['latency_seconds', ['/a'], [1, 0, 0, 0.05, 1]]]}
+        for pid in (os.getppid(), 2 ** 22 + 1):
+            with open(self.registry.snapshot_path(pid), 'w') as f:
+                json.dump(other, f)
+
+        counters, histograms = self.registry.collect_all()
+        # Our own snapshot is not counted on top of our live totals
+        self.assertEqual(counters[('hits_total', ('/a',))], 6)
+        self.assertEqual(histograms[('latency_seconds', ('/a',))], [1, 0, 0, 0.05, 1])
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        REGISTRY.reset()
+        self.app = Flask(__name__)
+        instrument(self.app, 'test')
+
+        @self.app.route('/items/<item_id>')
+        def item(item_id):
+            with span('lookup'):
+                pass
+            with timed('data_load'):
+                pass
+            return {'id': item_id}
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        REGISTRY.reset()
+
+    def test_requests_recorded_by_route(self):
+        self.client.get('/items/1')
+        self.client.get('/items/2')
+        self.client.get('/missing')
+
+        counters, histograms = REGISTRY.collect()
+        self.assertEqual(counters[('travel_http_requests_total',
+                                   ('test', 'GET', '/items/<item_id>', '200'))], 2)
+        self.assertEqual(counters[('travel_http_requests_total',
+                                   ('test', 'GET', '<unmatched>', '404'))], 1)
+        self.assertEqual(histograms[('travel_http_request_duration_seconds',
+                                     ('test', 'GET', '/items/<item_id>'))][-1], 2)
+        self.assertEqual(histograms[('travel_span_duration_seconds', ('lookup',))][-1], 2)
+        self.assertEqual(histograms[('travel_span_duration_seconds', ('data_load',))][-1], 2)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/items/1')
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], CONTENT_TYPE)
+        body = response.get_data(as_text=True)
+        self.assertIn('travel_http_requests_total{service="test",method="GET",'
+                      'route="/items/<item_id>",status="200"} 1', body)
+        self.assertIn('travel_span_duration_seconds_count{span="lookup"} 1', body)
+
+    def test_body_cache_counters_published(self):
+        cache = VersionedBodyCache(maxsize=1, name='items')
+
+        @self.app.route('/listing/<key>')
+        def listing(key):
+            return cache.get(key, 'v1', lambda: [key])
+
+        for key in ('a', 'a', 'b'):
+            self.client.get(f'/listing/{key}')
+        cache.on_mutation('delete', 'b')
+        body = self.client.get('/metrics').get_data(as_text=True)
+
+        self.assertIn('# TYPE travel_body_cache_hits_total counter', body)
+        self.assertIn('travel_body_cache_hits_total{cache="items"} 1', body)
+        self.assertIn('travel_body_cache_misses_total{cache="items"} 2', body)
+        self.assertIn('travel_body_cache_evictions_total{cache="items"} 1', body)
+        self.assertIn('travel_body_cache_invalidations_total{cache="items"} 1', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+from flask import Flask, jsonify
+
+from services.common import profiling
+from services.common.profiling import Sampler, enable_profiling
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+class TestSampler(unittest.TestCase):
+    def test_collapsed_stacks_of_chosen_thread(self):
+        done = threading.Event()
+
+        def busy():
+            while not done.is_set():
+                spin(0.001)
+
+        thread = threading.Thread(target=busy)
+        thread.start()
+        sampler = Sampler(0.001, lambda: {thread.ident}).start()
+        time.sleep(0.1)
+        stacks = sampler.stop()
+        done.set()
+        thread.join()
+
+        self.assertGreater(sampler.samples, 0)
+        self.assertEqual(sum(stacks.values()), sampler.samples)
+        for stack in stacks:
+            self.assertTrue(stack.startswith('Thread._bootstrap'))
+            self.assertIn('busy (services/common/tests/test_profiling.py:', stack)
+        lines = profiling.render_collapsed(stacks).splitlines()
+        self.assertEqual(len(lines), len(stacks))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+class TestEnableProfiling(unittest.TestCase):
+    def setUp(self):
+        self.allowed = True
+        self.working = threading.Event()
+        self.app = Flask(__name__)
+        enable_profiling(self.app, self.authorize)
+
+        @self.app.route('/work')
+        def work():
+            self.working.set()
+            spin(0.02)
+            return jsonify({'done': True}), 201
+
+        @self.app.route('/slow')
+        def slow():
+            self.working.set()
+            spin(0.2)
+            return jsonify({'done': True}), 201
+
+        @self.app.route('/fail')
+        def fail():
+            raise RuntimeError('boom')
+
+        self.client = self.app.test_client()
+
+    def authorize(self):
+        if not self.allowed:
+            return jsonify({'error': 'Admin access required'}), 403
+        return None
+
+    def test_unprofiled_request_untouched(self):
+        response = self.client.get('/work')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json(), {'done': True})
+        self.assertNotIn('X-Profile-Status', response.headers)
+
+    def test_sampled_request(self):
+        response = self.client.get('/work', headers={'X-Profile': 'sample'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Profile-Status'], '201')
+        self.assertIn('TestEnableProfiling.setUp.<locals>.work', response.get_data(as_text=True))
+
+    def test_cprofile_request(self):
+        response = self.client.get('/work', headers={'X-Profile': 'cprofile'})
+        self.assertEqual(response.headers['X-Profile-Status'], '201')
+        body = response.get_data(as_text=True)
+        self.assertIn('cumulative', body)
+        self.assertIn('spin', body)
+        # The profiler is released for the next request
+        self.assertFalse(profiling._cprofile_lock.locked())
+
+    def test_profile_of_failed_request(self):
+        self.app.config['PROPAGATE_EXCEPTIONS'] = False
+        response = self.client.get('/fail', headers={'X-Profile': 'cprofile'})
+        self.assertEqual(response.headers['X-Profile-Status'], '500')
+        self.assertFalse(profiling._cprofile_lock.locked())
+
+    def test_unauthorized_and_invalid(self):
+        self.assertEqual(self.client.get('/work', headers={'X-Profile': 'flame'}).status_code, 400)
+        self.allowed = False
+        self.assertEqual(self.client.get('/work', headers={'X-Profile': 'sample'}).status_code, 403)
+        self.assertEqual(self.client.get('/_profile?seconds=0').status_code, 403)
+
+    def test_profile_window(self):
+        result = {}
+
+        def request_in_flight():
+            result['status'] = self.app.test_client().get('/slow').status_code
+
+        thread = threading.Thread(target=request_in_flight)
+        thread.start()
+        self.working.wait(5)
+        response = self.client.get('/_profile?seconds=0.05&interval=0.001')
+        thread.join()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(result['status'], 201)
+        self.assertGreater(int(response.headers['X-Profile-Samples']), 0)
+        body = response.get_data(as_text=True)
+        self.assertIn('slow', body)
+        self.assertNotIn('profile_window (services/common/profiling.py', body)
+        self.assertEqual(self.client.get('/_profile?seconds=600').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
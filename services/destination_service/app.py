@@ -1,5 +1,5 @@
 # services/destination_service/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, json, stream_with_context
 from flask_swagger_ui import get_swaggerui_blueprint
 import os
 import sys
@@ -7,12 +7,67 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from services.destination_service.destinations import DestinationManager
-from services.auth_service.auth import authenticate_token, is_admin
+from services.auth_service.auth import authenticate_token, is_admin, warm_up as warm_up_auth, admin_error
+from data.records import json_default
+from services.common.http_cache import VersionedBodyCache, conditional_json, request_key
+from services.common.asgi import WSGIAdapter
+from services.common import launcher
+from services.common.profiling import enable_profiling
+from services.common.metrics import instrument
 
 app = Flask(__name__)
 
+# Request counts and latencies, served on /metrics
+instrument(app, 'destination')
+
+# Admin-only profiles of live requests: X-Profile header and /_profile
+enable_profiling(app, admin_error)
+
 destination_manager = DestinationManager()
 
+# Encoded listings, reused until the destination data changes
+listing_cache = VersionedBodyCache(name='destination_listing')
+destination_manager.add_listener(listing_cache.on_mutation)
+
+# Largest page GET /destinations?limit= will return
+MAX_PAGE_SIZE = 500
+
+# Most adds plus deletes accepted by one POST /destinations/batch
+MAX_BATCH_SIZE = 10000
+
+# Query parameters that filter the listing, mapped to search_destinations arguments
+SEARCH_PARAMS = {'location': 'location', 'name': 'name_prefix', 'q': 'text'}
+
+def parse_listing_args(args):
+    """Read limit/after/fields/stream and the search filters from the query string.
+
+    Returns (options, error); error is a message for a 400 response.
+    """
+    options = {
+        'limit': None,
+        'after': args.get('after') or None,
+        'fields': None,
+        'stream': args.get('stream', '').lower() in ('1', 'true', 'yes'),
+        'filters': {key: args[param] for param, key in SEARCH_PARAMS.items() if param in args}
+    }
+    if 'limit' in args:
+        try:
+            options['limit'] = int(args['limit'])
+        except ValueError:
+            return None, 'limit must be an integer'
+        if not 1 <= options['limit'] <= MAX_PAGE_SIZE:
+            return None, f'limit must be between 1 and {MAX_PAGE_SIZE}'
+    if args.get('fields'):
+        options['fields'] = [f.strip() for f in args['fields'].split(',') if f.strip()]
+    return options, None
+
+def stream_json_array(items):
+    # Emit a JSON array one element at a time instead of building it in memory
+    yield '['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + json.dumps(item, default=json_default)
+    yield ']'
+
 SWAGGER_URL = '/docs'
 API_URL = '/static/swagger.yaml'
 swaggerui_blueprint = get_swaggerui_blueprint(
@@ -28,8 +83,41 @@ def get_destinations(current_user):
     try:
         # Fix: Properly check admin status from the current_user object
         admin_status = bool(getattr(current_user, 'is_admin', False))
-        destinations = destination_manager.get_all_destinations(is_admin=admin_status)
-        return jsonify(destinations), 200
+        options, error = parse_listing_args(request.args)
+        if error:
+            return jsonify({'error': error}), 400
+
+        if options['stream']:
+            items = destination_manager.iter_destinations(fields=options['fields'],
+                                                          filters=options['filters'])
+            return Response(stream_with_context(stream_json_array(items)),
+                            mimetype='application/json'), 200
+
+        def build_listing():
+            paged = options['limit'] is not None or options['after'] is not None
+            if options['filters']:
+                destinations, next_after = destination_manager.search_destinations(
+                    options['filters'], options['limit'], options['after'], options['fields']
+                )
+                if paged:
+                    return {'items': destinations, 'next_after': next_after}
+                return destinations
+
+            if paged:
+                destinations, next_after = destination_manager.get_destinations_page(
+                    options['limit'] or MAX_PAGE_SIZE, options['after'], options['fields']
+                )
+                return {'items': destinations, 'next_after': next_after}
+
+            destinations = destination_manager.get_all_destinations(is_admin=admin_status)
+            if options['fields']:
+                destinations = [destination_manager.project(d, options['fields']) for d in destinations]
+            return destinations
+
+        # Read the version first so the body can never be newer than its ETag
+        version = destination_manager.get_version()
+        return conditional_json(listing_cache, request_key(current_user['role']), version,
+                                build_listing)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -51,6 +139,37 @@ def add_destination(current_user):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/destinations/batch', methods=['POST'])
+@authenticate_token
+@is_admin
+def batch_destinations(current_user):
+    """
+    Add and delete many destinations, each kind with a single data write
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be an object'}), 400
+        to_add = data.get('add', [])
+        to_delete = data.get('delete', [])
+        if not isinstance(to_add, list) or not isinstance(to_delete, list):
+            return jsonify({'error': 'add and delete must be lists'}), 400
+        if len(to_add) + len(to_delete) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} changes per batch'}), 400
+        for index, item in enumerate(to_add):
+            error = destination_manager.validate_destination(item)
+            if error:
+                return jsonify({'error': f'add[{index}]: {error}'}), 400
+        if not all(isinstance(destination_id, str) for destination_id in to_delete):
+            return jsonify({'error': 'delete must be a list of ids'}), 400
+
+        # Deletes go first so a batch can replace a destination under its id
+        deleted = destination_manager.delete_destinations(to_delete) if to_delete else []
+        added = destination_manager.add_destinations(to_add) if to_add else []
+        return jsonify({'added': added, 'deleted': deleted}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/destinations/<destination_id>', methods=['DELETE'])
 @authenticate_token
 @is_admin
@@ -62,5 +181,15 @@ def delete_destination(current_user, destination_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ASGI entry point for the asyncio serving mode:
+#   python -m services.common.asgi services.destination_service.app:asgi_app --port 5001
+asgi_app = WSGIAdapter(app)
+
+def warm_up():
+    """Load data and indexes once in the launcher, before it forks workers."""
+    destination_manager.get_version()
+    warm_up_auth()
+
 if __name__ == '__main__':
-    app.run(port=5001, debug=True)
\ No newline at end of file
+    # Pre-forked workers on all cores; --debug for the Flask dev server
+    launcher.main(app=app, warm_up=warm_up, port=5001)
@@ -0,0 +1,129 @@
+# services/destination_service/cli.py
+"""Bulk import, export and delete of destinations as NDJSON or CSV.
+
+Usage:
+    python -m services.destination_service.cli export -o catalogue.ndjson
+    python -m services.destination_service.cli export --format csv --fields id,name
+    python -m services.destination_service.cli import catalogue.csv --batch-size 5000
+    python -m services.destination_service.cli delete ids.txt
+    python -m services.destination_service.cli stats --text beach
+
+Files are read and written one record at a time and changes are applied
+in batches of --batch-size, each batch as a single data write, so the
+tool's own memory stays bounded however large the file is. ``-`` stands
+for stdin/stdout. The format follows the file extension (.csv is CSV,
+anything else NDJSON) unless --format is given. The data backend is
+picked from TRAVEL_DATA_BACKEND as for the services. ``stats`` prints
+how many destinations each location has, optionally only those matching
+--location, --name-prefix or --text.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from services.common.bulk_io import (
+    FORMATS, batched, detect_format, open_stream, read_records, write_records
+)
+from services.destination_service.destinations import DestinationManager, REQUIRED_FIELDS
+
+CSV_FIELDS = ('id',) + REQUIRED_FIELDS
+DEFAULT_BATCH_SIZE = 10000
+
+
+def export_destinations(manager, stream, fmt, fields=None, batch_size=DEFAULT_BATCH_SIZE):
+    return write_records(manager.iter_destinations(fields=fields, batch_size=batch_size),
+                         stream, fmt, fields or CSV_FIELDS)
+
+
+def import_destinations(manager, stream, fmt, batch_size=DEFAULT_BATCH_SIZE, errors=sys.stderr):
+    """Add every valid record from ``stream``; returns (imported, skipped)."""
+    skipped = 0
+
+    def valid_records():
+        nonlocal skipped
+        for line_number, record in read_records(stream, fmt):
+            error = ('invalid JSON' if record is None
+                     else manager.validate_destination(record))
+            if error:
+                skipped += 1
+                errors.write(f'line {line_number}: {error}\n')
+                continue
+            yield record
+
+    imported = 0
+    for batch in batched(valid_records(), batch_size):
+        imported += len(manager.add_destinations(batch))
+    return imported, skipped
+
+
+def delete_destinations(manager, stream, batch_size=DEFAULT_BATCH_SIZE):
+    """Delete the ids listed one per line in ``stream``; returns how many existed."""
+    ids = (line.strip() for line in stream)
+    deleted = 0
+    for batch in batched((i for i in ids if i), batch_size):
+        deleted += len(manager.delete_destinations(batch))
+    return deleted
+
+
+def location_stats(manager, stream, filters=None):
+    """Write a "count<TAB>location" line per location; returns the total."""
+    counts = manager.count_by_location(filters)
+    for location, count in counts.items():
+        stream.write(f'{count}\t{location}\n')
+    return sum(counts.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='write every destination')
+    export.add_argument('-o', '--output', default='-')
+    export.add_argument('--format', choices=FORMATS)
+    export.add_argument('--fields', help='comma-separated fields to write')
+
+    load = commands.add_parser('import', help='add or replace destinations')
+    load.add_argument('input', nargs='?', default='-')
+    load.add_argument('--format', choices=FORMATS)
+
+    delete = commands.add_parser('delete', help='delete the ids listed one per line')
+    delete.add_argument('input', nargs='?', default='-')
+
+    for command in (export, load, delete):
+        command.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    stats = commands.add_parser('stats', help='count destinations per location')
+    for name in ('location', 'name-prefix', 'text'):
+        stats.add_argument(f'--{name}')
+    args = parser.parse_args(argv)
+
+    manager = DestinationManager()
+    if args.command == 'export':
+        fields = [f.strip() for f in args.fields.split(',') if f.strip()] if args.fields else None
+        with open_stream(args.output, 'w') as stream:
+            count = export_destinations(manager, stream, detect_format(args.output, args.format),
+                                        fields, args.batch_size)
+        print(f'exported {count} destinations', file=sys.stderr)
+        return 0
+    if args.command == 'import':
+        with open_stream(args.input, 'r') as stream:
+            imported, skipped = import_destinations(
+                manager, stream, detect_format(args.input, args.format), args.batch_size)
+        print(f'imported {imported} destinations, skipped {skipped}', file=sys.stderr)
+        return 1 if skipped else 0
+    if args.command == 'stats':
+        filters = {key: getattr(args, key) for key in ('location', 'name_prefix', 'text')
+                   if getattr(args, key) is not None}
+        total = location_stats(manager, sys.stdout, filters)
+        print(f'{total} destinations', file=sys.stderr)
+        return 0
+    with open_stream(args.input, 'r') as stream:
+        deleted = delete_destinations(manager, stream, args.batch_size)
+    print(f'deleted {deleted} destinations', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,20 @@
 import uuid
 import os
 import sys
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from data.destinations import DestinationDatabase
+from data.backends import open_destination_database
+from data.columnar import DestinationColumns
+
+REQUIRED_FIELDS = ('name', 'description', 'location')
 
 class DestinationManager:
     def __init__(self):
-        self.db = DestinationDatabase()
+        self.db = open_destination_database()
+        self._columns = None
+        self._columns_version = None
+        self._columns_lock = threading.Lock()
         self._initialize_default_destinations()
 
     def _initialize_default_destinations(self):
@@ -33,9 +40,109 @@ class DestinationManager:
         destinations = self.db.get_all_destinations()
         return destinations
 
+    def add_listener(self, listener):
+        """Call ``listener(op, key, record)`` after every data-layer write."""
+        self.db.add_listener(listener)
+
+    def get_version(self):
+        """Changes whenever any destination is added, changed or removed."""
+        return self.db.get_version()
+
+    @staticmethod
+    def project(destination, fields=None):
+        # Keep only the requested fields; None means the whole record
+        if not fields:
+            return destination
+        return {field: destination[field] for field in fields if field in destination}
+
+    def get_destinations_page(self, limit, after=None, fields=None):
+        destinations, next_after = self.db.get_destinations_page(limit, after)
+        return [self.project(d, fields) for d in destinations], next_after
+
+    def search_destinations(self, filters, limit=None, after=None, fields=None):
+        """Destinations matching ``filters`` (location, name_prefix, text), in id order."""
+        destinations, next_after = self.db.search_destinations(limit=limit, after=after, **filters)
+        return [self.project(d, fields) for d in destinations], next_after
+
+    def iter_destinations(self, fields=None, batch_size=500, filters=None):
+        """Yield every destination, reading ``batch_size`` records at a time."""
+        if filters:
+            # Searched once for the whole stream, then read batch by batch
+            for destinations in self.db.iter_search_destinations(batch_size, **filters):
+                for destination in destinations:
+                    yield self.project(destination, fields)
+            return
+        after = None
+        while True:
+            destinations, after = self.db.get_destinations_page(batch_size, after)
+            for destination in destinations:
+                yield self.project(destination, fields)
+            if after is None:
+                return
+
+    def columns(self):
+        """Columnar snapshot of every destination, rebuilt after any write."""
+        with self._columns_lock:
+            # Read the version first: a write racing the rebuild then only
+            # costs one more rebuild, never a stale snapshot kept for good
+            version = self.db.get_version()
+            if self._columns is None or version != self._columns_version:
+                self._columns = DestinationColumns(self.db.get_all_destinations())
+                self._columns_version = version
+            return self._columns
+
+    def query_destinations(self, filters=None, sort='id', offset=0, limit=None, fields=None):
+        """Destinations matching ``filters`` as (page, total).
+
+        Unlike search_destinations this sorts by id, name or location
+        ('-' first for descending) and reports the total number of matches.
+        """
+        return self.columns().query(sort=sort, offset=offset, limit=limit,
+                                    fields=fields, **(filters or {}))
+
+    def count_destinations(self, filters=None):
+        return self.columns().count(**(filters or {}))
+
+    def count_by_location(self, filters=None):
+        """{location: destinations matching ``filters``}, largest first."""
+        return self.columns().count_by_location(**(filters or {}))
+
     def delete_destination(self, destination_id):
         return self.db.delete_destination(destination_id)
 
+    @staticmethod
+    def validate_destination(data):
+        """Return an error message for an unusable destination, else None."""
+        if not isinstance(data, dict):
+            return 'destination must be an object'
+        missing = [field for field in REQUIRED_FIELDS if not isinstance(data.get(field), str)]
+        if missing:
+            return f'Missing required fields: {", ".join(missing)}'
+        if 'id' in data and not (isinstance(data['id'], str) and data['id']):
+            return 'id must be a non-empty string'
+        return None
+
+    def add_destinations(self, destinations):
+        """Add many destinations with a single write and return their ids.
+
+        Items must pass validate_destination. An item's own 'id' is kept, so
+        an exported catalogue re-imports onto the same records.
+        """
+        records = [
+            {
+                'id': data.get('id') or str(uuid.uuid4()),
+                'name': data['name'],
+                'description': data['description'],
+                'location': data['location']
+            } for data in destinations
+        ]
+        self.db.add_destinations(records)
+        return [record['id'] for record in records]
+
+    def delete_destinations(self, destination_ids):
+        """Delete many destinations with a single write; returns the ids that existed."""
+        return self.db.delete_destinations(destination_ids)
+
     def add_destination(self, name, description, location):
         destination = {
             'id': str(uuid.uuid4()),
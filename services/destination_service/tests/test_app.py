@@ -1,8 +1,31 @@
+import asyncio
+import threading
 import unittest
 import json
+import jwt
+from concurrent.futures import Executor, Future
 from functools import wraps
+from unittest.mock import patch
+from services.common.asgi import WSGIAdapter
 from services.destination_service.app import app, destination_manager
 from services.destination_service.destinations import DestinationManager
+from services.auth_service.auth import SECRET_KEY, token_cache
+
+class ThreadPerCall(Executor):
+    """Runs every call on a new thread, as a busy pool may hand each step
+    of a response to a different thread"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        threading.Thread(target=run).start()
+        return future
 
 class TestDestinationService(unittest.TestCase):
     @classmethod
@@ -146,5 +169,165 @@ class TestDestinationService(unittest.TestCase):
         # Restore original view
         app.view_functions['delete_destination'] = original_view
 
+class TestDestinationListing(unittest.TestCase):
+    """GET /destinations query options, called through the real auth decorator"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.user_db_patcher = patch('services.auth_service.auth.user_db')
+        mock_user_db = self.user_db_patcher.start()
+        mock_user_db.get_user_by_id.return_value = {'id': 'listing-user', 'role': 'User'}
+        token = jwt.encode({'user_id': 'listing-user', 'role': 'User'}, SECRET_KEY, algorithm='HS256')
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+        self.destination_ids = [
+            destination_manager.add_destination(f'Place {i}', 'Listing test', 'Testland')
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        self.user_db_patcher.stop()
+        token_cache.clear()
+        for destination_id in self.destination_ids:
+            destination_manager.delete_destination(destination_id)
+
+    def test_get_destinations_paginated(self):
+        all_ids = sorted(d['id'] for d in destination_manager.get_all_destinations())
+
+        seen = []
+        after = None
+        while True:
+            url = '/destinations?limit=1' + (f'&after={after}' if after else '')
+            response = self.client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            self.assertLessEqual(len(data['items']), 1)
+            seen.extend(item['id'] for item in data['items'])
+            after = data['next_after']
+            if after is None:
+                break
+
+        self.assertEqual(seen, all_ids)
+
+    def test_get_destinations_fields(self):
+        response = self.client.get('/destinations?limit=5&fields=id,name', headers=self.headers)
+        data = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        for item in data['items']:
+            self.assertEqual(set(item), {'id', 'name'})
+
+    def test_get_destinations_stream(self):
+        response = self.client.get('/destinations?stream=true&fields=id', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/json')
+        data = json.loads(response.data)
+        self.assertEqual(
+            sorted(item['id'] for item in data),
+            sorted(d['id'] for d in destination_manager.get_all_destinations())
+        )
+        self.assertTrue(all(set(item) == {'id'} for item in data))
+
+    def test_get_destinations_stream_over_asgi(self):
+        """The streamed listing through the ASGI adapter, as served in --mode asgi"""
+        scope = {'type': 'http', 'method': 'GET', 'path': '/destinations',
+                 'query_string': b'stream=1&fields=id&location=Testland',
+                 'headers': [(b'authorization', self.headers['Authorization'].encode())]}
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        adapter = WSGIAdapter(app)
+        adapter._executor = ThreadPerCall()
+        asyncio.run(adapter(scope, receive, send))
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertFalse(messages[-1]['more_body'])
+        data = json.loads(b''.join(m.get('body', b'') for m in messages[1:]))
+        self.assertEqual(sorted(d['id'] for d in data), sorted(self.destination_ids))
+
+    def test_get_destinations_invalid_limit(self):
+        for limit in ('abc', '0', '501'):
+            response = self.client.get(f'/destinations?limit={limit}', headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+
+    def test_get_destinations_search(self):
+        response = self.client.get('/destinations?location=TESTLAND&q=listing', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(sorted(d['id'] for d in data), sorted(self.destination_ids))
+
+        response = self.client.get('/destinations?name=place&limit=2', headers=self.headers)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['items']), 2)
+        self.assertIsNotNone(data['next_after'])
+
+        response = self.client.get('/destinations?location=Testland&stream=true&fields=id',
+                                   headers=self.headers)
+        self.assertEqual(sorted(d['id'] for d in json.loads(response.data)),
+                         sorted(self.destination_ids))
+
+    def test_get_destinations_not_modified(self):
+        response = self.client.get('/destinations?fields=id', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+
+        headers = {**self.headers, 'If-None-Match': etag}
+        response = self.client.get('/destinations?fields=id', headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        # A different query is a different representation
+        response = self.client.get('/destinations?fields=name', headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+        # Any write changes the ETag
+        self.destination_ids.append(
+            destination_manager.add_destination('Place new', 'Listing test', 'Testland'))
+        response = self.client.get('/destinations?fields=id', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertIn(self.destination_ids[-1], [d['id'] for d in json.loads(response.data)])
+
+    def test_profile_header_admin_only(self):
+        response = self.client.get('/destinations', headers={**self.headers, 'X-Profile': 'sample'})
+        self.assertEqual(response.status_code, 403)
+
+        admin_token = jwt.encode({'user_id': 'listing-user', 'role': 'Admin'}, SECRET_KEY, algorithm='HS256')
+        headers = {'Authorization': f'Bearer {admin_token}', 'X-Profile': 'cprofile'}
+        response = self.client.get('/destinations', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Profile-Status'], '200')
+        self.assertIn('get_destinations', response.get_data(as_text=True))
+
+    def test_batch_destinations(self):
+        admin_token = jwt.encode({'user_id': 'listing-user', 'role': 'Admin'}, SECRET_KEY, algorithm='HS256')
+        headers = {'Authorization': f'Bearer {admin_token}'}
+        body = {
+            'add': [{'name': f'Batch {i}', 'description': 'Batch test', 'location': 'Testland'}
+                    for i in range(3)],
+            'delete': [self.destination_ids[0], 'missing-id']
+        }
+
+        response = self.client.post('/destinations/batch', json=body, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.destination_ids.extend(data['added'])
+        self.assertEqual(len(data['added']), 3)
+        self.assertEqual(data['deleted'], [self.destination_ids[0]])
+        self.assertIsNone(destination_manager.db.get_destination_by_id(self.destination_ids[0]))
+        self.assertEqual(destination_manager.db.get_destination_by_id(data['added'][0])['name'],
+                         'Batch 0')
+
+        response = self.client.post('/destinations/batch', json={'add': [{'name': 'x'}]},
+                                    headers=headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('add[0]', json.loads(response.data)['error'])
+
+        response = self.client.post('/destinations/batch', json=body, headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,96 @@
+import io
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from services.destination_service import cli
+from services.destination_service.destinations import DestinationManager
+
+class TestDestinationCli(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_db = MagicMock()
+        self.mock_db.get_all_destinations.return_value = [{'id': 'existing'}]
+        self.manager = DestinationManager()
+        self.manager.db = self.mock_db
+        self.stored = {}
+        self.mock_db.add_destinations.side_effect = lambda records: self.stored.update(
+            (record['id'], record) for record in records)
+
+    def test_import_ndjson_in_batches(self):
+        lines = [
+            '{"name": "Paris", "description": "City of Lights", "location": "France"}',
+            '',
+            'not json',
+            '{"id": "t1", "name": "Tokyo", "description": "Modern metropolis", "location": "Japan"}',
+            '{"name": "Nowhere"}',
+            '{"id": "r1", "name": "Rome", "description": "Eternal city", "location": "Italy"}',
+        ]
+        errors = io.StringIO()
+
+        imported, skipped = cli.import_destinations(
+            self.manager, io.StringIO('\n'.join(lines)), 'ndjson', batch_size=2, errors=errors)
+
+        self.assertEqual((imported, skipped), (3, 2))
+        self.assertEqual(self.mock_db.add_destinations.call_count, 2)
+        self.assertIn('t1', self.stored)
+        self.assertIn('line 3: invalid JSON', errors.getvalue())
+        self.assertIn('line 5: Missing required fields', errors.getvalue())
+
+    def test_import_csv(self):
+        data = ('id,name,description,location\n'
+                ',Paris,City of Lights,France\n'
+                'r1,Rome,Eternal city,Italy\n')
+
+        imported, skipped = cli.import_destinations(self.manager, io.StringIO(data), 'csv')
+
+        self.assertEqual((imported, skipped), (2, 0))
+        self.assertEqual(self.stored['r1']['location'], 'Italy')
+
+    def test_export_round_trip(self):
+        records = [
+            {'id': '1', 'name': 'Paris', 'description': 'City, "of" Lights', 'location': 'France'},
+            {'id': '2', 'name': 'Tokyo', 'description': 'Modern metropolis', 'location': 'Japan'}
+        ]
+        self.mock_db.get_destinations_page.return_value = (records, None)
+
+        for fmt in cli.FORMATS:
+            out = io.StringIO()
+            self.assertEqual(cli.export_destinations(self.manager, out, fmt), 2)
+            self.stored.clear()
+            out.seek(0)
+            self.assertEqual(cli.import_destinations(self.manager, out, fmt), (2, 0))
+            self.assertEqual(list(self.stored.values()), records)
+
+    def test_delete_ids_from_stream(self):
+        self.mock_db.delete_destinations.side_effect = lambda ids: [i for i in ids if i != 'gone']
+
+        deleted = cli.delete_destinations(self.manager, io.StringIO('a\n\ngone\nb\n'), batch_size=2)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(self.mock_db.delete_destinations.call_count, 2)
+
+    def test_location_stats(self):
+        self.mock_db.get_version.return_value = 'v1'
+        self.mock_db.get_all_destinations.return_value = [
+            {'id': '1', 'name': 'Paris', 'description': 'City of Lights', 'location': 'France'},
+            {'id': '2', 'name': 'Lyon', 'description': 'Food city', 'location': 'France'},
+            {'id': '3', 'name': 'Rome', 'description': 'Eternal city', 'location': 'Italy'}
+        ]
+        out = io.StringIO()
+
+        self.assertEqual(cli.location_stats(self.manager, out), 3)
+        self.assertEqual(out.getvalue(), '2\tFrance\n1\tItaly\n')
+        self.assertEqual(cli.location_stats(self.manager, io.StringIO(), {'name_prefix': 'r'}), 1)
+
+    def test_detect_format(self):
+        self.assertEqual(cli.detect_format('catalogue.CSV'), 'csv')
+        self.assertEqual(cli.detect_format('catalogue.ndjson'), 'ndjson')
+        self.assertEqual(cli.detect_format('-', 'csv'), 'csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
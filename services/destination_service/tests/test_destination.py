@@ -80,6 +80,97 @@ class TestDestinationManager(unittest.TestCase):
         # Assert that the returned destination id matches the fixed UUID
         self.assertEqual(destination_id, fixed_uuid)
 
+    def test_get_destinations_page_with_fields(self):
+        self.mock_db.get_destinations_page.return_value = (
+            [{'id': '123', 'name': 'Paris', 'description': 'City of Lights', 'location': 'France'}],
+            '123'
+        )
+
+        items, next_after = self.manager.get_destinations_page(1, fields=['id', 'location'])
+
+        self.mock_db.get_destinations_page.assert_called_once_with(1, None)
+        self.assertEqual(items, [{'id': '123', 'location': 'France'}])
+        self.assertEqual(next_after, '123')
+
+    def test_iter_destinations_reads_in_batches(self):
+        pages = {
+            None: ([{'id': '1'}, {'id': '2'}], '2'),
+            '2': ([{'id': '3'}], None)
+        }
+        self.mock_db.get_destinations_page.side_effect = lambda limit, after: pages[after]
+
+        result = list(self.manager.iter_destinations(batch_size=2))
+
+        self.assertEqual([d['id'] for d in result], ['1', '2', '3'])
+        self.assertEqual(self.mock_db.get_destinations_page.call_count, 2)
+
+    def test_iter_destinations_with_filters(self):
+        self.mock_db.iter_search_destinations.return_value = iter([
+            [{'id': '1', 'name': 'Paris'}, {'id': '2', 'name': 'Lyon'}], [{'id': '3', 'name': 'Nice'}]
+        ])
+
+        result = list(self.manager.iter_destinations(
+            fields=['name'], batch_size=2, filters={'location': 'france'}))
+
+        self.assertEqual(result, [{'name': 'Paris'}, {'name': 'Lyon'}, {'name': 'Nice'}])
+        self.mock_db.iter_search_destinations.assert_called_once_with(2, location='france')
+        self.mock_db.search_destinations.assert_not_called()
+
+    def test_search_destinations(self):
+        self.mock_db.search_destinations.return_value = (
+            [{'id': '123', 'name': 'Paris', 'location': 'France'}], None
+        )
+
+        items, next_after = self.manager.search_destinations(
+            {'location': 'france'}, fields=['name'])
+
+        self.mock_db.search_destinations.assert_called_once_with(
+            limit=None, after=None, location='france')
+        self.assertEqual(items, [{'name': 'Paris'}])
+        self.assertIsNone(next_after)
+
+    def test_validate_destination(self):
+        valid = {'name': 'Paris', 'description': 'City of Lights', 'location': 'France'}
+        self.assertIsNone(self.manager.validate_destination(valid))
+        self.assertIsNone(self.manager.validate_destination({**valid, 'id': 'abc'}))
+        self.assertIn('location', self.manager.validate_destination({'name': 'x', 'description': 'y'}))
+        self.assertIsNotNone(self.manager.validate_destination({**valid, 'id': ''}))
+        self.assertIsNotNone(self.manager.validate_destination(['not', 'a', 'dict']))
+
+    def test_add_destinations_in_one_call(self):
+        items = [
+            {'name': 'Paris', 'description': 'City of Lights', 'location': 'France', 'extra': 1},
+            {'id': 'keep-me', 'name': 'Tokyo', 'description': 'Modern metropolis', 'location': 'Japan'}
+        ]
+
+        ids = self.manager.add_destinations(items)
+
+        self.mock_db.add_destinations.assert_called_once()
+        records = self.mock_db.add_destinations.call_args[0][0]
+        self.assertEqual([r['id'] for r in records], ids)
+        self.assertEqual(ids[1], 'keep-me')
+        self.assertNotIn('extra', records[0])
+
+    def test_columnar_queries_follow_the_version(self):
+        self.mock_db.get_version.return_value = 'v1'
+        self.mock_db.get_all_destinations.return_value = [
+            {'id': '2', 'name': 'Tokyo', 'description': 'Modern metropolis', 'location': 'Japan'},
+            {'id': '1', 'name': 'Paris', 'description': 'City of Lights', 'location': 'France'},
+            {'id': '3', 'name': 'Kyoto', 'description': 'Old temples', 'location': 'japan'}
+        ]
+
+        items, total = self.manager.query_destinations(
+            {'location': 'JAPAN'}, sort='name', fields=['name'])
+        self.assertEqual((items, total), ([{'name': 'Kyoto'}, {'name': 'Tokyo'}], 2))
+        self.assertEqual(self.manager.count_by_location(), {'Japan': 2, 'France': 1})
+        self.assertEqual(self.manager.count_destinations({'text': 'lights'}), 1)
+        # Unchanged version: the snapshot is reused
+        self.assertEqual(self.mock_db.get_all_destinations.call_count, 1)
+
+        self.mock_db.get_version.return_value = 'v2'
+        self.mock_db.get_all_destinations.return_value = []
+        self.assertEqual(self.manager.count_destinations(), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+# services/gateway.py
+"""All three services in one process, behind one router.
+
+Usage:
+    python services/gateway.py                       # launcher, port 5000
+    python services/gateway.py --workers 2 --mode asgi
+    python -m services.common.asgi services.gateway:asgi_app --port 5000
+
+The auth, user and destination apps are imported side by side. The data
+layer hands every caller in a process the same database instance, and the
+token cache and password hasher are module-level, so the apps share one
+copy of the data, its indexes and caches. A write through one service is
+seen by the others' listeners at once, without waiting for the next file
+stat. Each request is dispatched to the app whose routes match it.
+
+Each app serves its own Swagger UI at /docs, so only one of them can be
+mounted there (the destination service's, or the one named by
+``docs=``). The others' docs stay available when they run on their own.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+from services.auth_service import app as auth_service
+from services.user_service import app as user_service
+from services.destination_service import app as destination_service
+from services.common.asgi import WSGIAdapter
+from services.common import launcher
+
+SERVICES = {
+    'auth': auth_service,
+    'user': user_service,
+    'destination': destination_service,
+}
+
+
+class Gateway:
+    """WSGI app dispatching each request to the service whose routes match it."""
+
+    def __init__(self, apps, docs='destination'):
+        self.apps = apps
+        rules = []
+        for name, app in apps.items():
+            for rule in app.url_map.iter_rules():
+                # Swagger UI and static files exist in every app; keep one set
+                shared = rule.endpoint == 'static' or rule.endpoint.startswith('swagger_ui.')
+                if shared and name != docs:
+                    continue
+                rules.append(Rule(rule.rule, methods=rule.methods, endpoint=name))
+        self.url_map = Map(rules)
+
+    def __call__(self, environ, start_response):
+        try:
+            name, _ = self.url_map.bind_to_environ(environ).match()
+        except HTTPException as error:
+            # 404, 405 (with Allow) or a trailing-slash redirect
+            return error(environ, start_response)
+        return self.apps[name](environ, start_response)
+
+
+app = Gateway({name: module.app for name, module in SERVICES.items()})
+
+# ASGI entry point, as for the single services
+asgi_app = WSGIAdapter(app)
+
+
+def warm_up():
+    """Load data and indexes once in the launcher, before it forks workers."""
+    for module in SERVICES.values():
+        module.warm_up()
+
+
+if __name__ == '__main__':
+    launcher.main(app=app, warm_up=warm_up, port=5000)
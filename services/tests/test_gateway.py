@@ -0,0 +1,58 @@
+import unittest
+from flask import json
+from werkzeug.test import Client
+
+from services.gateway import app
+from services.auth_service import app as auth_service, auth
+from services.user_service import app as user_service
+
+class TestGateway(unittest.TestCase):
+
+    TEST_USER_SUFFIX = "@test.com"
+
+    def setUp(self):
+        self.client = Client(app)
+        self.user_db = user_service.user_manager.user_db
+
+    def tearDown(self):
+        for user in self.user_db.get_all_users():
+            if user['email'].endswith(self.TEST_USER_SUFFIX):
+                self.user_db.delete_user(user['id'])
+
+    def test_data_layer_shared(self):
+        """Test that the hosted services share one instance per database"""
+        self.assertIs(auth_service.user_db, self.user_db)
+        self.assertIs(auth.user_db, self.user_db)
+
+    def test_routes_reach_their_service(self):
+        """Test a request flow crossing all three services in one process"""
+        response = self.client.post('/register', json={
+            'name': 'Gateway User', 'email': 'gateway@test.com',
+            'password': 'secret123', 'role': 'User'})
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post('/login', json={'email': 'gateway@test.com',
+                                                    'password': 'secret123'})
+        token = json.loads(response.data)['token']
+
+        response = self.client.post('/auth/verify', json={'token': token})
+        self.assertEqual(json.loads(response.data)['role'], 'User')
+
+        response = self.client.get('/destinations',
+                                   headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_route_and_method(self):
+        """Test that unmatched paths and methods get 404 and 405"""
+        self.assertEqual(self.client.get('/nowhere').status_code, 404)
+        response = self.client.delete('/login')
+        self.assertEqual(response.status_code, 405)
+        self.assertIn('POST', response.headers['Allow'])
+
+    def test_docs_served_once(self):
+        """Test that /docs comes from a single service"""
+        self.assertEqual(self.client.get('/docs/').status_code, 200)
+        self.assertEqual(self.client.get('/static/swagger.yaml').status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
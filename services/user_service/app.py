@@ -4,25 +4,39 @@ import os
 import sys
 import jwt
 import datetime
-import re
 
 # Add parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from services.user_service.users import UserManager
-from services.auth_service.auth import authenticate_token
+from services.user_service.users import UserManager, is_valid_email, validate_registration
+from services.user_service.hashing import HasherBusy
+from services.auth_service.auth import authenticate_token, is_admin, warm_up as warm_up_auth, admin_error
+from services.common.http_cache import VersionedBodyCache, conditional_json, request_key
+from services.common.asgi import WSGIAdapter
+from services.common import launcher
+from services.common.profiling import enable_profiling
+from services.common.metrics import instrument, span
 
 app = Flask(__name__)
+
+# Request counts and latencies, served on /metrics
+instrument(app, 'user')
+
+# Admin-only profiles of live requests: X-Profile header and /_profile
+enable_profiling(app, admin_error)
+
 app.config['SECRET_KEY'] = 'your_secret_key_here'
 app.config['ADMIN_SECRET_KEY'] = 'your_admin_secret_key_here'
 
 # Initialize User Manager
 user_manager = UserManager()
 
-def is_valid_email(email):
-    """Validate email format using regex pattern."""
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(email_pattern, email))
+# Most records accepted by one POST /users/batch
+MAX_REGISTER_BATCH = 50000
+
+# Encoded admin user listing, reused until the user data changes
+profile_cache = VersionedBodyCache(maxsize=16, name='user_listing')
+user_manager.add_listener(profile_cache.on_mutation)
 
 # Swagger Configuration
 SWAGGER_URL = '/docs'
@@ -34,33 +48,22 @@ swaggerui_blueprint = get_swaggerui_blueprint(
 )
 app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 
+@app.errorhandler(HasherBusy)
+def hasher_busy(error):
+    # Shed load instead of queueing requests behind a full hashing pool
+    response = jsonify({'error': 'Server busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @app.route('/register', methods=['POST'])
 def register():
     data = request.json
     if not data:
         return jsonify({'error': 'Request body is required'}), 400
 
-    required_fields = ['name', 'email', 'password', 'role']
-    missing_fields = [field for field in required_fields if not data.get(field)]
-    
-    # Validate required fields
-    if missing_fields:
-        return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
-    
-    # Validate field types and empty values
-    for field in required_fields:
-        if not isinstance(data[field], str):
-            return jsonify({'error': f'{field} must be a string'}), 400
-        if not data[field].strip():
-            return jsonify({'error': f'{field} cannot be empty'}), 400
-            
-    # Validate email format
-    if not is_valid_email(data['email'].strip()):
-        return jsonify({'error': 'Invalid email format'}), 400
-    
-    # Check if role is valid
-    if data['role'] not in ['User', 'Admin']:
-        return jsonify({'error': 'Invalid role. Must be either User or Admin'}), 400
+    error = validate_registration(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     # If registering as Admin, check for admin secret key in request body
     if data['role'] == 'Admin':
@@ -85,6 +88,27 @@ def register():
         return jsonify({'message': 'User registered successfully', 'user_id': user_id}), 201
     return jsonify({'error': 'Email already exists'}), 409
 
+@app.route('/users/batch', methods=['POST'])
+@authenticate_token
+@is_admin
+def register_users_batch(current_user):
+    """
+    Register many users at once; admins may create users of either role
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('users'), list):
+        return jsonify({'error': 'users must be a list'}), 400
+    if len(data['users']) > MAX_REGISTER_BATCH:
+        return jsonify({'error': f'At most {MAX_REGISTER_BATCH} users per batch'}), 400
+
+    results = user_manager.register_users(data['users'])
+    created = sum(1 for result in results if result['status'] == 'created')
+    return jsonify({
+        'results': results,
+        'created': created,
+        'failed': len(results) - created
+    }), 200
+
 @app.route('/login', methods=['POST'])
 def login():
     data = request.json
@@ -113,11 +137,12 @@ def login():
     
     if user:
         # Create JWT token
-        token = jwt.encode({
-            'user_id': user['id'],
-            'role': user['role'],
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-        }, app.config['SECRET_KEY'], algorithm='HS256')
+        with span('jwt_encode'):
+            token = jwt.encode({
+                'user_id': user['id'],
+                'role': user['role'],
+                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+            }, app.config['SECRET_KEY'], algorithm='HS256')
         
         return jsonify({
             'message': 'Login successful', 
@@ -132,7 +157,9 @@ def login():
 def get_profile(current_user):
     # Check if the user is an admin or requesting their own profile
     if current_user['role'] == 'Admin':
-        profile = user_manager.get_all_users()
+        version = user_manager.get_version()
+        return conditional_json(profile_cache, request_key('Admin'), version,
+                                user_manager.get_all_users)
     else:
         profile = user_manager.get_user_profile(current_user['user_id'])
     
@@ -140,5 +167,15 @@ def get_profile(current_user):
         return jsonify(profile), 200
     return jsonify({'error': 'User not found'}), 404
 
+# ASGI entry point for the asyncio serving mode:
+#   python -m services.common.asgi services.user_service.app:asgi_app --port 5002
+asgi_app = WSGIAdapter(app)
+
+def warm_up():
+    """Load data and indexes once in the launcher, before it forks workers."""
+    user_manager.get_version()
+    warm_up_auth()
+
 if __name__ == '__main__':
-    app.run(port=5002, debug=True)
\ No newline at end of file
+    # Pre-forked workers on all cores; --debug for the Flask dev server
+    launcher.main(app=app, warm_up=warm_up, port=5002)
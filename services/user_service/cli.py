@@ -0,0 +1,64 @@
+# services/user_service/cli.py
+"""Bulk user registration from NDJSON or CSV.
+
+Usage:
+    python -m services.user_service.cli import users.csv
+    python -m services.user_service.cli import users.ndjson -o results.ndjson --batch-size 5000
+
+Every input row needs name, email, password and role (User or Admin).
+Rows are registered in batches of --batch-size, each batch validated,
+checked for duplicate emails and stored with a single data write. One
+NDJSON result per row (its input line, status and user_id or error) is
+written to --output, stdout by default; ``-`` reads stdin. The format
+follows the file extension (.csv is CSV, anything else NDJSON) unless
+--format is given.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from services.common.bulk_io import FORMATS, batched, detect_format, open_stream, read_records
+from services.user_service.users import UserManager
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def import_users(manager, stream, fmt, output, batch_size=DEFAULT_BATCH_SIZE):
+    """Register every row of ``stream``; returns a count per result status."""
+    counts = {}
+    for batch in batched(read_records(stream, fmt), batch_size):
+        # Rows that did not parse fail validation like any other bad row
+        results = manager.register_users([record for _, record in batch])
+        for (line_number, _), result in zip(batch, results):
+            result = {'line': line_number, **result}
+            del result['index']
+            output.write(json.dumps(result) + '\n')
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('import', help='register users')
+    load.add_argument('input', nargs='?', default='-')
+    load.add_argument('-o', '--output', default='-', help='where to write per-row results')
+    load.add_argument('--format', choices=FORMATS)
+    load.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    manager = UserManager()
+    with open_stream(args.input, 'r') as stream, open_stream(args.output, 'w') as output:
+        counts = import_users(manager, stream, detect_format(args.input, args.format),
+                              output, args.batch_size)
+    summary = ', '.join(f'{status} {count}' for status, count in sorted(counts.items()))
+    print(f'users: {summary or "none"}', file=sys.stderr)
+    return 0 if set(counts) <= {'created'} else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+# services/user_service/hashing.py
+"""Password hashing with a configurable KDF, run on a bounded process pool.
+
+A proper KDF costs tens of milliseconds of CPU per hash, so hashing and
+verification run in worker processes: request threads only wait on a
+future, and login throughput scales with cores instead of the GIL.
+
+Configuration (environment variables, read by ``PasswordHasher.from_env``):
+
+    TRAVEL_PASSWORD_SCHEME    pbkdf2_sha256 (default), scrypt, argon2, bcrypt
+    TRAVEL_PASSWORD_COST      per-scheme cost overrides, e.g.
+                              "rounds=100000" or "rounds=3,memory_cost=65536"
+    TRAVEL_HASH_WORKERS       worker processes (default: CPU count; 0 hashes
+                              in the calling thread)
+    TRAVEL_HASH_MAX_PENDING   hashes queued or running before callers get
+                              HasherBusy (default: 8 per worker)
+
+argon2 and bcrypt need the argon2-cffi / bcrypt packages. Hashes written
+by the previous scheme, plain unsalted SHA-256 hex digests, still verify
+and are reported for rehashing, as are hashes from a scheme or cost that
+is no longer the configured one.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+DEFAULT_SCHEME = 'pbkdf2_sha256'
+# Cost settings per scheme; passlib calls the main work factor "rounds"
+# (log2 of N for scrypt, time cost for argon2).
+DEFAULT_COSTS = {
+    'pbkdf2_sha256': {'rounds': 29000},
+    'scrypt': {'rounds': 14, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'rounds': 3, 'memory_cost': 65536, 'parallelism': 1},
+    'bcrypt': {'rounds': 12},
+}
+# The unsalted SHA-256 digests stored before this module existed
+LEGACY_SCHEME = 'hex_sha256'
+QUEUE_TIMEOUT = 2.0
+
+
+class HasherBusy(Exception):
+    """Raised when more hashes are pending than the queue allows."""
+
+
+def build_context(scheme=DEFAULT_SCHEME, cost=None):
+    if scheme not in DEFAULT_COSTS:
+        raise ValueError(f'Unknown password scheme: {scheme}')
+    settings = {**DEFAULT_COSTS[scheme], **(cost or {})}
+    kwargs = {f'{scheme}__{key}': value for key, value in settings.items()}
+    # Hashes made with fewer rounds than configured are upgraded on login
+    kwargs[f'{scheme}__min_rounds'] = settings['rounds']
+    # Any other known scheme still verifies, so changing the configured
+    # one migrates users at their next login instead of locking them out
+    others = [name for name in DEFAULT_COSTS if name != scheme and _available(name)]
+    return CryptContext(schemes=[scheme] + others + [LEGACY_SCHEME],
+                        default=scheme, deprecated='auto', **kwargs)
+
+
+def _available(scheme):
+    try:
+        CryptContext(schemes=[scheme]).handler(scheme).get_backend()
+    except Exception:
+        return False
+    return True
+
+
+def parse_cost(value):
+    """Parse "key=int,key=int" into a dict."""
+    cost = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        key, _, number = item.partition('=')
+        cost[key.strip()] = int(number)
+    return cost
+
+
+# Worker side: contexts are rebuilt once per process from their config string
+_contexts = {}
+
+
+def _context(config):
+    context = _contexts.get(config)
+    if context is None:
+        context = _contexts[config] = CryptContext.from_string(config)
+    return context
+
+
+def _hash_many(config, passwords):
+    context = _context(config)
+    return [context.hash(password) for password in passwords]
+
+
+def _verify(config, password, stored):
+    """Return (matches, replacement hash or None)."""
+    context = _context(config)
+    if not stored:
+        # Burn the same time as a real check so unknown users are not obvious
+        context.dummy_verify()
+        return False, None
+    try:
+        return context.verify_and_update(password, stored)
+    except ValueError:
+        # Not a hash any configured scheme recognises
+        return False, None
+
+
+def _pool_context():
+    # By first use the server has request threads, some holding data-file
+    # locks or other descriptors. Forked workers would inherit them and
+    # keep them open for their whole life, so workers start from a clean
+    # process instead (forkserver where available, else spawn).
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PasswordHasher:
+    def __init__(self, context=None, workers=None, max_pending=None, queue_timeout=QUEUE_TIMEOUT):
+        self.context = context or build_context()
+        self.config = self.context.to_string()
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(self.workers, 1) * 8
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        context = build_context(environ.get('TRAVEL_PASSWORD_SCHEME', DEFAULT_SCHEME),
+                                parse_cost(environ.get('TRAVEL_PASSWORD_COST')))
+        workers = environ.get('TRAVEL_HASH_WORKERS')
+        max_pending = environ.get('TRAVEL_HASH_MAX_PENDING')
+        return cls(context,
+                   workers=int(workers) if workers else None,
+                   max_pending=int(max_pending) if max_pending else None)
+
+    def _pool(self):
+        # Started on first use, so a server that forks workers gets one
+        # pool per worker instead of sharing a forked copy
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=_pool_context())
+            return self._executor
+
+    def _discard_pool(self, broken):
+        # A dead worker (e.g. killed under memory pressure) breaks the whole
+        # executor for good; drop it so the next _pool() starts a new one.
+        # Another thread may have replaced it already.
+        with self._executor_lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def _on_pool(self, call):
+        """``call(pool)``, retried once on a new pool if the pool broke."""
+        pool = self._pool()
+        try:
+            return call(pool)
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+        return call(self._pool())
+
+    def _run(self, fn, *args):
+        if self.workers == 0:
+            return fn(self.config, *args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy('Password hashing queue is full')
+        try:
+            return self._on_pool(lambda pool: pool.submit(fn, self.config, *args).result())
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash_many, [password])[0]
+
+    def hash_many(self, passwords):
+        """Hash many passwords in parallel, in input order."""
+        passwords = list(passwords)
+        if self.workers == 0 or len(passwords) <= 1:
+            return self._run(_hash_many, passwords) if passwords else []
+        # One task per chunk keeps pickling overhead low while using every worker
+        size = -(-len(passwords) // (self.workers * 4))
+        chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+        return self._on_pool(lambda pool: self._hash_chunks(pool, chunks))
+
+    def _hash_chunks(self, pool, chunks):
+        futures = []
+        try:
+            for chunk in chunks:
+                if not self._slots.acquire(timeout=self.queue_timeout):
+                    raise HasherBusy('Password hashing queue is full')
+                try:
+                    future = pool.submit(_hash_many, self.config, chunk)
+                except BaseException:
+                    # A broken pool refuses new work; the slot was never used
+                    self._slots.release()
+                    raise
+                future.add_done_callback(lambda _: self._slots.release())
+                futures.append(future)
+            return [hashed for future in futures for hashed in future.result()]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def verify(self, password, stored):
+        """Check ``password`` against ``stored``.
+
+        Returns (matches, new_hash); new_hash is set when the stored hash
+        uses a legacy scheme or outdated cost and should be replaced.
+        """
+        return self._run(_verify, password, stored)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_default_hasher = None
+_default_lock = threading.Lock()
+
+
+def get_hasher():
+    """The process-wide hasher, configured from the environment on first use."""
+    global _default_hasher
+    with _default_lock:
+        if _default_hasher is None:
+            _default_hasher = PasswordHasher.from_env()
+        return _default_hasher
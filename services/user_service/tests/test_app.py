@@ -1,6 +1,8 @@
 import unittest
+from unittest.mock import patch
 from flask import json
-from services.user_service.app import app
+from services.user_service.app import app, user_manager
+from services.user_service.hashing import HasherBusy
 from data.users import UserDatabase
 
 # Initialize your user database instance
@@ -203,6 +205,56 @@ class UserServiceTestCase(unittest.TestCase):
         self.assertGreater(len(data), 0)
         self.assertTrue(any(user['name'] == 'Admin User' for user in data))
 
+    def test_get_profile_admin_listing_not_modified(self):
+        """Test that an unchanged user listing is answered with 304."""
+        self.register_user('Etag Admin', 'etagadmin@test.com', 'adminpass', 'Admin', admin_secret_key='your_admin_secret_key_here')
+        token = self.get_jwt_token('etagadmin@test.com', 'adminpass')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        response = self.client.get('/profile', headers=headers)
+        etag = response.headers['ETag']
+        response = self.client.get('/profile', headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.register_user('Etag User', 'etaguser@test.com', 'password123', 'User')
+        response = self.client.get('/profile', headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any(user['name'] == 'Etag User' for user in json.loads(response.data)))
+
+    def test_register_users_batch(self):
+        """Test bulk registration through the admin endpoint."""
+        self.register_user('Batch Admin', 'batchadmin@test.com', 'adminpass', 'Admin', admin_secret_key='your_admin_secret_key_here')
+        token = self.get_jwt_token('batchadmin@test.com', 'adminpass')
+        headers = {'Authorization': f'Bearer {token}'}
+        users = [
+            {'name': 'Bulk One', 'email': 'bulk1@test.com', 'password': 'password1', 'role': 'User'},
+            {'name': 'Bulk Two', 'email': 'bulk1@test.com', 'password': 'password2', 'role': 'User'},
+            {'name': 'Bulk Three', 'email': 'bulk3@test.com', 'role': 'User'},
+        ]
+
+        response = self.client.post('/users/batch', json={'users': users}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([r['status'] for r in data['results']], ['created', 'duplicate', 'invalid'])
+        self.assertEqual((data['created'], data['failed']), (1, 2))
+        self.assertEqual(self.login_user('bulk1@test.com', 'password1').status_code, 200)
+
+        response = self.client.post('/users/batch', json={'users': 'nope'}, headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+        self.register_user('Batch User', 'batchuser@test.com', 'password123', 'User')
+        user_token = self.get_jwt_token('batchuser@test.com', 'password123')
+        response = self.client.post('/users/batch', json={'users': users},
+                                    headers={'Authorization': f'Bearer {user_token}'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_register_when_hashing_pool_is_full(self):
+        """Test that a saturated hashing pool answers 503 instead of queueing."""
+        with patch.object(user_manager.hasher, 'hash', side_effect=HasherBusy('full')):
+            response = self.register_user('Busy User', 'busyuser@test.com', 'password123', 'User')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
 
 if __name__ == '__main__':
     unittest.main()
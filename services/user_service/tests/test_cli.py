@@ -0,0 +1,43 @@
+import io
+import json
+import unittest
+from unittest.mock import Mock
+
+from services.user_service import cli
+from services.user_service.users import UserManager
+
+
+class TestUserCli(unittest.TestCase):
+    def setUp(self):
+        self.user_manager = UserManager()
+        self.user_manager.user_db = Mock()
+        self.user_manager.user_db.add_users.side_effect = lambda users: [True] * len(users)
+
+    def test_import_csv_reports_each_row(self):
+        data = ('name,email,password,role\n'
+                'Ann,ann@example.com,secret1,User\n'
+                'Bob,bob@example,secret2,User\n'
+                'Cid,cid@example.com,secret3,Admin\n')
+        output = io.StringIO()
+
+        counts = cli.import_users(self.user_manager, io.StringIO(data), 'csv', output, batch_size=2)
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(counts, {'created': 2, 'invalid': 1})
+        self.assertEqual([r['line'] for r in results], [2, 3, 4])
+        self.assertEqual(results[1]['error'], 'Invalid email format')
+        self.assertEqual(self.user_manager.user_db.add_users.call_count, 2)
+
+    def test_import_ndjson_with_bad_line(self):
+        data = ('{"name": "Ann", "email": "ann@example.com", "password": "x", "role": "User"}\n'
+                '{broken\n')
+        output = io.StringIO()
+
+        counts = cli.import_users(self.user_manager, io.StringIO(data), 'ndjson', output)
+
+        self.assertEqual(counts, {'created': 1, 'invalid': 1})
+        self.assertIn('"line": 2', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import select
+import signal
+import unittest
+
+from services.user_service.hashing import (
+    HasherBusy, PasswordHasher, build_context, parse_cost
+)
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def setUp(self):
+        # Low cost keeps the tests fast; the behaviour does not depend on it
+        self.context = build_context(cost={'rounds': 1000})
+
+    def test_inline_hash_and_verify(self):
+        hasher = PasswordHasher(self.context, workers=0)
+        hashed = hasher.hash('secret')
+        self.assertTrue(hashed.startswith('$pbkdf2-sha256$1000$'))
+        self.assertEqual(hasher.verify('secret', hashed), (True, None))
+        self.assertEqual(hasher.verify('other', hashed), (False, None))
+        self.assertEqual(hasher.verify('secret', 'not a hash'), (False, None))
+        self.assertEqual(hasher.verify('secret', None), (False, None))
+
+    def test_legacy_and_outdated_hashes_are_upgraded(self):
+        hasher = PasswordHasher(self.context, workers=0)
+        legacy = hashlib.sha256(b'secret').hexdigest()
+        matches, new_hash = hasher.verify('secret', legacy)
+        self.assertTrue(matches)
+        self.assertTrue(new_hash.startswith('$pbkdf2-sha256$1000$'))
+
+        weaker = build_context(cost={'rounds': 500}).hash('secret')
+        self.assertIsNotNone(hasher.verify('secret', weaker)[1])
+
+        other_scheme = build_context('scrypt', {'rounds': 4}).hash('secret')
+        matches, new_hash = hasher.verify('secret', other_scheme)
+        self.assertTrue(matches)
+        self.assertTrue(new_hash.startswith('$pbkdf2-sha256$'))
+
+    def test_process_pool(self):
+        hasher = PasswordHasher(self.context, workers=2)
+        try:
+            passwords = [f'password{i}' for i in range(20)]
+            hashes = hasher.hash_many(passwords)
+            self.assertEqual(len(hashes), 20)
+            for password, hashed in zip(passwords, hashes):
+                self.assertTrue(hasher.verify(password, hashed)[0])
+        finally:
+            hasher.shutdown()
+
+    def test_pool_workers_do_not_inherit_descriptors(self):
+        # Stands in for a data-file lock another request thread holds
+        # while the pool starts
+        read, write = os.pipe()
+        hasher = PasswordHasher(self.context, workers=1)
+        try:
+            hasher.hash('secret')
+            os.close(write)
+            # EOF only once no process holds the write end any more
+            ready, _, _ = select.select([read], [], [], 5)
+            self.assertEqual(ready, [read])
+            self.assertEqual(os.read(read, 1), b'')
+        finally:
+            hasher.shutdown()
+            os.close(read)
+
+    def test_pool_replaced_after_a_worker_dies(self):
+        hasher = PasswordHasher(self.context, workers=1)
+        try:
+            hasher.hash('secret')
+            broken = hasher._executor
+            # As if the kernel killed a worker for using too much memory
+            process = next(iter(broken._processes.values()))
+            os.kill(process.pid, signal.SIGKILL)
+            process.join(5)
+
+            hashed = hasher.hash('secret')
+            self.assertTrue(hasher.verify('secret', hashed)[0])
+            self.assertEqual(len(hasher.hash_many(['a', 'b', 'c'])), 3)
+            self.assertIsNot(hasher._executor, broken)
+        finally:
+            hasher.shutdown()
+
+    def test_queue_depth_limit(self):
+        hasher = PasswordHasher(self.context, workers=1, max_pending=1, queue_timeout=0.01)
+        # Hold the only slot as an in-flight hash would
+        hasher._slots.acquire()
+        try:
+            with self.assertRaises(HasherBusy):
+                hasher.hash('secret')
+        finally:
+            hasher._slots.release()
+        hasher.shutdown()
+
+    def test_configuration(self):
+        self.assertEqual(parse_cost('rounds=3, memory_cost=65536'),
+                         {'rounds': 3, 'memory_cost': 65536})
+        with self.assertRaises(ValueError):
+            build_context('md5')
+        hasher = PasswordHasher.from_env({
+            'TRAVEL_PASSWORD_SCHEME': 'scrypt',
+            'TRAVEL_PASSWORD_COST': 'rounds=4',
+            'TRAVEL_HASH_WORKERS': '0',
+        })
+        self.assertTrue(hasher.hash('secret').startswith('$scrypt$ln=4,'))
+
+
+if __name__ == '__main__':
+    unittest.main()
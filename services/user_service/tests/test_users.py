@@ -1,6 +1,14 @@
 # services/user_service/tests/test_users.py
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import Mock, patch
+from data.users import UserDatabase
+from services.user_service import users as users_module
 from services.user_service.users import UserManager
 
 
@@ -20,10 +28,13 @@ class TestUserManager(unittest.TestCase):
         password = "test123"
         hashed1 = self.user_manager.hash_password(password)
         hashed2 = self.user_manager.hash_password(password)
-        self.assertEqual(hashed1, hashed2)
+        # Salted: the same password hashes differently but verifies
+        self.assertNotEqual(hashed1, hashed2)
         self.assertNotEqual(hashed1, password)
+        self.assertEqual(self.user_manager.verify_password(password, hashed1), (True, None))
+        self.assertFalse(self.user_manager.verify_password('wrong', hashed2)[0])
 
-    @patch('services.user_service.users.UserDatabase')
+    @patch('services.user_service.users.open_user_database')
     def test_register_user_success(self, mock_db):
         """Test successful user registration"""
         # Setup mock
@@ -45,7 +56,7 @@ class TestUserManager(unittest.TestCase):
         self.assertEqual(args['email'], self.test_user['email'])
         self.assertEqual(args['role'], 'User')
 
-    @patch('services.user_service.users.UserDatabase')
+    @patch('services.user_service.users.open_user_database')
     def test_register_user_duplicate_email(self, mock_db):
         """Test registration with duplicate email"""
         # Setup mock to simulate existing user
@@ -63,7 +74,7 @@ class TestUserManager(unittest.TestCase):
         self.assertIsNone(user_id)
         mock_db.return_value.add_user.assert_not_called()
 
-    @patch('services.user_service.users.UserDatabase')
+    @patch('services.user_service.users.open_user_database')
     def test_authenticate_user_success(self, mock_db):
         """Test successful user authentication"""
         # Setup mock
@@ -82,7 +93,7 @@ class TestUserManager(unittest.TestCase):
         self.assertIsNotNone(user)
         self.assertEqual(user['email'], self.test_user['email'])
 
-    @patch('services.user_service.users.UserDatabase')
+    @patch('services.user_service.users.open_user_database')
     def test_authenticate_user_wrong_password(self, mock_db):
         """Test authentication with wrong password"""
         # Setup mock
@@ -100,7 +111,7 @@ class TestUserManager(unittest.TestCase):
         # Assertions
         self.assertIsNone(user)
 
-    @patch('services.user_service.users.UserDatabase')
+    @patch('services.user_service.users.open_user_database')
     def test_get_user_profile(self, mock_db):
         """Test getting user profile"""
         # Setup mock
@@ -121,7 +132,7 @@ class TestUserManager(unittest.TestCase):
         self.assertEqual(profile['email'], self.test_user['email'])
         self.assertNotIn('password', profile)
 
-    @patch('services.user_service.users.UserDatabase')
+    @patch('services.user_service.users.open_user_database')
     def test_get_all_users(self, mock_db):
         """Test getting all users"""
         # Setup mock
@@ -138,4 +149,184 @@ class TestUserManager(unittest.TestCase):
         # Assertions
         self.assertEqual(len(users), 2)
         self.assertNotIn('password', users[0])
-        self.assertNotIn('password', users[1])
\ No newline at end of file
+        self.assertNotIn('password', users[1])
+
+    @patch('services.user_service.users.open_user_database')
+    def test_register_user_concurrent_duplicate(self, mock_db):
+        """Test registration losing a race for the same email"""
+        # The email was free at lookup time but taken before the insert
+        mock_db.return_value.get_user_by_email.return_value = None
+        mock_db.return_value.add_user.return_value = False
+        self.user_manager.user_db = mock_db.return_value
+
+        user_id = self.user_manager.register_user(
+            self.test_user['name'],
+            self.test_user['email'],
+            self.test_user['password']
+        )
+
+        self.assertIsNone(user_id)
+
+    def test_register_users_batch(self):
+        """Test per-record results of bulk registration"""
+        mock_db = Mock()
+        mock_db.add_users.side_effect = lambda users: [u['email'] != 'taken@example.com' for u in users]
+        self.user_manager.user_db = mock_db
+        records = [
+            self.test_user,
+            {**self.test_user, 'email': 'not-an-email'},
+            {**self.test_user, 'email': 'taken@example.com'},
+            'not a record',
+            {**self.test_user, 'name': '  Padded  ', 'email': 'other@example.com', 'role': 'Admin'},
+        ]
+
+        results = self.user_manager.register_users(records)
+
+        self.assertEqual([r['status'] for r in results],
+                         ['created', 'invalid', 'duplicate', 'invalid', 'created'])
+        self.assertEqual([r['index'] for r in results], list(range(5)))
+        self.assertEqual(results[1]['error'], 'Invalid email format')
+        mock_db.add_users.assert_called_once()
+        stored = mock_db.add_users.call_args[0][0]
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(stored[2]['name'], 'Padded')
+        self.assertEqual(stored[0]['id'], results[0]['user_id'])
+        self.assertTrue(self.user_manager.verify_password('test123', stored[0]['password'])[0])
+
+    def test_authenticate_user_upgrades_legacy_hash(self):
+        """Test that a legacy SHA-256 hash is replaced at login"""
+        legacy = hashlib.sha256(self.test_user['password'].encode()).hexdigest()
+        mock_db = Mock()
+        mock_db.get_user_by_email.return_value = {**self.test_user, 'id': '1', 'password': legacy}
+        mock_db.update_user.side_effect = lambda user_id, changes: {**self.test_user, 'id': user_id, **changes}
+        self.user_manager.user_db = mock_db
+
+        user = self.user_manager.authenticate_user(self.test_user['email'], self.test_user['password'])
+
+        new_hash = mock_db.update_user.call_args[0][1]['password']
+        self.assertTrue(new_hash.startswith('$pbkdf2-sha256$'))
+        self.assertEqual(user['password'], new_hash)
+        self.assertIsNone(self.user_manager.authenticate_user(self.test_user['email'], 'wrong'))
+
+    def test_authenticate_unknown_email(self):
+        """Test that an unknown email fails without a stored hash"""
+        self.user_manager.user_db = Mock()
+        self.user_manager.user_db.get_user_by_email.return_value = None
+        self.assertIsNone(self.user_manager.authenticate_user('nobody@example.com', 'x'))
+
+
+class TestUserProjection(unittest.TestCase):
+    """Profiles served from the projection over a real user database"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, 'users_data.json')
+        self.user_manager = UserManager()
+        self.user_manager.user_db = UserDatabase(self.path)
+        self.user_manager.user_db.add_users([
+            {'id': str(i), 'name': f'User {i}', 'email': f'user{i}@example.com',
+             'password': 'hashed', 'role': 'User'} for i in range(3)
+        ])
+
+    def tearDown(self):
+        self.user_manager.user_db.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_listing_updated_without_rereading_records(self):
+        """Test that local writes patch the projection in place"""
+        db = self.user_manager.user_db
+        self.assertEqual([u['id'] for u in self.user_manager.get_all_users()], ['0', '1', '2'])
+
+        with patch.object(db, 'get_all_users', side_effect=AssertionError('rebuilt')):
+            db.add_user({'id': '3', 'name': 'New', 'email': 'new@example.com',
+                         'password': 'hashed', 'role': 'User'})
+            db.update_user('1', {'role': 'Admin'})
+            db.delete_user('0')
+            users = self.user_manager.get_all_users()
+            profile = self.user_manager.get_user_profile('1')
+
+        self.assertEqual([u['id'] for u in users], ['1', '2', '3'])
+        self.assertEqual(users[0], {'id': '1', 'name': 'User 1',
+                                    'email': 'user1@example.com', 'role': 'Admin'})
+        self.assertEqual(profile, users[0])
+        self.assertIsNone(self.user_manager.get_user_profile('0'))
+
+    def test_listing_reused_until_a_write(self):
+        """Test that unchanged data is listed without building the dicts again"""
+        listing = self.user_manager.get_all_users()
+        self.assertIs(self.user_manager.get_all_users(), listing)
+
+        self.user_manager.user_db.update_user('1', {'name': 'Renamed'})
+        updated = self.user_manager.get_all_users()
+        self.assertIsNot(updated, listing)
+        self.assertEqual(updated[1]['name'], 'Renamed')
+        self.assertEqual(listing[1]['name'], 'User 1')
+        self.assertIs(self.user_manager.get_all_users(), updated)
+
+    def test_write_by_other_process_rebuilds(self):
+        """Test that a write through another instance of the files is seen"""
+        self.user_manager.get_all_users()
+        other = UserDatabase(self.path)
+        other.add_user({'id': '9', 'name': 'Elsewhere', 'email': 'else@example.com',
+                        'password': 'hashed', 'role': 'User'})
+        other.close()
+
+        self.assertEqual(self.user_manager.get_user_profile('9')['name'], 'Elsewhere')
+        self.assertIn('9', [u['id'] for u in self.user_manager.get_all_users()])
+
+    def test_local_write_after_other_process_write(self):
+        """Test that a missed write is not hidden by re-stamping after a local one"""
+        self.user_manager.get_all_users()
+        other = UserDatabase(self.path)
+        other.add_user({'id': 'x', 'name': 'Elsewhere', 'email': 'else@example.com',
+                        'password': 'hashed', 'role': 'User'})
+        other.close()
+        self.user_manager.user_db.add_user({'id': 'y', 'name': 'Here', 'email': 'here@example.com',
+                                            'password': 'hashed', 'role': 'User'})
+
+        self.assertEqual([u['id'] for u in self.user_manager.get_all_users()],
+                         ['0', '1', '2', 'x', 'y'])
+
+    def test_batch_write_applied_in_place(self):
+        """Test that every record of one batch write patches the projection"""
+        db = self.user_manager.user_db
+        self.user_manager.get_all_users()
+        with patch.object(db, 'get_all_users', side_effect=AssertionError('rebuilt')):
+            db.add_users([{'id': f'b{i}', 'email': f'b{i}@example.com', 'name': 'B',
+                           'password': 'hashed', 'role': 'User'} for i in range(3)])
+            self.assertEqual(len(self.user_manager.get_all_users()), 6)
+
+    def test_concurrent_writes_and_listings(self):
+        """Test that registering and listing threads never deadlock"""
+        db = self.user_manager.user_db
+
+        def register(prefix):
+            for i in range(50):
+                db.add_user({'id': f'{prefix}{i}', 'email': f'{prefix}{i}@example.com',
+                             'name': 'N', 'password': 'hashed', 'role': 'User'})
+
+        def list_users():
+            for _ in range(50):
+                self.user_manager.get_all_users()
+
+        threads = [threading.Thread(target=target, args=args, daemon=True)
+                   for target, args in ((register, ('a',)), (register, ('b',)),
+                                        (list_users, ()), (list_users, ()))]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 20
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(len(self.user_manager.get_all_users()), 103)
+
+    def test_projection_expires(self):
+        """Test the rebuild that bounds missed writes by other processes"""
+        self.user_manager.get_all_users()
+        projection = self.user_manager.profiles
+        projection._profiles.pop('2')
+        projection._listing_cache = None
+        self.assertEqual(len(self.user_manager.get_all_users()), 2)
+
+        with patch.object(users_module, 'PROJECTION_MAX_AGE', 0):
+            self.assertEqual(len(self.user_manager.get_all_users()), 3)
@@ -1,23 +1,178 @@
 # services/user_service/users.py
 import uuid
-import hashlib
 import os
+import re
 import sys
+import threading
+import time
 
 # Add parent directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from data.users import UserDatabase
+from data.backends import open_user_database
+from services.user_service.hashing import get_hasher
+from services.common.metrics import span
+
+REQUIRED_FIELDS = ('name', 'email', 'password', 'role')
+ROLES = ('User', 'Admin')
+# What anyone but the user database gets to see of a user
+PROFILE_FIELDS = ('id', 'name', 'email', 'role')
+# Seconds. Writes by other processes change the version and so cause a
+# rebuild; rebuilding at least this often also bounds the staleness of a
+# projection whose version checks were somehow fooled.
+PROJECTION_MAX_AGE = 60
+
+def is_valid_email(email):
+    """Validate email format using regex pattern."""
+    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return bool(re.match(email_pattern, email))
+
+def validate_registration(data):
+    """Return the error message for an invalid registration, else None.
+
+    Covers everything except the admin secret key, which only applies to
+    self-registration through POST /register.
+    """
+    if not isinstance(data, dict):
+        return 'Record must be an object'
+    missing_fields = [field for field in REQUIRED_FIELDS if not data.get(field)]
+    if missing_fields:
+        return f'Missing required fields: {", ".join(missing_fields)}'
+    for field in REQUIRED_FIELDS:
+        if not isinstance(data[field], str):
+            return f'{field} must be a string'
+        if not data[field].strip():
+            return f'{field} cannot be empty'
+    if not is_valid_email(data['email'].strip()):
+        return 'Invalid email format'
+    if data['role'] not in ROLES:
+        return 'Invalid role. Must be either User or Admin'
+    return None
+
+def _profile(user):
+    return tuple(user[field] for field in PROFILE_FIELDS)
+
+def _profile_dict(profile):
+    user_id, name, email, role = profile
+    return {'id': user_id, 'name': name, 'email': email, 'role': role}
+
+class UserProjection:
+    """Public profiles of every user, kept in step with the user database.
+
+    Profiles are stored as (id, name, email, role) tuples, in the
+    database's order, and updated one by one from the database's mutation
+    listener rather than rebuilt from the full records. The projection is
+    stamped with the database version it matches. A write is applied only
+    if it starts from that version; otherwise the projection missed a
+    write, e.g. by another process, and is dropped. It is built on the
+    first listing, so processes that never list users never hold it.
+
+    The listing built from it is kept too, until the next write, so
+    repeated listings of unchanged data return the same list; callers
+    must not modify it.
+
+    The database is never called with ``_lock`` held: its listener runs
+    under the database lock and then takes ``_lock``.
+    """
+
+    def __init__(self, user_db):
+        self.user_db = user_db
+        self._profiles = None  # id -> profile tuple
+        self._listing_cache = None  # get_all() of _profiles, once built
+        self._version = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        user_db.add_listener(self._on_change, versions=True)
+
+    def _on_change(self, op, user_id, user, before, after):
+        with self._lock:
+            if self._profiles is None:
+                return
+            self._listing_cache = None
+            # Batches report the same versions for every record, so after
+            # the first one the projection already carries ``after``
+            if op == 'reset' or before is None or self._version not in (before, after):
+                self._profiles = None
+                return
+            if op == 'put':
+                self._profiles[user_id] = _profile(user)
+            elif op == 'delete':
+                self._profiles.pop(user_id, None)
+            self._version = after
+
+    def _current(self, version):
+        """The profiles if they match ``version`` and are not too old, else None."""
+        profiles = self._profiles
+        if (profiles is not None and self._version == version
+                and time.monotonic() - self._built_at < PROJECTION_MAX_AGE):
+            return profiles
+        return None
+
+    @staticmethod
+    def _listing(profiles):
+        return [{'id': user_id, 'name': name, 'email': email, 'role': role}
+                for user_id, name, email, role in profiles.values()]
+
+    def get(self, user_id):
+        """The profile dict of ``user_id`` or None."""
+        profiles = self._current(self.user_db.get_version())
+        # Without a current projection one lookup beats building it
+        if profiles is not None:
+            profile = profiles.get(user_id)
+        else:
+            user = self.user_db.get_user_by_id(user_id)
+            profile = _profile(user) if user else None
+        return _profile_dict(profile) if profile else None
+
+    def get_all(self):
+        """Every profile as a dict, without reading the stored records.
+
+        The list is shared between callers until the data changes.
+        """
+        version = self.user_db.get_version()
+        with self._lock:
+            profiles = self._current(version)
+            if profiles is not None:
+                if self._listing_cache is None:
+                    self._listing_cache = self._listing(profiles)
+                return self._listing_cache
+        # Rebuild. ``version`` was read before the users: a write landing
+        # in between leaves the stamp stale, which only costs another rebuild
+        profiles = {user['id']: _profile(user) for user in self.user_db.get_all_users()}
+        listing = self._listing(profiles)
+        with self._lock:
+            self._profiles = profiles
+            self._listing_cache = listing
+            self._version = version
+            self._built_at = time.monotonic()
+        return listing
 
 class UserManager:
-    def __init__(self):
-        self.user_db = UserDatabase()
+    def __init__(self, hasher=None):
+        self.user_db = open_user_database()
+        # Hashing runs on the hasher's worker pool (see hashing.py)
+        self.hasher = hasher or get_hasher()
+        self._projection = None
+
+    @property
+    def profiles(self):
+        """The UserProjection of ``user_db``, created on first use."""
+        projection = self._projection
+        if projection is None or projection.user_db is not self.user_db:
+            projection = self._projection = UserProjection(self.user_db)
+        return projection
 
     def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
+        with span('password_hash'):
+            return self.hasher.hash(password)
+
+    def verify_password(self, password, stored):
+        """Return (matches, new_hash); see PasswordHasher.verify."""
+        with span('password_verify'):
+            return self.hasher.verify(password, stored)
 
     def register_user(self, name, email, password, role='User'):
-        # Check if email already exists
+        # Check if email already exists (cheap index lookup before hashing)
         if self.user_db.get_user_by_email(email):
             return None
 
@@ -32,35 +187,78 @@ class UserManager:
             'role': role
         }
         
-        self.user_db.add_user(user)
+        # add_user re-checks the email atomically in case of a concurrent
+        # registration with the same address
+        if not self.user_db.add_user(user):
+            return None
         return user_id
 
+    def hash_passwords(self, passwords):
+        """Hash many passwords in parallel, in input order."""
+        with span('password_hash_many'):
+            return self.hasher.hash_many(passwords)
+
+    def register_users(self, records):
+        """Register many users with a single write and return one result per record.
+
+        Each result is ``{'index', 'status'}`` plus ``user_id`` when the
+        status is 'created', or ``error`` when it is 'invalid' or 'duplicate'.
+        Records are validated with validate_registration; emails are checked
+        against the email index and the rest of the batch in the same
+        transaction that stores the new users.
+        """
+        results = [None] * len(records)
+        pending = []
+        for index, data in enumerate(records):
+            error = validate_registration(data)
+            if error:
+                results[index] = {'index': index, 'status': 'invalid', 'error': error}
+            else:
+                pending.append(index)
+
+        hashed = self.hash_passwords([records[index]['password'] for index in pending])
+        users = [
+            {
+                'id': str(uuid.uuid4()),
+                'name': records[index]['name'].strip(),
+                'email': records[index]['email'].strip(),
+                'password': hashed_password,
+                'role': records[index]['role']
+            } for index, hashed_password in zip(pending, hashed)
+        ]
+        stored = self.user_db.add_users(users) if users else []
+
+        for index, user, ok in zip(pending, users, stored):
+            if ok:
+                results[index] = {'index': index, 'status': 'created', 'user_id': user['id']}
+            else:
+                results[index] = {'index': index, 'status': 'duplicate',
+                                  'error': 'Email already exists'}
+        return results
+
     def authenticate_user(self, email, password):
         user = self.user_db.get_user_by_email(email)
-        if user and user['password'] == self.hash_password(password):
-            return user
-        return None
+        # Unknown emails still pay for a verification, so they take as long
+        matches, new_hash = self.verify_password(password, user['password'] if user else None)
+        if not matches:
+            return None
+        if new_hash:
+            # Legacy SHA-256 or outdated cost: store the current scheme's hash
+            user = self.user_db.update_user(user['id'], {'password': new_hash}) or user
+        return user
 
     def get_user_profile(self, user_id):
-        user = self.user_db.get_user_by_id(user_id)
-        if user:
-            # Remove sensitive information before returning
-            return {
-                'id': user['id'],
-                'name': user['name'],
-                'email': user['email'],
-                'role': user['role']
-            }
-        return None
+        # Profiles never carry the password hash
+        return self.profiles.get(user_id)
+
+    def add_listener(self, listener):
+        """Call ``listener(op, key, record)`` after every data-layer write."""
+        self.user_db.add_listener(listener)
+
+    def get_version(self):
+        """Changes whenever any user is added, changed or removed."""
+        return self.user_db.get_version()
 
     def get_all_users(self):
         # Returns all users (for admin access)
-        users = self.user_db.get_all_users()
-        return [
-            {
-                'id': user['id'],
-                'name': user['name'], 
-                'email': user['email'], 
-                'role': user['role']
-            } for user in users
-        ]
\ No newline at end of file
+        return self.profiles.get_all()
\ No newline at end of file